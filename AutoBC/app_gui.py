@@ -1,16 +1,17 @@
 import tkinter as tk
 import tkinter.ttk as ttk
-import tkinter.messagebox as messagebox
-import subprocess
-import sys
-import os
+import time
 
 import config
 import utils
+from core import dates
+
+# 最初の描画までの時間を縮めるため、実行時にしか使わないモジュールは使う箇所で読み込む
 
 
 class MainGui:
-    def __init__(self):
+    def __init__(self, stall_log: str = None):
+        self.stall_log = stall_log  # 画面の停止の記録先（省略時は STALL_LOG）
         self.setup_root()
         self.setup_style()
         self.create_frames()
@@ -36,24 +37,58 @@ class MainGui:
         self.root.bind("<Escape>", lambda event: self.cancel_action())
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self._is_running = False  # cancel_action, on_close 用フラグ
+        self.process = None  # 実行中のワーカー（process.py）
+        self.spare = None  # 次の実行用に準備を済ませて待機しているワーカー
         self._updating_end_date = False  # change_end_date_min 用フラグ
+        self.eta_deadline = None  # 予想される完了時刻（monotonic）
+        self._eta_after = None  # 残り時間の表示を更新する after の ID
 
     def run(self):
         """アプリケーションの実行"""
         self.root.update_idletasks()  # レイアウト確定
+        self.root.bind("<Map>", self.on_first_map)
         self.root.deiconify()  # ウィンドウを表示
 
         self.input_pass.focus_set()
 
+        if config.STALL_WATCHDOG:
+            from stall_watchdog import StallWatchdog
+
+            self.watchdog = StallWatchdog(self.root, path=self.stall_log)
+            self.watchdog.start()
+
         self.root.mainloop()
 
+        if hasattr(self, "watchdog"):
+            self.watchdog.stop()
+            print(self.watchdog.summary())
+
+    def on_first_map(self, event):
+        """ウィンドウが表示されたら、最初の描画の後に残りの準備を行う"""
+        if event.widget is not self.root:
+            return
+        self.root.unbind("<Map>")
+        self.root.after_idle(self.after_first_paint)
+
+    def after_first_paint(self):
+        """最初の描画に不要なウィジェットの生成と、次の実行用のワーカーの起動"""
+        self.create_deferred_widgets()
+        self.spawn_spare()
+
     def run_process(self):
         """実行中の処理"""
-        self.status_label = ttk.Label(
-            self.bottom_frame, text="ログイン中…", style="Progress.TLabel", width=12
-        )
+        from core import planner
+
+        self.status_label.config(text="ログイン中…")
         self.status_label.pack(side="left", padx=(0, 13))
 
+        self.concurrency_label.config(text="")
+        self.concurrency_label.pack(side="left", padx=(0, 13))
+
+        self.eta_label.config(text="")
+        self.eta_label.pack(side="left", padx=(0, 13))
+
+        self.progressbar.config(mode="indeterminate", value=0)
         self.progressbar.pack(side="right", padx=(0, 13), fill="x", expand=True)
         self.progressbar.start(config.PROGRESSBAR_SPEED)
 
@@ -63,22 +98,278 @@ class MainGui:
         self.execute_button.bind("<Return>", lambda event: self.cancel_action())
 
         password = self.input_pass.get()
+        if self.resume_unfinished(password):
+            return
         end_index = self.end_date.current()
         selected_date_list = [d["value"] for d in self.sublist[: end_index + 1]]
-        selected_keys, selected_values = self.get_selected_options()
-
-        cmd = [
-            sys.executable,
-            "process.py",
-            "userId",
-            utils.userId,
-            "--password",
-            password,
+        selected_keys, _ = self.get_selected_options()
+        self.plan = planner.build_plan(selected_keys, selected_date_list)
+        print(self.plan.explain())
+        if not self.plan.jobs:
+            from tkinter import messagebox
+
+            self.reset_widgets()
+            messagebox.showinfo(
+                config.APP_NAME, "選択した納期はすべて休業日のため、検索しません。"
+            )
+            return
+
+        argv = [
+            "--user_id",
+            utils.get_user_id(),
             "--selected_date_list",
-            selected_date_list,
+            *self.plan.dates,
             "--targets",
-            *selected_values,
+            *selected_keys,
+            "--events",
         ]
+        self.start_worker(argv, password)
+
+    def resume_unfinished(self, password: str) -> bool:
+        """途中で終わった前回の実行があれば、続きから実行するか確認する
+
+        続きから実行した場合は True を返す。「いいえ」の場合は途中で終わった記録をすべて破棄する。
+        """
+        if not config.USE_JOURNAL:
+            return False
+        import journal
+        from tkinter import messagebox
+
+        from core import planner
+
+        found = journal.stale(utils.get_user_id())
+        if not found:
+            return False
+        unfinished = found[-1]
+        remaining = unfinished.remaining
+        if not messagebox.askyesno(
+            config.APP_NAME,
+            f"前回の実行が途中で終わっています（{', '.join(unfinished.targets)}、"
+            f"{unfinished.dates[0]}〜{unfinished.dates[-1]}、"
+            f"残り {len(remaining)}/{len(unfinished.jobs)} 件）。\n"
+            "続きから実行しますか？\n\n"
+            "「いいえ」を選ぶと前回の記録を破棄し、選択した内容で実行します。",
+        ):
+            for old in found:
+                old.discard()
+            return False
+
+        self.plan = planner.Plan(remaining)
+        argv = ["--user_id", utils.get_user_id(), "--resume", "--events"]
+        self.start_worker(argv, password)
+        return True
+
+    @staticmethod
+    def spawn_worker() -> "subprocess.Popen":
+        """実行要求を待つワーカー（process.py --warm）を起動する"""
+        import os
+        import subprocess
+        import sys
+
+        return subprocess.Popen(
+            [sys.executable, "process.py", "--warm"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            env={**os.environ, "PYTHONIOENCODING": "utf-8"},
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+        )
+
+    def spawn_spare(self):
+        """次の実行用のワーカーがなければ起動しておく"""
+        if self.spare is None or self.spare.poll() is not None:
+            self.spare = self.spawn_worker()
+
+    def close_spare(self):
+        """待機中のワーカーを終了させる（標準入力を閉じると終了する）"""
+        spare, self.spare = self.spare, None
+        if spare is not None and spare.poll() is None:
+            try:
+                spare.stdin.close()
+            except OSError:
+                pass
+
+    def start_worker(self, argv: list[str], password: str):
+        """待機中のワーカーに実行を依頼し、進捗イベントの受信を開始する"""
+        import json
+        import queue
+        import threading
+
+        self.total_jobs = len(self.plan)
+        self.completed_jobs = 0
+        self.worker_errors = []
+        self.worker_summary = ""
+        self.worker_timings = ""
+        self.first_request_latency = None
+
+        process, self.spare = self.spare, None
+        if process is None or process.poll() is not None:
+            process = self.spawn_worker()  # 待機中のワーカーがなければその場で起動する
+        self.process = process
+
+        # パスワードはコマンドラインに残さないよう標準入力で渡す
+        request = {"argv": argv, "password": password}
+        self.process.stdin.write(json.dumps(request, ensure_ascii=False) + "\n")
+        self.process.stdin.flush()
+
+        events = queue.Queue()
+        threading.Thread(
+            target=self.read_events, args=(self.process, events), daemon=True
+        ).start()
+        self.root.after(
+            config.EVENT_POLL_INTERVAL, self.poll_events, self.process, events
+        )
+
+    @staticmethod
+    def read_events(process: "subprocess.Popen", events: "queue.Queue"):
+        """ワーカーの出力を読み取ってキューに積む（受信スレッド）"""
+        from events import parse_event
+
+        for line in process.stdout:
+            event = parse_event(line)
+            if event is None:
+                event = {"event": "log", "message": line.rstrip()}
+            events.put(event)
+        events.put(None)  # 出力の終端
+
+    def poll_events(self, process: "subprocess.Popen", events: "queue.Queue"):
+        """受信済みのイベントをメインループを止めずに反映する"""
+        import queue
+
+        if process is not self.process:
+            return  # 中止済みのワーカー
+
+        try:
+            while True:
+                event = events.get_nowait()
+                if event is None:
+                    self.wait_worker_exit(process)
+                    return
+                self.handle_event(event)
+        except queue.Empty:
+            pass
+
+        self.root.after(config.EVENT_POLL_INTERVAL, self.poll_events, process, events)
+
+    def handle_event(self, event: dict):
+        """ワーカーからのイベント1件を画面に反映する"""
+        kind = event["event"]
+        if kind == "started":
+            self.first_request_latency = event["at"] - self.clicked_at
+            worker = "待機中" if event["warm"] else "新規"
+            print(
+                f"実行から最初の要求まで {self.first_request_latency:.2f} 秒"
+                f"（{worker}のワーカー）"
+            )
+        elif kind == "plan":
+            self.total_jobs = event["total"]
+            self.progressbar.stop()
+            self.progressbar.config(
+                mode="determinate", maximum=max(1, self.total_jobs), value=0
+            )
+            self.status_label.config(text=f"印刷中 0/{self.total_jobs}")
+        elif kind == "job_finished":
+            self.completed_jobs += 1
+            self.progressbar.config(value=self.completed_jobs)
+            self.status_label.config(
+                text=f"印刷中 {self.completed_jobs}/{self.total_jobs}"
+            )
+        elif kind == "concurrency":
+            self.show_concurrency(event["current"], event["target"])
+        elif kind == "eta":
+            self.show_eta(event["remaining"], event["total"])
+        elif kind == "error":
+            self.worker_errors.append(event["message"])
+        elif kind == "timings":
+            self.worker_timings = event["summary"]
+            print(self.worker_timings)
+        elif kind == "done":
+            self.worker_summary = event["summary"]
+        elif kind == "log":
+            print(event["message"])
+
+    def wait_worker_exit(self, process: "subprocess.Popen"):
+        """出力を閉じたワーカーの終了を待ってから完了処理を行う"""
+        if process is not self.process:
+            return
+        if process.poll() is None:
+            self.root.after(config.EVENT_POLL_INTERVAL, self.wait_worker_exit, process)
+            return
+        self.on_process_complete(process.returncode)
+
+    def on_process_complete(self, returncode: int):
+        """ワーカー終了後の後処理"""
+        from tkinter import messagebox
+
+        self.process = None
+        self.reset_widgets()
+
+        if returncode == 0 and not self.worker_errors:
+            summary = self.worker_summary
+            if self.first_request_latency is not None:
+                summary += (
+                    f"\n実行から最初の要求まで {self.first_request_latency:.2f} 秒"
+                )
+            if self.worker_timings:
+                summary += f"\n{self.worker_timings}"
+            messagebox.showinfo(config.APP_NAME, f"印刷が完了しました。\n\n{summary}")
+        else:
+            message = "\n".join(self.worker_errors) or f"終了コード {returncode}"
+            messagebox.showerror(
+                config.APP_NAME, f"エラーが発生しました。\n\n{message}"
+            )
+
+    def stop_worker(self):
+        """ワーカーに中止を指示し、CANCEL_TIMEOUT 以内に終わらなければ強制終了する"""
+        process, self.process = self.process, None
+        if process is None or process.poll() is not None:
+            return
+        try:
+            process.stdin.write("cancel\n")
+            process.stdin.flush()
+        except OSError:
+            pass
+        self.root.after(config.CANCEL_TIMEOUT, self.kill_worker, process)
+
+    @staticmethod
+    def kill_worker(process: "subprocess.Popen"):
+        """中止の指示に応じなかったワーカーを強制終了する"""
+        if process.poll() is None:
+            process.kill()
+
+    def show_concurrency(self, current: int, target: int):
+        """検索の同時実行数（実行中／目標）を表示"""
+        if hasattr(self, "concurrency_label"):
+            self.concurrency_label.config(text=f"並列 {current}/{target}")
+
+    def show_eta(self, remaining: float, total: float):
+        """残り時間の予想を表示し、次の予想が届くまで1秒ごとに減らしていく"""
+        first = self.eta_deadline is None
+        self.eta_deadline = time.monotonic() + remaining
+        if first:
+            from eta import format_seconds
+
+            self.eta_label.config(text=f"予想 約{format_seconds(total)}")
+            print(f"予想所要時間 約{format_seconds(total)}")
+        if self._eta_after is None:
+            self._eta_after = self.root.after(1000, self.tick_eta)
+
+    def tick_eta(self):
+        """表示中の残り時間を更新する"""
+        from eta import format_seconds
+
+        self._eta_after = None
+        if not self._is_running or self.eta_deadline is None:
+            return
+        remaining = self.eta_deadline - time.monotonic()
+        if remaining > 0:
+            self.eta_label.config(text=f"残り 約{format_seconds(remaining)}")
+        else:
+            self.eta_label.config(text="まもなく完了")
+        self._eta_after = self.root.after(1000, self.tick_eta)
 
     def setup_style(self):
         """ウィジェットのスタイル設定"""
@@ -117,8 +408,6 @@ class MainGui:
             highlightthickness=0,
             background="#ffffff",
         )
-        self.logo = tk.PhotoImage(file=config.LOGO_PATH)
-        self.canvas.create_image(31, 31, image=self.logo)
 
         # パスワード入力欄
         self.input_pass_var = tk.StringVar()
@@ -136,15 +425,15 @@ class MainGui:
         self.input_pass.bind("<Return>", lambda event: self.start_date.focus_set())
         self.input_pass.bind("<Shift-Return>", self.return_focus)
 
-        # 日付選択欄用のデータ
-        self.date_data = utils.generate_date_data()
-        self.display_list = [self.date_data[i]["display"] for i in range(7)]
+        # 日付選択欄用のデータ（休業日も表示し、実行計画で除外する）
+        self.date_data = dates.generate_date_data()
+        self.display_list = [d["display"] for d in self.date_data]
         self.sublist = self.date_data[0:]
 
         # 日付選択欄（開始日）
         self.start_date = ttk.Combobox(
             self.main_frame,
-            width=14,
+            width=16,
             value=self.display_list,
             justify="center",
             state="readonly",
@@ -157,12 +446,12 @@ class MainGui:
         # 日付選択欄（終了日）
         self.end_date = ttk.Combobox(
             self.main_frame,
-            width=14,
+            width=16,
             values=self.display_list,
             justify="center",
             state="readonly",
         )
-        self.end_date.current(config.END_DATE_DEFAULT)
+        self.end_date.current(min(config.END_DATE_DEFAULT, len(self.date_data) - 1))
         self.end_date.bind("<Return>", lambda event: self.checkboxes[0].focus_set())
         self.end_date.bind("<Shift-Return>", self.return_focus)
 
@@ -187,17 +476,13 @@ class MainGui:
             self.checkboxes.append(checkbox)
 
         # ラベル（文字列）
+        greeting = utils.greet(utils.get_user_id())
         self.labels = [
-            (ttk.Label(self.main_frame, text=utils.greet(utils.userId)), 0, 1, 4, "w"),
+            (ttk.Label(self.main_frame, text=greeting), 0, 1, 4, "w"),
             (ttk.Label(self.main_frame, text="パスワード："), 1, 0, None, "e"),
             (ttk.Label(self.main_frame, text="印刷範囲："), 2, 0, None, "e"),
         ]
 
-        # プログレスバー
-        self.progressbar = ttk.Progressbar(
-            self.bottom_frame, variable=0, mode="indeterminate", orient="horizontal"
-        )
-
         # 実行ボタン
         self.execute_button = ttk.Button(
             self.bottom_frame,
@@ -210,6 +495,27 @@ class MainGui:
         self.execute_button.bind("<Return>", lambda event: self.execute_action())
         self.execute_button.bind("<Shift-Return>", self.return_focus)
 
+    def create_deferred_widgets(self):
+        """最初の描画の後に生成するウィジェット（ロゴ画像と実行中の表示）"""
+        self.logo = tk.PhotoImage(file=config.LOGO_PATH)
+        self.canvas.create_image(31, 31, image=self.logo)
+
+        # 実行中の状態表示
+        self.status_label = ttk.Label(
+            self.bottom_frame, text="", style="Progress.TLabel", width=12
+        )
+        self.concurrency_label = ttk.Label(
+            self.bottom_frame, text="", style="Progress.TLabel", width=8
+        )
+        self.eta_label = ttk.Label(
+            self.bottom_frame, text="", style="Progress.TLabel", width=14
+        )
+
+        # プログレスバー
+        self.progressbar = ttk.Progressbar(
+            self.bottom_frame, variable=0, mode="indeterminate", orient="horizontal"
+        )
+
     def arrange_frames(self):
         """フレームの配置"""
         self.main_frame.pack(side="top", fill="x", ipadx=10, ipady=7)
@@ -282,6 +588,7 @@ class MainGui:
     def execute_action(self):
         """実行ボタン押下時の処理"""
         self._is_running = True
+        self.clicked_at = time.time()
 
         self.disable_widgets()
         self.execute_button.config(state="disable")
@@ -290,15 +597,17 @@ class MainGui:
         self.root.after(300, lambda: (self.run_process()))
 
     def get_selected_options(self) -> tuple[list, list]:
-        """チェックされた項目のキーと、それに対応する処理用の値を取得"""
+        """チェックされた項目のキーと、それに対応する処理用の値（重複なし）を取得"""
+        from core import planner
+
         selected_keys = [key for key, var in self.checkbox_vars.items() if var.get()]
-        selected_values = []
-        for key in selected_keys:
-            selected_values.extend(config.PRINT_TARGET_DATA[key])
+        selected_values = list(planner.resolve_locations(selected_keys))
         return selected_keys, selected_values
 
     def cancel_action(self):
         """中止ボタン押下時の処理"""
+        from tkinter import messagebox
+
         if not self._is_running:
             return
 
@@ -310,27 +619,50 @@ class MainGui:
             config.APP_NAME, "処理を中止します。よろしいですか？", default="no"
         )
         if confirm:
-            self._is_running = False
-            if hasattr(self, "status_label"):
-                self.status_label.pack_forget()
-            if hasattr(self, "progressbar"):
-                self.progressbar.pack_forget()
-
-            self.enable_widgets()
-            self.execute_button.config(
-                text="実行", state="normal", command=self.execute_action
-            )
-            self.execute_button.bind("<Return>", lambda event: self.execute_action())
+            self.stop_worker()
+            self.reset_widgets()
         else:
-            self.progressbar.start(config.PROGRESSBAR_SPEED)
+            if str(self.progressbar.cget("mode")) == "indeterminate":
+                self.progressbar.start(config.PROGRESSBAR_SPEED)
             self.execute_button.config(state="normal")
 
+    def reset_widgets(self):
+        """実行前の状態に戻す"""
+        self._is_running = False
+        if hasattr(self, "status_label"):
+            self.status_label.pack_forget()
+        if hasattr(self, "concurrency_label"):
+            self.concurrency_label.pack_forget()
+        if hasattr(self, "eta_label"):
+            self.eta_label.pack_forget()
+        if self._eta_after is not None:
+            self.root.after_cancel(self._eta_after)
+            self._eta_after = None
+        self.eta_deadline = None
+        if hasattr(self, "progressbar"):
+            self.progressbar.stop()
+            self.progressbar.pack_forget()
+
+        self.enable_widgets()
+        self.execute_button.config(
+            text="実行", state="normal", command=self.execute_action
+        )
+        self.execute_button.bind("<Return>", lambda event: self.execute_action())
+
+        # 使ったワーカーの代わりを起動しておく
+        self.spawn_spare()
+
     def on_close(self):
         """処理中にウィンドウの閉じるボタンが押下された場合の確認"""
+        from tkinter import messagebox
+
         if self._is_running:
             if messagebox.askyesno(config.APP_NAME, "処理中です。終了しますか？"):
+                self.stop_worker()
+                self.close_spare()
                 self.root.destroy()
         else:
+            self.close_spare()
             self.root.destroy()
 
     def disable_widgets(self):
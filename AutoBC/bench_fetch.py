@@ -0,0 +1,238 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import unicodedata
+from datetime import datetime
+
+import config
+import metrics
+from core import dates, planner
+from events import Reporter
+from fetch import FetchEngine
+from printing import FileSinkPrinter
+from session_pool import SessionPool, session_class
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def start_standin(args: argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    """スタンドインを別プロセスで起動し、ログイン画面の URL を返す
+
+    計測するプロセスと GIL を取り合わないよう、同じプロセスでは動かさない。
+    """
+    cmd = [
+        sys.executable,
+        "standin_server.py",
+        "--port=0",
+        f"--latency={args.latency}",
+        f"--jitter={args.jitter}",
+        f"--error_rate={args.error_rate}",
+        f"--payload_kb={args.payload_kb}",
+        f"--seed={args.seed}",
+    ]
+    server = subprocess.Popen(
+        cmd,
+        cwd=HERE,
+        stdout=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        env={**os.environ, "PYTHONIOENCODING": "utf-8"},
+    )
+    match = re.search(r"http://\S+", server.stdout.readline())
+    if match is None:
+        server.kill()
+        raise RuntimeError("スタンドインを起動できませんでした")
+    return server, match.group(0)
+
+
+def percentile(values: list[float], p: float) -> float:
+    """最近順位法によるパーセンタイル"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * p / 100) - 1)]
+
+
+def scenarios(days_list: list[int], target_sets: list[str]) -> list[tuple]:
+    """(名前, 納期の一覧, 印刷対象) の組み合わせ（1日 × 1対象 〜 7日 × 全対象）
+
+    曜日で結果が変わらないよう、納期は今日からの稼働日で数える。
+    """
+    result = []
+    all_targets = list(config.PRINT_TARGET_DATA)
+    for days, target_set in itertools.product(days_list, target_sets):
+        targets = all_targets if target_set == "all" else all_targets[:1]
+        date_data = dates.generate_date_data(days, working_days=True)
+        date_list = [d["value"] for d in date_data if not d["closed"]]
+        result.append((f"{days}日 × {target_set}", date_list, targets))
+    return result
+
+
+def run_once(
+    date_list: list[str], targets: list[str], args, workdir: str
+) -> tuple[float, int, metrics.Trace, object]:
+    """1回の実行（ログインから印刷まで）の所要時間と段ごとの記録
+
+    注入したエラーで実行が失敗した場合、集計は None を返す。
+    """
+    plan = planner.build_plan(targets, date_list, skip_closed=False)
+    pool = SessionPool(session_class("http"), "bench", "bench", args.sessions)
+    engine = FetchEngine(
+        pool,
+        args.sessions,
+        Reporter(),
+        threading.Event(),
+        probe=args.probe,
+        printer=FileSinkPrinter(os.path.join(workdir, "sink")),
+    )
+    trace = metrics.Trace("bench", os.path.join(workdir, "trace"))
+    token = metrics.current.set(trace)
+    start = time.perf_counter()
+    stats = None
+    try:
+        stats = engine.run(plan, ranged=not args.no_coalesce)
+    except Exception as e:
+        print(f"  実行が失敗しました: {e}")
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.current.reset(token)
+        trace.close()
+        pool.close()
+    return elapsed, len(plan), trace, stats
+
+
+def measure(name: str, date_list: list[str], targets: list[str], args, workdir):
+    """1つの組み合わせを args.runs 回実行し、最後に1回メモリの最大使用量を測る
+
+    件/秒と所要時間は成功した実行だけで求め、段ごとの時間は失敗した操作も含める。
+    """
+    elapsed, durations, errors, failed, jobs, searches = [], {}, 0, 0, 0, 0
+    for _ in range(args.runs):
+        seconds, jobs, trace, stats = run_once(date_list, targets, args, workdir)
+        errors += sum(trace.errors.values())
+        if stats is None:
+            failed += 1
+        else:
+            elapsed.append(seconds)
+            searches = stats.searches
+        for stage, values in trace.durations.items():
+            durations.setdefault(stage, []).extend(values)
+
+    # tracemalloc は処理を遅くするため、時間の計測とは別に実行する
+    tracemalloc.start()
+    try:
+        run_once(date_list, targets, args, workdir)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    total = sum(elapsed)
+    return {
+        "scenario": name,
+        "jobs": jobs,
+        "searches": searches,
+        "seconds": round(total / len(elapsed), 3) if elapsed else 0.0,
+        "jobs_per_second": round(jobs * len(elapsed) / total, 2) if total else 0.0,
+        "errors": errors,
+        "failed_runs": failed,
+        "peak_kib": round(peak / 1024),
+        "stages": {
+            stage: {
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "count": len(values),
+            }
+            for stage, values in durations.items()
+        },
+    }
+
+
+def ljust(text: str, width: int) -> str:
+    """全角文字を2桁として左寄せする"""
+    used = sum(2 if unicodedata.east_asian_width(c) in "WF" else 1 for c in text)
+    return text + " " * max(0, width - used)
+
+
+def print_result(result: dict) -> None:
+    print(
+        f"\n{result['scenario']}: {result['jobs']} 件（検索 {result['searches']} 回）"
+        f" {result['seconds']:.2f} 秒、{result['jobs_per_second']:.1f} 件/秒"
+        f"、エラー {result['errors']} 回（失敗した実行 {result['failed_runs']} 回）"
+        f"、メモリ最大 {result['peak_kib']} KiB"
+    )
+    print(f"  {ljust('段', 12)}{'p50':>9}{'p95':>9}{ljust('', 3)}回数")
+    for stage, label in metrics.STAGES.items():
+        if stage in result["stages"]:
+            s = result["stages"][stage]
+            print(
+                f"  {ljust(label, 12)}{s['p50_ms']:7.1f}ms{s['p95_ms']:7.1f}ms"
+                f"{s['count']:7d}"
+            )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="スタンドインの BC受付に対する取得・印刷の性能の計測"
+    )
+    parser.add_argument(
+        "--days", type=int, nargs="+", default=[1, 7], help="納期の稼働日数"
+    )
+    parser.add_argument(
+        "--targets",
+        nargs="+",
+        choices=("1", "all"),
+        default=["1", "all"],
+        help="印刷対象（1: 先頭の1件、all: すべて）",
+    )
+    parser.add_argument("--runs", type=int, default=3, help="組み合わせごとの実行回数")
+    parser.add_argument("--sessions", type=int, default=config.FETCH_SESSIONS)
+    parser.add_argument("--no_coalesce", action="store_true")
+    parser.add_argument("--probe", action="store_true", help="事前確認を行う")
+    parser.add_argument("--latency", type=float, default=0.05, help="応答の遅延（秒）")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error_rate", type=float, default=0.0)
+    parser.add_argument("--payload_kb", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="結果を JSON Lines で追記するファイル")
+    args = parser.parse_args()
+
+    server, login_url = start_standin(args)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            # 計測の記録や印刷物を普段の保存先に残さない
+            config.LOGIN_URL = login_url
+            config.SPOOL_DIR = os.path.join(workdir, "spool")
+            config.METRICS_FILE = os.path.join(workdir, "metrics", "bench.prom")
+
+            print(
+                f"スタンドイン {login_url}（遅延 {args.latency}+{args.jitter} 秒、"
+                f"エラー率 {args.error_rate}、帳票 {args.payload_kb} KB）"
+            )
+            record = {
+                "time": datetime.now().isoformat(timespec="seconds"),
+                "options": {k: v for k, v in vars(args).items() if k != "json"},
+                "results": [],
+            }
+            for name, date_list, targets in scenarios(args.days, args.targets):
+                result = measure(name, date_list, targets, args, workdir)
+                record["results"].append(result)
+                print_result(result)
+    finally:
+        server.kill()
+        server.wait()
+
+    if args.json:
+        with open(args.json, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
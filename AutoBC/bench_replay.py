@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import config
+import metrics
+import recording
+from bench_fetch import ljust
+from core import planner
+from events import Reporter
+from fetch import FetchEngine
+from printing import FileSinkPrinter
+from session_pool import SessionPool
+
+# 記録した操作と、計測の段の対応（検索は事前確認と区別できないため合わせて比べる）
+OPERATION_STAGES = {
+    "login": ("login",),
+    "open_report": ("navigate",),
+    "search": ("search", "probe"),
+    "fetch_report": ("fetch",),
+    "clear": ("clear",),
+    "keepalive": ("keepalive",),
+    "logout": ("logout",),
+}
+
+
+def replay_once(header: dict, operations: list[dict], args, workdir: str) -> dict:
+    """記録した実行を1回再生し、所要時間と段ごとの記録を返す"""
+    options = header["options"]
+    sessions = args.sessions or options["sessions"]
+    probe = options["probe"] if args.probe is None else args.probe
+    coalesce = options["coalesce"] and not args.no_coalesce
+
+    workload = recording.Workload(operations, args.speed)
+    plan = planner.build_plan(header["targets"], header["dates"], skip_closed=False)
+    pool = SessionPool(
+        lambda: recording.ReplaySession(workload), header["user_id"], "", sessions
+    )
+    engine = FetchEngine(
+        pool,
+        sessions,
+        Reporter(),
+        threading.Event(),
+        probe=probe,
+        printer=FileSinkPrinter(os.path.join(workdir, "sink")),
+    )
+    trace = metrics.Trace(header["user_id"], os.path.join(workdir, "trace"))
+    token = metrics.current.set(trace)
+    start = time.perf_counter()
+    try:
+        stats = engine.run(plan, coalesce)
+    finally:
+        pool.close()
+        elapsed = time.perf_counter() - start
+        metrics.current.reset(token)
+        trace.close()
+    return {"seconds": elapsed, "plan": plan, "stats": stats, "trace": trace}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="process.py --record で記録した実行を、ネットワークなしで再生して比べる"
+    )
+    parser.add_argument("trace", help="process.py --record の記録ファイル")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="再生の速さ（1: 記録どおり、10: 10倍速、0: 待たない）",
+    )
+    parser.add_argument("--runs", type=int, default=1, help="再生の回数")
+    parser.add_argument("--sessions", type=int, help="省略時は記録時と同じ")
+    parser.add_argument("--no_coalesce", action="store_true")
+    parser.add_argument(
+        "--probe",
+        action=argparse.BooleanOptionalAction,
+        help="事前確認の有無（省略時は記録時と同じ）",
+    )
+    parser.add_argument("--json", help="結果を JSON Lines で追記するファイル")
+    args = parser.parse_args()
+
+    header, operations, end = recording.load(args.trace)
+    recorded = end.get("end")
+    print(
+        f"記録 {header['recorded_at']}: {len(header['targets'])} 対象 × "
+        f"{len(header['dates'])} 日、操作 {len(operations)} 回、"
+        + (f"所要 {recorded:.2f} 秒" if recorded else "所要時間なし（途中で終了）")
+    )
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        config.SPOOL_DIR = os.path.join(workdir, "spool")
+        config.METRICS_FILE = os.path.join(workdir, "metrics", "replay.prom")
+        for _ in range(args.runs):
+            results.append(replay_once(header, operations, args, workdir))
+
+    seconds = sorted(r["seconds"] for r in results)
+    median = seconds[len(seconds) // 2]
+    line = f"再生 {median:.2f} 秒（{args.speed:g} 倍速、{args.runs} 回の中央値）"
+    if recorded and args.speed > 0:
+        expected = recorded / args.speed
+        line += f"、記録からの想定 {expected:.2f} 秒に対して {median / expected:.1%}"
+    print(line)
+    print(results[-1]["stats"].summary(results[-1]["plan"]))
+
+    # 操作ごとの所要時間の合計を、記録と最後の再生で比べる
+    durations = results[-1]["trace"].durations
+    print(f"\n  {ljust('操作', 14)}{'記録':>10}{'再生':>10}")
+    for op, stages in OPERATION_STAGES.items():
+        before = sum(r["sec"] for r in operations if r["op"] == op)
+        after = sum(sum(durations.get(stage, [])) for stage in stages)
+        if before or after:
+            print(f"  {ljust(op, 14)}{before:9.2f}s{after:9.2f}s")
+
+    if args.json:
+        record = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "trace": os.path.basename(args.trace),
+            "speed": args.speed,
+            "recorded_seconds": recorded,
+            "replay_seconds": [round(s, 3) for s in seconds],
+        }
+        with open(args.json, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# GUI を生成し、最初の描画の直後に各区間の時間（ミリ秒）を JSON で出力して終了する
+FIRST_PAINT = """
+import json, time
+t0 = time.perf_counter()
+import app_gui
+t1 = time.perf_counter()
+gui = app_gui.MainGui()
+t2 = time.perf_counter()
+gui.spawn_spare = lambda: None  # 計測ではワーカーを起動しない
+create_deferred_widgets = gui.create_deferred_widgets
+
+def after_first_paint():
+    t3 = time.perf_counter()
+    create_deferred_widgets()
+    t4 = time.perf_counter()
+    print(json.dumps({
+        "import": (t1 - t0) * 1000,
+        "build": (t2 - t1) * 1000,
+        "first_paint": (t3 - t0) * 1000,
+        "deferred": (t4 - t3) * 1000,
+    }))
+    gui.root.destroy()
+
+gui.after_first_paint = after_first_paint
+gui.run()
+"""
+
+
+def python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=HERE,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        env={**os.environ, "PYTHONIOENCODING": "utf-8"},
+    )
+
+
+def wall_time(*args: str) -> float:
+    """プロセスの起動から終了までの時間（ミリ秒）"""
+    start = time.perf_counter()
+    python(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def import_times(module: str) -> dict[str, tuple[float, float]]:
+    """-X importtime の出力から、モジュールごとの (自身, 累計) の読み込み時間（ミリ秒）"""
+    result = python("-X", "importtime", "-c", f"import {module}")
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        times[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+    return times
+
+
+def first_paint() -> dict[str, float]:
+    """GUI の読み込み、生成、最初の描画までの時間（ミリ秒）"""
+    result = python("-c", FIRST_PAINT)
+    lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+    if result.returncode != 0 or not lines:
+        message = (result.stderr.strip().splitlines() or ["不明なエラー"])[-1]
+        raise RuntimeError(message)
+    return json.loads(lines[-1])
+
+
+def median_of(samples: list[dict]) -> dict:
+    return {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="GUI の起動時間の計測")
+    parser.add_argument(
+        "--runs", type=int, default=5, help="計測の回数（中央値を表示）"
+    )
+    parser.add_argument(
+        "--module", default="app_gui", help="読み込み時間を計測するモジュール"
+    )
+    parser.add_argument("--top", type=int, default=15, help="表示するモジュールの数")
+    parser.add_argument("--json", help="結果を JSON Lines で追記するファイル")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        help="モジュールの読み込み時間の上限（ミリ秒）、超えたら終了コード 1",
+    )
+    args = parser.parse_args()
+
+    record = {"time": datetime.now().isoformat(timespec="seconds")}
+
+    interpreter = statistics.median(wall_time("-c", "pass") for _ in range(args.runs))
+    process = statistics.median(
+        wall_time("-c", f"import {args.module}") for _ in range(args.runs)
+    )
+    record["interpreter_ms"] = round(interpreter, 1)
+    record["process_ms"] = round(process, 1)
+    print(f"インタプリタの起動: {interpreter:.1f} ms")
+    print(f"import {args.module} を含むプロセス全体: {process:.1f} ms")
+
+    try:
+        samples = [import_times(args.module) for _ in range(args.runs)]
+    except RuntimeError as e:
+        print(f"読み込み時間を計測できませんでした: {e}")
+        return 1
+    names = set.intersection(*(set(s) for s in samples))
+    modules = {
+        name: (
+            statistics.median(s[name][0] for s in samples),
+            statistics.median(s[name][1] for s in samples),
+        )
+        for name in names
+    }
+    total = modules[args.module][1]
+    record["import_ms"] = round(total, 2)
+    record["modules"] = {name: round(v[1], 2) for name, v in modules.items()}
+
+    print(f"\nimport {args.module}: {total:.2f} ms（自身の時間の大きい順）")
+    print(f"{'自身':>9} {'累計':>9}  モジュール")
+    ranked = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)
+    for name, (self_ms, cumulative_ms) in ranked[: args.top]:
+        print(f"{self_ms:9.2f} {cumulative_ms:9.2f}  {name}")
+
+    try:
+        paint = median_of([first_paint() for _ in range(args.runs)])
+    except RuntimeError as e:
+        print(f"\n最初の描画までの時間を計測できませんでした: {e}")
+    else:
+        record["first_paint"] = {k: round(v, 1) for k, v in paint.items()}
+        print(
+            f"\n最初の描画まで {paint['first_paint']:.1f} ms"
+            f"（読み込み {paint['import']:.1f} ms、画面の生成 {paint['build']:.1f} ms）"
+            f"、描画後の生成 {paint['deferred']:.1f} ms"
+        )
+
+    if args.json:
+        with open(args.json, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    if args.budget is not None and total > args.budget:
+        print(f"\n読み込み時間が上限 {args.budget:.1f} ms を超えています")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
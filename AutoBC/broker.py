@@ -0,0 +1,255 @@
+import hashlib
+import itertools
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Connection, Listener
+
+import config
+from core import planner
+from events import JsonReporter, Reporter, replay
+from scheduler import Scheduler, TenantSource
+from session_pool import SessionPool, session_class
+
+
+class ConnectionReporter(JsonReporter):
+    """進捗イベントをブローカーの接続先（ワーカー）へ送る"""
+
+    def __init__(self, conn: Connection):
+        super().__init__()
+        self.conn = conn
+
+    def write(self, event: dict) -> None:
+        with self._lock:
+            try:
+                self.conn.send(event)
+            except OSError:
+                pass  # ワーカーが切断した後のイベントは捨てる
+
+
+def load_authkey() -> bytes:
+    """ブローカー接続用の認証キーを読み込む（なければ生成する）"""
+    path = os.path.join(config.DATA_DIR, "broker.key")
+    if not os.path.exists(path):
+        os.makedirs(config.DATA_DIR, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(secrets.token_bytes(32))
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class Broker:
+    """ログイン済みのセッションを保持し続け、実行のたびに貸し出す常駐プロセス
+
+    ユーザーIDと操作方法の組ごとに SessionPool を持ち、最後の実行から
+    BROKER_IDLE_TIMEOUT 秒が経つとすべてログアウトして終了する。
+    プールは使用中の実行の数を数え、パスワードが変わって作り直した古いプールは、
+    使用中の実行がすべて返すまで閉じない（取得の途中でセッションを失わないため）。
+    同時に届いた実行要求どうしは Scheduler で取得を共有し、セッションを公平に分け合う。
+    """
+
+    def __init__(self):
+        self.pools = {}  # (user_id, 操作方法) -> (パスワードのハッシュ, SessionPool)
+        self.users = {}  # SessionPool -> 使用中の実行の数
+        self.retired = set()  # 作り直した後、使用中の実行が残っているプール
+        self.scheduler = Scheduler()
+        self.runs = itertools.count(1)
+        self.active_runs = 0
+        self.last_active = time.monotonic()
+        self._lock = threading.Lock()
+
+    def get_pool(
+        self, user_id: str, password: str, backend: str = config.SESSION_BACKEND
+    ) -> SessionPool:
+        """ユーザーのセッションプールを借りる（パスワードが変わっていれば作り直す）
+
+        使い終わったら release_pool で返す。
+        """
+        digest = hashlib.sha256(password.encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self.pools.get((user_id, backend))
+            if entry and entry[0] == digest:
+                self.users[entry[1]] += 1
+                return entry[1]
+            pool = SessionPool(session_class(backend), user_id, password)
+            self.pools[(user_id, backend)] = (digest, pool)
+            self.users[pool] = 1
+            old = None
+            if entry:
+                self.retired.add(entry[1])
+                old = self._take_retired(entry[1])
+        if old:
+            old.close()
+        return pool
+
+    def release_pool(self, pool: SessionPool) -> None:
+        with self._lock:
+            self.users[pool] -= 1
+            old = self._take_retired(pool)
+        if old:
+            old.close()
+
+    def _take_retired(self, pool: SessionPool) -> SessionPool | None:
+        """作り直した後で使用中の実行がなくなったプールを外す（_lock を取得して呼ぶ）"""
+        if pool in self.retired and self.users[pool] == 0:
+            self.retired.discard(pool)
+            del self.users[pool]
+            return pool
+        return None
+
+    def handle(self, conn: Connection) -> None:
+        """ワーカー1件分の実行要求を処理する"""
+        import process
+
+        with conn:
+            try:
+                request = conn.recv()
+            except (EOFError, OSError):
+                return  # 要求を送らずに切断した（待機中のワーカーの終了）
+            with self._lock:
+                self.active_runs += 1
+            pool = None
+            try:
+                plan = planner.build_plan(request["targets"], request["dates"])
+                done = {planner.Job(*job) for job in request.get("done", ())}
+                pool = self.get_pool(
+                    request["user_id"],
+                    request["password"],
+                    request["options"].get("backend", config.SESSION_BACKEND),
+                )
+                tenant = f"{request['user_id']}#{next(self.runs)}"
+                source = TenantSource(pool, self.scheduler, tenant)
+                cancel = threading.Event()
+                result = {"code": 1}
+
+                def execute():
+                    result["code"] = process.execute(
+                        source,
+                        plan,
+                        request["options"],
+                        ConnectionReporter(conn),
+                        cancel,
+                        self.scheduler,
+                        request["user_id"],
+                        done,
+                    )
+
+                runner = threading.Thread(target=execute, daemon=True)
+                runner.start()
+                while runner.is_alive():
+                    try:
+                        if conn.poll(0.1) and conn.recv() == "cancel":
+                            cancel.set()
+                    except (EOFError, OSError):
+                        cancel.set()  # ワーカーが終了した
+                        runner.join()
+                        return
+                conn.send({"event": "exit", "code": result["code"]})
+            finally:
+                if pool is not None:
+                    self.release_pool(pool)
+                with self._lock:
+                    self.active_runs -= 1
+                    self.last_active = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            pools = {pool for _, pool in self.pools.values()} | self.retired
+            self.pools, self.retired = {}, set()
+        for pool in pools:
+            pool.close()
+
+    def watch_idle(self) -> None:
+        """一定時間実行がなければログアウトしてプロセスを終了する"""
+        while True:
+            time.sleep(10)
+            with self._lock:
+                idle = self.active_runs == 0 and (
+                    time.monotonic() - self.last_active > config.BROKER_IDLE_TIMEOUT
+                )
+            if idle:
+                self.close()
+                os._exit(0)
+
+    def serve(self) -> None:
+        try:
+            listener = Listener(config.BROKER_ADDRESS, authkey=load_authkey())
+        except OSError:
+            return  # 既に起動している
+
+        threading.Thread(target=self.watch_idle, daemon=True).start()
+        with listener:
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    print(f"接続を受け付けられませんでした: {e}")
+                    continue
+                threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+
+def start_broker() -> None:
+    """ブローカーを呼び出し元から切り離して起動する"""
+    if sys.platform == "win32":
+        options = {
+            "creationflags": subprocess.DETACHED_PROCESS
+            | subprocess.CREATE_NEW_PROCESS_GROUP
+            | subprocess.CREATE_NO_WINDOW
+        }
+    else:
+        options = {"start_new_session": True}
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        **options,
+    )
+
+
+def connect(start: bool = True) -> Connection | None:
+    """ブローカーへ接続する（起動していなければ起動を待つ）"""
+    authkey = load_authkey()
+    deadline = time.monotonic() + config.BROKER_START_TIMEOUT
+    started = False
+    while True:
+        try:
+            return Client(config.BROKER_ADDRESS, authkey=authkey)
+        except OSError:
+            if not start or time.monotonic() > deadline:
+                return None
+            if not started:
+                start_broker()
+                started = True
+            time.sleep(0.2)
+
+
+def run_remote(
+    conn: Connection, request: dict, reporter: Reporter, cancel: threading.Event
+) -> int:
+    """ブローカーに実行を依頼し、進捗を reporter へ中継する"""
+    conn.send(request)
+    cancel_sent = False
+    while True:
+        if cancel.is_set() and not cancel_sent:
+            conn.send("cancel")
+            cancel_sent = True
+        if not conn.poll(0.1):
+            continue
+        event = conn.recv()
+        if event["event"] == "exit":
+            return event["code"]
+        replay(reporter, event)
+
+
+def main() -> None:
+    Broker().serve()
+
+
+if __name__ == "__main__":
+    main()
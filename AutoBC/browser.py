@@ -0,0 +1,131 @@
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.ie.options import Options
+from selenium.webdriver.ie.service import Service
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+import config
+from fetch import SearchResult, is_truncated
+from session_pool import SessionExpired
+
+
+class BrowserSession:
+    """IEモードのEdgeでBC受付の帳票検索画面を操作するセッション"""
+
+    def __init__(self):
+        ie_options = Options()
+        ie_options.attach_to_edge_chrome = True
+        ie_options.edge_executable_path = config.MS_EDGE_PATH
+
+        driver_service = Service(executable_path=config.IE_DRIVER_PATH)
+        self.driver = webdriver.Ie(service=driver_service, options=ie_options)
+
+    def wait_for(self, name: str, timeout: float = config.WAIT_TIMEOUT):
+        """name属性の要素が表示されるまで待機して返す"""
+        return WebDriverWait(self.driver, timeout).until(
+            EC.presence_of_element_located((By.NAME, name))
+        )
+
+    def accept_alert(self, timeout: float = config.WAIT_TIMEOUT) -> bool:
+        """アラートが表示されればOKを押す"""
+        try:
+            WebDriverWait(self.driver, timeout).until(EC.alert_is_present())
+            self.driver.switch_to.alert.accept()
+            return True
+        except Exception:
+            return False
+
+    def fill(self, name: str, value: str) -> None:
+        """入力欄の内容を置き換える"""
+        input_field = self.driver.find_element(By.NAME, name)
+        input_field.send_keys(Keys.CONTROL, "a")
+        input_field.send_keys(Keys.BACKSPACE)
+        input_field.send_keys(value)
+
+    def login(self, user_id: str, password: str) -> None:
+        """ログイン画面"""
+        self.driver.get(config.LOGIN_URL)
+
+        self.wait_for("userId").send_keys(user_id)
+        self.driver.find_element(By.NAME, "userPwd").send_keys(password)
+        self.driver.find_element(By.NAME, "loginButton").click()
+
+    def open_report(self) -> None:
+        """メニュー選択画面から帳票検索画面へ移動"""
+        dropdown_list = self.wait_for("menuList")
+        dropdown_list.click()
+        for _ in range(8):
+            dropdown_list.send_keys(Keys.ARROW_DOWN)
+        dropdown_list.send_keys(Keys.ENTER)
+
+        dropdown_list = self.wait_for("reportList")  # 帳票
+        dropdown_list.click()
+        for _ in range(5):
+            dropdown_list.send_keys(Keys.ARROW_DOWN)
+        dropdown_list.send_keys(Keys.ENTER)
+
+    def search(self, location: str, date_from: str, date_to: str) -> SearchResult:
+        """受渡場所と納期で検索し、明細を返す"""
+        self.fill("locationCode", location)  # 受渡場所
+        self.fill("proDateFrom", date_from)  # 納期（開始日）
+        self.fill("proDateTo", date_to)  # 納期（終了日）
+        self.driver.find_element(By.NAME, "searchButton").click()  # 検索[F4]
+
+        # 帳票出力画面
+        self.wait_for("clearReturn")
+        rows = [
+            tuple(cell.text for cell in tr.find_elements(By.TAG_NAME, "td"))
+            for tr in self.driver.find_elements(
+                By.XPATH, "//input[starts-with(@name, 'checkbox')]/ancestor::tr[1]"
+            )
+        ]
+        return SearchResult(rows, is_truncated(len(rows)))
+
+    def fetch_report(self) -> bytes:
+        """出力[F12]で開いた出力画面の内容を取得して閉じる"""
+        handles = set(self.driver.window_handles)
+        main_window = self.driver.current_window_handle
+        self.driver.find_element(By.NAME, "printButton").click()
+
+        WebDriverWait(self.driver, config.WAIT_TIMEOUT).until(
+            lambda driver: set(driver.window_handles) - handles
+        )
+        (output_window,) = set(self.driver.window_handles) - handles
+        self.driver.switch_to.window(output_window)
+        try:
+            WebDriverWait(self.driver, config.WAIT_TIMEOUT).until(
+                lambda driver: driver.execute_script("return document.readyState")
+                == "complete"
+            )
+            return self.driver.page_source.encode("utf-8")
+        finally:
+            self.driver.close()
+            self.driver.switch_to.window(main_window)
+
+    def clear(self) -> None:
+        """戻る[F8]で検索画面へ戻る"""
+        self.driver.find_element(By.NAME, "clearReturn").click()
+        if not self.accept_alert():
+            print("アラートが表示されませんでした")
+
+    def keepalive(self) -> None:
+        """帳票検索画面を再読み込みしてサーバー側のセッションを延長する"""
+        self.driver.refresh()
+        try:
+            self.wait_for("locationCode")
+        except Exception:
+            raise SessionExpired("帳票検索画面に戻れませんでした")
+
+    def logout(self) -> None:
+        """ログアウト"""
+        try:
+            self.wait_for("logout").click()
+            self.accept_alert()
+        except Exception as e:
+            print(f"ログアウト処理中にエラー発生: {e}")
+
+    def close(self) -> None:
+        """Edgeを終了"""
+        self.driver.quit()
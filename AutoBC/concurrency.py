@@ -0,0 +1,87 @@
+import asyncio
+
+import config
+
+
+class AimdController:
+    """検索の同時実行数を AIMD（加算増加・乗算減少）で調整する
+
+    応答が安定している間は、同時実行数 target 件の完了ごとに target を
+    AIMD_INCREASE だけ増やす。平滑化した応答時間が最良値の
+    AIMD_LATENCY_FACTOR 倍を超えるか、エラー率が AIMD_ERROR_RATE を超えた場合は
+    target に AIMD_DECREASE を掛けて減らす。減少は1周期（target 件の完了）に1回まで。
+    """
+
+    def __init__(self, max_limit: int, on_change=None):
+        self.min_limit = 1
+        self.max_limit = max(1, max_limit)
+        self.limit = float(min(config.AIMD_INITIAL, self.max_limit))
+        self.in_flight = 0
+        self.on_change = on_change
+
+        self.latency = None  # 平滑化した応答時間（秒）
+        self.best_latency = None
+        self.error_rate = 0.0
+        self._since_decrease = 0
+        self._condition = asyncio.Condition()
+
+    @property
+    def current(self) -> int:
+        """実行中の検索数"""
+        return self.in_flight
+
+    @property
+    def target(self) -> int:
+        """許可している同時実行数"""
+        return int(self.limit)
+
+    async def acquire(self) -> None:
+        """同時実行数に空きができるまで待機する"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.target)
+            self.in_flight += 1
+        self._notify()
+
+    async def release(self, latency: float, ok: bool) -> None:
+        """検索1回分の応答時間と成否を記録し、同時実行数を調整する"""
+        async with self._condition:
+            self.in_flight -= 1
+            self._update(latency, ok)
+            self._condition.notify_all()
+        self._notify()
+
+    async def release_unused(self) -> None:
+        """検索を行わずに枠を返す（応答時間は記録しない）"""
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+        self._notify()
+
+    def _update(self, latency: float, ok: bool) -> None:
+        alpha = config.AIMD_SMOOTHING
+        self.error_rate += alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += alpha * (latency - self.latency)
+            if self.best_latency is None or self.latency < self.best_latency:
+                self.best_latency = self.latency
+
+        self._since_decrease += 1
+        congested = not ok or self.error_rate > config.AIMD_ERROR_RATE
+        if self.latency is not None and self.best_latency is not None:
+            congested |= self.latency > self.best_latency * config.AIMD_LATENCY_FACTOR
+
+        if congested:
+            if self._since_decrease >= self.target:
+                self.limit = max(self.min_limit, self.limit * config.AIMD_DECREASE)
+                self._since_decrease = 0
+        else:
+            self.limit = min(
+                self.max_limit, self.limit + config.AIMD_INCREASE / self.target
+            )
+
+    def _notify(self) -> None:
+        if self.on_change:
+            self.on_change(self.current, self.target)
@@ -1,8 +1,16 @@
+import os
+import sys
+
 APP_NAME = "PrintBot - BC受付自動印刷"
 APP_VERSION = "1.0"
 
 LOGIN_URL = ""
 
+DATA_DIR = os.path.join(os.getenv("APPDATA") or os.path.expanduser("~"), "PrintBot")
+
+MS_EDGE_PATH = r"C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe"
+IE_DRIVER_PATH = "./IEDriverServer.exe"
+
 ICON_PATH = "./resources/python_logo.ico"
 LOGO_PATH = "./resources/python_logo.png"
 
@@ -17,8 +25,125 @@ DATE_RANGE = 7
 START_DATE_DEFAULT = 0
 END_DATE_DEFAULT = DATE_RANGE - 1
 
+# 稼働日（土日、祝日、SITE_CLOSURES の日は納期の一覧に「休」と付け、検索しない）
+SKIP_CLOSED_DAYS = True
+COUNT_WORKING_DAYS = False  # True: DATE_RANGE を稼働日の日数として数える
+WORKING_WEEKDAYS = (0, 1, 2, 3, 4)  # 月〜金
+SITE_CLOSURES = ()  # 拠点の休業日（毎年なら "%m/%d"、その年だけなら "%Y/%m/%d"）
+HOLIDAY_CACHE = os.path.join(DATA_DIR, "holidays.json")
+
 INPUT_LIMIT = 14
 
 CHECKBOX_DEFAULT = 1
 
 PROGRESSBAR_SPEED = 10
+EVENT_POLL_INTERVAL = 50  # ワーカーの進捗イベントを取り込む間隔（ミリ秒）
+CANCEL_TIMEOUT = 3000  # 中止指示からワーカーを強制終了するまでの猶予（ミリ秒）
+
+# 画面の停止の検出（メインループの心拍が遅れたら、その間のスタックを記録する）
+STALL_WATCHDOG = True
+STALL_HEARTBEAT = 50  # 心拍の間隔（ミリ秒）
+STALL_THRESHOLD = 0.25  # 停止とみなす心拍の遅れ（秒）
+STALL_LOG = os.path.join(DATA_DIR, "stalls.jsonl")
+STALL_LOG_MAX = 1024 * 1024  # バイト（超えたら .1 に移して新しく書き始める）
+
+# main.py --profile の計測結果
+PROFILE_DIR = os.path.join(DATA_DIR, "profile")
+PROFILE_KEEP = 20  # 残す計測結果の数
+PROFILE_TOP = 40  # gui.txt と memory.txt に書き出す上位の件数
+PROFILE_TRACEBACK = 10  # tracemalloc が記録する呼び出し元の深さ
+
+# BC受付の操作方法（"browser": IEモードのEdge、"http": フォームを直接送信）
+# IEモードのEdgeは Windows でしか動かないため、それ以外では http を使う
+SESSION_BACKEND = "browser" if sys.platform == "win32" else "http"
+
+WAIT_TIMEOUT = 10
+SKIP_IF_EMPTY = True
+PROBE_EMPTY = True  # 該当なしの組み合わせを事前の一括検索で除外する
+
+COALESCE_DATES = True
+SEARCH_ROW_LIMIT = 100
+RESULT_DATE_COLUMN = 1
+
+FETCH_SESSIONS = 3
+# 失敗した検索を別のセッションでやり直す回数（超えたら実行を失敗にする）
+FETCH_RETRIES = 3
+
+# 同時実行数の自動調整（AIMD）
+AIMD_INITIAL = 1
+AIMD_INCREASE = 1.0
+AIMD_DECREASE = 0.5
+AIMD_LATENCY_FACTOR = 2.0
+AIMD_ERROR_RATE = 0.2
+AIMD_SMOOTHING = 0.2
+
+# ログイン済みセッションを保持する常駐ブローカー
+USE_BROKER = True
+BROKER_ADDRESS = ("127.0.0.1", 50507)
+BROKER_START_TIMEOUT = 10  # 秒
+BROKER_IDLE_TIMEOUT = 30 * 60  # 秒
+KEEPALIVE_INTERVAL = 4 * 60  # 秒（サーバー側のセッション期限より短くする）
+SCHEDULER_MAX_SESSIONS = 6  # 全実行要求で同時に使うセッション数の上限
+
+# 帳票キャッシュ（受渡場所 × 納期）
+USE_CACHE = True
+CACHE_TTL = (10 * 60, 60 * 60, 3 * 60 * 60)  # 秒（今日、明日、それ以降）
+
+# 取得 → 変換 → 印刷 のパイプライン
+PIPELINE_QUEUE_SIZE = 4
+SPOOL_DIR = os.path.join(DATA_DIR, "spool")  # 実行ごとのサブディレクトリに書き出す
+SPOOL_MAX_AGE = 60 * 60  # 秒（削除されずに残った実行のサブディレクトリを消すまで）
+
+# 段ごとの所要時間の記録（実行ごとの JSON Lines と、Prometheus の textfile 形式）
+TRACE_DIR = os.path.join(DATA_DIR, "trace")
+TRACE_KEEP = 100  # 残す実行の記録の数
+METRICS_FILE = os.path.join(DATA_DIR, "metrics", "printbot.prom")
+METRIC_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # 秒
+
+# 残り時間の予想（段ごとの所要時間の履歴から求め、実行中の進み具合で補正する）
+ETA_HISTORY = os.path.join(DATA_DIR, "eta.json")
+ETA_MAX_OFFSET = 7  # 納期がこの日数以上先のものは同じ扱いにする
+ETA_MIN_SAMPLES = 3  # これより少ない組み合わせは受渡場所ごと、段ごとの平均を使う
+ETA_SMOOTHING = 0.2  # 移動平均の重み（新しい実行ほど重くする）
+ETA_PARALLELISM = 1.5  # 履歴がない場合の並列度
+ETA_PRIOR_JOBS = 4  # 実際の進み具合による補正を、この件数分の完了で半分まで効かせる
+ETA_DEFAULT_SECONDS = {  # 履歴がない場合の段ごとの時間（秒）
+    "login": 3.0,
+    "navigate": 1.0,
+    "search": 1.5,
+    "fetch": 2.0,
+    "clear": 0.5,
+    "print": 1.0,
+    "logout": 0.5,
+}
+
+# 夜間の事前取得（process.py --prefetch をタスクスケジューラーで実行する）
+USE_STAGING = True  # 朝の実行で、明細が変わっていない事前取得分をそのまま印刷する
+STAGING_DIR = os.path.join(DATA_DIR, "staging")
+STAGING_MAX_AGE = 24 * 60 * 60  # 秒（これより古い事前取得分は使わない）
+
+# 実行の記録（中止や異常終了の後、未完了のジョブだけを続きから実行する）
+USE_JOURNAL = True
+JOURNAL_DIR = os.path.join(DATA_DIR, "journal")
+JOURNAL_SYNC_BATCH = 16  # この件数ごとに fsync する
+JOURNAL_SYNC_INTERVAL = 0.5  # 秒（件数に満たなくてもこの間隔で fsync する）
+JOURNAL_MAX_AGE = 24 * 60 * 60  # 秒（これより古い記録からは続きを実行しない）
+
+# 印刷ジョブのまとめ方と印刷先
+BATCH_MAX_SIZE = 8  # 1回の印刷ジョブにまとめる帳票の上限
+BATCH_MAX_WAIT = 2.0  # バッチの最初の帳票から送信までの最大待ち時間（秒）
+# (プリンター名, 用紙)、プリンター名が空なら既定のプリンター
+DEFAULT_PRINTER = ("", "A4")
+PRINTERS = {}  # 受渡場所 -> (プリンター名, 用紙)
+PRINT_SINK_DIR = ""  # 指定するとプリンターへ送らずにこのディレクトリへ書き出す
+
+# 感熱プリンター（WS-S300M、python -m thermal でロットラベルを印刷する）
+THERMAL_PORT = ""  # シリアルポート（例: /dev/ttyUSB0）
+THERMAL_BAUDRATE = 9600  # 8N1、XON/XOFF
+THERMAL_MAX_DOTS = 576  # 印字幅（ドット）
+THERMAL_FONT_WIDTH = 12  # フォントAの1文字の幅（ドット）
+THERMAL_CHUNK = 256  # 送信中にしてよいバイト数（プリンターの受信バッファの余裕）
+THERMAL_ENCODING = "cp932"
+THERMAL_LOGO_WIDTH = 384  # ラベルの先頭の画像の幅（ドット）
+THERMAL_RASTER_BAND = 256  # GS v 0 の1コマンドあたりの行数
+THERMAL_RASTER_CACHE = os.path.join(DATA_DIR, "raster")  # 変換済みのラスター
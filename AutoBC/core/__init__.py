@@ -0,0 +1 @@
+"""GUI にも Windows にも依存しない処理（実行計画、納期の一覧）"""
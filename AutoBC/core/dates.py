@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+import config
+from core import workdays
+
+DATE_FORMAT = "%y/%m/%d"  # 納期の値
+WEEKDAYS = "月火水木金土日"
+
+
+def display_date(date: datetime) -> str:
+    """日付の表示用文字列（例: 4月1日（火））
+
+    ロケールや Windows 専用の書式（%#m）に頼らずに組み立てる。
+    """
+    return f"{date.month}月{date.day}日（{WEEKDAYS[date.weekday()]}）"
+
+
+def generate_date_data(
+    days: int = config.DATE_RANGE, working_days: bool = config.COUNT_WORKING_DAYS
+) -> list:
+    """今日から days 日分の日付リストの生成
+
+    休業日も一覧に含め、"closed" に理由（祝日名など）を入れて表示に「休」を付ける。
+    working_days が True の場合は、稼働日が days 日になるまで（最長1年）並べる。
+    """
+    today = datetime.today()
+    data = []
+    working = 0
+
+    for i in range(366 if working_days else days):
+        if working_days and working >= days:
+            break
+        date = today + timedelta(days=i)
+        closed = workdays.closed_reason(date.date())
+        display = display_date(date) + ("休" if closed else "")
+        value = date.strftime(DATE_FORMAT)
+        data.append({"display": display, "value": value, "closed": closed})
+        working += not closed
+
+    return data
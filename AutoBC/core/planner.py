@@ -0,0 +1,177 @@
+from dataclasses import dataclass, field
+from datetime import date as date_type
+from datetime import datetime, timedelta
+
+import config
+from core import workdays
+from core.dates import DATE_FORMAT
+
+
+@dataclass(frozen=True)
+class Job:
+    """1回の検索・印刷単位（納期 × 受渡場所）"""
+
+    date: str
+    location: str
+
+
+@dataclass
+class Plan:
+    """重複を除いた実行順のジョブ一覧"""
+
+    jobs: list[Job] = field(default_factory=list)
+    sources: dict[Job, list[str]] = field(default_factory=dict)
+    closed: dict[str, str] = field(default_factory=dict)  # 除外した納期 -> 理由
+
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+    @property
+    def dates(self) -> list[str]:
+        """ジョブに含まれる納期（実行順・重複なし）"""
+        return list(dict.fromkeys(job.date for job in self.jobs))
+
+    @property
+    def locations(self) -> list[str]:
+        """ジョブに含まれる受渡場所（実行順・重複なし）"""
+        return list(dict.fromkeys(job.location for job in self.jobs))
+
+    @property
+    def merged(self) -> dict[Job, list[str]]:
+        """複数の印刷対象から要求され、1件に統合されたジョブ"""
+        return {job: keys for job, keys in self.sources.items() if len(keys) > 1}
+
+    def without(self, jobs: set[Job]) -> "Plan":
+        """指定したジョブを除いた実行計画を返す"""
+        return Plan(
+            [job for job in self.jobs if job not in jobs],
+            {job: keys for job, keys in self.sources.items() if job not in jobs},
+            self.closed,
+        )
+
+    def explain(self) -> str:
+        """統合内容を人が読める形式で返す"""
+        requested = sum(len(keys) for keys in self.sources.values())
+        lines = [
+            f"要求 {requested} 件 → 実行 {len(self.jobs)} 件"
+            f"（統合 {requested - len(self.jobs)} 件）"
+        ]
+        for job, keys in self.merged.items():
+            lines.append(f"  {job.date} {job.location} ← {', '.join(keys)}")
+        if self.closed:
+            closed = "、".join(f"{d}（{r}）" for d, r in self.closed.items())
+            lines.append(f"休業日のため除外: {closed}")
+        return "\n".join(lines)
+
+
+def resolve_locations(selected_keys: list[str]) -> dict[str, list[str]]:
+    """印刷対象のキーから受渡場所ごとの要求元キーを求める（選択順を保持）"""
+    locations = {}
+    for key in selected_keys:
+        for location in config.PRINT_TARGET_DATA[key]:
+            locations.setdefault(location, []).append(key)
+    return locations
+
+
+def build_plan(
+    selected_keys: list[str],
+    selected_date_list: list[str],
+    skip_closed: bool = config.SKIP_CLOSED_DAYS,
+) -> Plan:
+    """印刷対象 × 納期から重複のないジョブ一覧を生成する
+
+    Args:
+        selected_keys: チェックされた印刷対象（PRINT_TARGET_DATA のキー）
+        selected_date_list: 納期の値（generate_date_data の "value"）
+        skip_closed: True の場合は休業日の納期を除外する
+
+    Returns:
+        Plan: 納期順、同一納期内は受渡場所の初出順に並んだジョブ一覧
+    """
+    locations = resolve_locations(selected_keys)
+    plan = Plan()
+    for date in dict.fromkeys(selected_date_list):
+        if skip_closed:
+            reason = workdays.closed_reason(parse_date(date))
+            if reason:
+                plan.closed[date] = reason
+                continue
+        for location, keys in locations.items():
+            job = Job(date, location)
+            plan.jobs.append(job)
+            plan.sources[job] = list(keys)
+    return plan
+
+
+@dataclass(frozen=True)
+class Query:
+    """1回の検索単位（受渡場所 × 連続する納期の範囲）"""
+
+    location: str
+    jobs: tuple[Job, ...]
+
+    @property
+    def date_from(self) -> str:
+        return self.jobs[0].date
+
+    @property
+    def date_to(self) -> str:
+        return self.jobs[-1].date
+
+
+def date_offset(date: str) -> int:
+    """納期の値（%y/%m/%d）が今日から何日先か"""
+    due = datetime.strptime(date, DATE_FORMAT).date()
+    return (due - datetime.today().date()).days
+
+
+def parse_date(date: str) -> date_type:
+    return datetime.strptime(date, DATE_FORMAT).date()
+
+
+def is_next_day(prev: str, date: str) -> bool:
+    """納期の値（%y/%m/%d）が前日の翌日かどうか"""
+    delta = datetime.strptime(date, DATE_FORMAT) - datetime.strptime(prev, DATE_FORMAT)
+    return delta == timedelta(days=1)
+
+
+def is_contiguous(prev: str, date: str) -> bool:
+    """1回の範囲検索にまとめてよいか（翌日か、間がすべて休業日）
+
+    間の休業日に明細があった場合は、検索した側が日別の検索に切り替える。
+    """
+    if is_next_day(prev, date):
+        return True
+    return config.SKIP_CLOSED_DAYS and workdays.only_closed_between(
+        parse_date(prev), parse_date(date)
+    )
+
+
+def coalesce(plan: Plan, ranged: bool = True) -> list[Query]:
+    """ジョブを受渡場所ごとに連続する納期の範囲検索へまとめる
+
+    間に休業日しかない納期どうし（金曜日と月曜日など）も連続とみなす。
+
+    Args:
+        plan: 実行計画
+        ranged: False の場合はまとめずに1ジョブ1検索とする
+
+    Returns:
+        list[Query]: 受渡場所の初出順、同一受渡場所内は納期順の検索一覧
+    """
+    if not ranged:
+        return [Query(job.location, (job,)) for job in plan.jobs]
+
+    queries = []
+    for location in plan.locations:
+        run = []
+        for job in plan.jobs:
+            if job.location != location:
+                continue
+            if run and not is_contiguous(run[-1].date, job.date):
+                queries.append(Query(location, tuple(run)))
+                run = []
+            run.append(job)
+        if run:
+            queries.append(Query(location, tuple(run)))
+    return queries
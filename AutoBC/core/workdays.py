@@ -0,0 +1,135 @@
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+
+import config
+
+# 日付が固定の祝日
+FIXED_HOLIDAYS = {
+    (1, 1): "元日",
+    (2, 11): "建国記念の日",
+    (2, 23): "天皇誕生日",
+    (4, 29): "昭和の日",
+    (5, 3): "憲法記念日",
+    (5, 4): "みどりの日",
+    (5, 5): "こどもの日",
+    (8, 11): "山の日",
+    (11, 3): "文化の日",
+    (11, 23): "勤労感謝の日",
+}
+
+# 第n月曜日の祝日（月, n）
+MONDAY_HOLIDAYS = {
+    (1, 2): "成人の日",
+    (7, 3): "海の日",
+    (9, 3): "敬老の日",
+    (10, 2): "スポーツの日",
+}
+
+_holidays = {}  # 年 -> {日付の値: 祝日名}
+
+
+def nth_monday(year: int, month: int, n: int) -> date:
+    first = date(year, month, 1)
+    return first + timedelta(days=(7 - first.weekday()) % 7 + 7 * (n - 1))
+
+
+def compute_holidays(year: int) -> dict[date, str]:
+    """祝日法の規則から1年分の祝日を求める（2099年まで有効な春分・秋分の近似式を使う）
+
+    臨時の移動（五輪の年など）は反映されないため、必要なら HOLIDAY_CACHE を直接直す。
+    """
+    days = {date(year, m, d): name for (m, d), name in FIXED_HOLIDAYS.items()}
+    for (month, n), name in MONDAY_HOLIDAYS.items():
+        days[nth_monday(year, month, n)] = name
+    leap = (year - 1980) // 4
+    days[date(year, 3, int(20.8431 + 0.242194 * (year - 1980)) - leap)] = "春分の日"
+    days[date(year, 9, int(23.2488 + 0.242194 * (year - 1980)) - leap)] = "秋分の日"
+
+    # 国民の休日（祝日に挟まれた平日）
+    for day in sorted(days):
+        between = day + timedelta(days=1)
+        if (
+            between + timedelta(days=1) in days
+            and between not in days
+            and between.weekday() != 6
+        ):
+            days[between] = "国民の休日"
+
+    # 振替休日（日曜日の祝日の後の、最初の祝日でない日）
+    for day in sorted(days):
+        if day.weekday() == 6:
+            substitute = day + timedelta(days=1)
+            while substitute in days:
+                substitute += timedelta(days=1)
+            days[substitute] = "振替休日"
+    return days
+
+
+def holidays(year: int) -> dict[str, str]:
+    """1年分の祝日（%Y/%m/%d -> 祝日名）
+
+    初めて使う年は規則から求めて HOLIDAY_CACHE に保存し、以後はそのファイルを正とする。
+    """
+    key = str(year)
+    if key in _holidays:
+        return _holidays[key]
+
+    try:
+        with open(config.HOLIDAY_CACHE, encoding="utf-8") as f:
+            table = json.load(f)
+    except (OSError, ValueError):
+        table = {}
+    if key not in table:
+        computed = compute_holidays(year)
+        table[key] = {f"{d:%Y/%m/%d}": computed[d] for d in sorted(computed)}
+        try:
+            save(table)
+        except OSError:
+            pass  # 保存できなくても、その都度求めれば足りる
+    _holidays.update(table)
+    return _holidays[key]
+
+
+def save(table: dict) -> None:
+    """HOLIDAY_CACHE を一時ファイル（書き込みごとに別の名前）経由で書き直す"""
+    directory = os.path.dirname(config.HOLIDAY_CACHE)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix="holidays.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(table, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, config.HOLIDAY_CACHE)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def closed_reason(day: date) -> str:
+    """休業日ならその理由（祝日名、"休業日"、"休日"）、稼働日なら空文字"""
+    if {f"{day:%m/%d}", f"{day:%Y/%m/%d}"} & set(config.SITE_CLOSURES):
+        return "休業日"
+    name = holidays(day.year).get(f"{day:%Y/%m/%d}")
+    if name:
+        return name
+    if day.weekday() not in config.WORKING_WEEKDAYS:
+        return "休日"
+    return ""
+
+
+def is_working_day(day: date) -> bool:
+    return not closed_reason(day)
+
+
+def only_closed_between(start: date, end: date) -> bool:
+    """start と end の間（両端を除く）がすべて休業日かどうか"""
+    day = start + timedelta(days=1)
+    while day < end:
+        if is_working_day(day):
+            return False
+        day += timedelta(days=1)
+    return True
@@ -0,0 +1,223 @@
+import json
+import os
+import threading
+import time
+
+import config
+from core import planner
+from events import ForwardingReporter, Reporter
+from metrics import file_lock, write_atomic
+
+# 検索1回ごとにかかる段（事前確認は検索を減らす分と相殺するとみなして数えない）
+QUERY_STAGES = ("search", "fetch", "clear")
+# 実行の最初と最後に1回ずつかかる段
+FIXED_STAGES = ("login", "navigate", "logout")
+# 検索せずに終わるジョブの状態（予想から外す）
+FREE_STATUSES = ("cached", "duplicate", "staged")
+
+_history_lock = threading.Lock()
+
+
+def offset_bucket(date: str) -> int:
+    """納期の値を、今日から何日先か（ETA_MAX_OFFSET 以上はまとめる）に変換する"""
+    try:
+        offset = planner.date_offset(date)
+    except ValueError:
+        return 0
+    return max(0, min(offset, config.ETA_MAX_OFFSET))
+
+
+def format_seconds(seconds: float) -> str:
+    """所要時間の表示（1分以上は10秒単位）"""
+    if seconds < 60:
+        return f"{max(1, round(seconds))}秒"
+    minutes, rest = divmod(round(seconds / 10) * 10, 60)
+    return f"{minutes}分{rest:02d}秒" if rest else f"{minutes}分"
+
+
+class History:
+    """段ごとの所要時間の履歴（受渡場所 × 納期の日数ごとの移動平均）
+
+    ETA_HISTORY の JSON に、段|受渡場所|日数 ごとの [平均, 回数] と、
+    実行全体の並列度（検索の段の合計時間 / 実行時間）を持つ。平均は最初の数回は
+    単純平均、その後は ETA_SMOOTHING の指数移動平均で更新する。
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or config.ETA_HISTORY
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+        self.stages = self.data.setdefault("stages", {})
+
+    @property
+    def runs(self) -> int:
+        return self.data.get("runs", 0)
+
+    def mean(self, stage: str, location: str = "", offset: int = None) -> float:
+        """段の平均所要時間（履歴が少なければ受渡場所ごと、段ごとの平均に戻る）"""
+        for key in (f"{stage}|{location}|{offset}", f"{stage}|{location}|*"):
+            entry = self.stages.get(key)
+            if entry and entry[1] >= config.ETA_MIN_SAMPLES:
+                return entry[0]
+        entry = self.stages.get(f"{stage}|*|*")
+        if entry:
+            return entry[0]
+        return config.ETA_DEFAULT_SECONDS.get(stage, 0.0)
+
+    @staticmethod
+    def update(table: dict, key: str, value: float) -> None:
+        mean, count = table.get(key, (0.0, 0))
+        count += 1
+        mean += (value - mean) * max(1 / count, config.ETA_SMOOTHING)
+        table[key] = [round(mean, 4), count]
+
+    def learn(self, trace_path: str, seconds: float) -> None:
+        """1回の実行の記録（metrics.Trace のファイル）と実行時間を履歴に加える
+
+        同時に終わった他の実行が学習した分を上書きしないよう、プロセス間のロックの
+        中でファイルを読み直してから加えて書き出す。
+        """
+        try:
+            with open(trace_path, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f]
+        except (OSError, ValueError):
+            return
+        records = [r for r in records if r["ok"]]
+        fetched = {
+            (r["location"], r["date_from"], r["date_to"])
+            for r in records
+            if r["stage"] == "fetch"
+        }
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with _history_lock, file_lock(self.path):
+            self.load()
+            work = fixed = 0.0
+            for r in records:
+                stage = r["stage"]
+                if stage in FIXED_STAGES or stage == "print":
+                    self.update(self.stages, f"{stage}|*|*", r["seconds"])
+                    fixed += r["seconds"] if stage in FIXED_STAGES else 0.0
+                    continue
+                if stage not in QUERY_STAGES and stage != "probe":
+                    continue
+                work += r["seconds"]
+                if stage == "probe":
+                    continue
+                offset = offset_bucket(r["date_from"])
+                keys = (
+                    f"{stage}|{r['location']}|{offset}",
+                    f"{stage}|{r['location']}|*",
+                    f"{stage}|*|*",
+                )
+                for key in keys:
+                    self.update(self.stages, key, r["seconds"])
+                if stage == "search":
+                    # 明細があって出力まで進んだ割合
+                    hit = (r["location"], r["date_from"], r["date_to"]) in fetched
+                    self.update(self.stages, f"hit|{r['location']}|{offset}", hit)
+                    self.update(self.stages, f"hit|{r['location']}|*", hit)
+                    self.update(self.stages, "hit|*|*", hit)
+
+            # ログインは各セッションで並列に行われるため、1回分を固定の時間とみなす
+            logins = sum(1 for r in records if r["stage"] == "login")
+            fixed = fixed / max(1, logins)
+            if work and seconds > fixed:
+                self.update(self.data, "parallelism", work / (seconds - fixed))
+            self.data["runs"] = self.runs + 1
+            write_atomic(self.path, json.dumps(self.data, ensure_ascii=False))
+
+    def estimate(
+        self, plan: planner.Plan, ranged: bool = True, sessions: int = 1
+    ) -> "Estimate":
+        """実行計画の所要時間を予想する"""
+        costs = {}
+        for query in planner.coalesce(plan, ranged):
+            offset = offset_bucket(query.date_from)
+            hit = self.mean("hit", query.location, offset) if self.runs else 1.0
+            cost = (
+                self.mean("search", query.location, offset)
+                + self.mean("clear", query.location, offset)
+                + hit * self.mean("fetch", query.location, offset)
+            )
+            for job in query.jobs:
+                costs[job] = cost / len(query.jobs)
+
+        fixed = sum(self.mean(stage) for stage in FIXED_STAGES)
+        parallelism = self.data.get("parallelism", [config.ETA_PARALLELISM])[0]
+        parallelism = max(1.0, min(parallelism, sessions))
+        return Estimate(fixed, costs, parallelism, self.mean("print"))
+
+
+class Estimate:
+    """実行中の残り時間の予想
+
+    履歴から求めたジョブごとの時間で予想し、ジョブが終わるにつれて
+    実際の進み具合（予想より速いか遅いか）で補正する。
+    """
+
+    def __init__(
+        self,
+        fixed: float,
+        costs: dict[planner.Job, float],
+        parallelism: float,
+        tail: float,
+    ):
+        self.fixed = fixed
+        self.costs = dict(costs)
+        self.parallelism = parallelism
+        self.tail = tail  # 最後の取得から印刷が終わるまで
+        self.started = time.monotonic()
+        self.done_cost = 0.0
+        self.done = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total(self) -> float:
+        """開始前の予想（検索せずに終わったジョブは除く）"""
+        with self._lock:
+            work = self.done_cost + sum(self.costs.values())
+        return self.fixed + work / self.parallelism + self.tail
+
+    def finished(self, job: planner.Job, status: str) -> None:
+        with self._lock:
+            cost = self.costs.pop(job, None)
+            if cost is None or status in FREE_STATUSES:
+                return
+            self.done_cost += cost
+            self.done += 1
+
+    def remaining(self) -> float:
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            remaining = sum(self.costs.values()) / self.parallelism + self.tail
+            if not self.done:
+                return max(0.0, self.fixed - elapsed) + remaining
+            expected = self.fixed + self.done_cost / self.parallelism
+            factor = min(4.0, max(0.25, elapsed / expected))
+            weight = self.done / (self.done + config.ETA_PRIOR_JOBS)
+        return remaining * (1 + (factor - 1) * weight)
+
+
+class EtaReporter(ForwardingReporter):
+    """進捗通知を中継しながら、実行計画の通知とジョブの完了ごとに残り時間を送る"""
+
+    def __init__(self, reporter: Reporter, estimate: Estimate):
+        super().__init__(reporter)
+        self.estimate = estimate
+
+    def plan(self, total: int) -> None:
+        super().plan(total)
+        self.estimate.started = time.monotonic()
+        self.eta(self.estimate.remaining(), self.estimate.total)
+
+    def job_finished(self, job, status: str, size: int = 0) -> None:
+        self.estimate.finished(job, status)
+        super().job_finished(job, status, size)
+        self.eta(self.estimate.remaining(), self.estimate.total)
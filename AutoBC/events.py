@@ -0,0 +1,191 @@
+import json
+import sys
+import threading
+import time
+
+from core.planner import Job
+
+
+class Reporter:
+    """ワーカーの進捗通知（何も出力しない）"""
+
+    def started(self, warm: bool) -> None:
+        """最初の要求を送る直前（warm: 待機中のワーカーで実行したか）"""
+        pass
+
+    def plan(self, total: int) -> None:
+        pass
+
+    def job_started(self, job) -> None:
+        pass
+
+    def job_finished(self, job, status: str, size: int = 0) -> None:
+        pass
+
+    def error(self, message: str) -> None:
+        pass
+
+    def concurrency(self, current: int, target: int) -> None:
+        pass
+
+    def eta(self, remaining: float, total: float) -> None:
+        """残り時間と全体の所要時間の予想（秒）"""
+        pass
+
+    def timings(self, summary: str) -> None:
+        """段ごとの所要時間の1行の要約"""
+        pass
+
+    def done(self, summary: str) -> None:
+        pass
+
+
+class ForwardingReporter(Reporter):
+    """進捗通知をすべて別の Reporter へ中継する（処理を加えるメソッドだけ上書きして使う）"""
+
+    def __init__(self, reporter: Reporter):
+        self.reporter = reporter
+
+    def started(self, warm: bool) -> None:
+        self.reporter.started(warm)
+
+    def plan(self, total: int) -> None:
+        self.reporter.plan(total)
+
+    def job_started(self, job) -> None:
+        self.reporter.job_started(job)
+
+    def job_finished(self, job, status: str, size: int = 0) -> None:
+        self.reporter.job_finished(job, status, size)
+
+    def error(self, message: str) -> None:
+        self.reporter.error(message)
+
+    def concurrency(self, current: int, target: int) -> None:
+        self.reporter.concurrency(current, target)
+
+    def eta(self, remaining: float, total: float) -> None:
+        self.reporter.eta(remaining, total)
+
+    def timings(self, summary: str) -> None:
+        self.reporter.timings(summary)
+
+    def done(self, summary: str) -> None:
+        self.reporter.done(summary)
+
+
+class TextReporter(Reporter):
+    """進捗を人が読める形式で標準出力に表示する"""
+
+    def __init__(self):
+        self._last_target = None
+        self._estimated = False
+
+    def error(self, message: str) -> None:
+        print(f"エラー: {message}", flush=True)
+
+    def concurrency(self, current: int, target: int) -> None:
+        if target != self._last_target:
+            self._last_target = target
+            print(f"並列 {current}/{target}", flush=True)
+
+    def eta(self, remaining: float, total: float) -> None:
+        if not self._estimated:
+            from eta import format_seconds
+
+            self._estimated = True
+            print(f"予想所要時間 約{format_seconds(total)}", flush=True)
+
+    def timings(self, summary: str) -> None:
+        print(summary, flush=True)
+
+    def done(self, summary: str) -> None:
+        print(summary, flush=True)
+
+
+class JsonReporter(Reporter):
+    """進捗イベントを1行1件の JSON としてパイプへ書き出す（GUI 連携用）"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **data) -> None:
+        self.write({"event": event, **data})
+
+    def write(self, event: dict) -> None:
+        """イベントを1行の JSON として書き出す"""
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def started(self, warm: bool) -> None:
+        self.emit("started", warm=warm, at=time.time())
+
+    def plan(self, total: int) -> None:
+        self.emit("plan", total=total)
+
+    def job_started(self, job) -> None:
+        self.emit("job_started", date=job.date, location=job.location)
+
+    def job_finished(self, job, status: str, size: int = 0) -> None:
+        self.emit(
+            "job_finished",
+            date=job.date,
+            location=job.location,
+            status=status,
+            bytes=size,
+        )
+
+    def error(self, message: str) -> None:
+        self.emit("error", message=message)
+
+    def concurrency(self, current: int, target: int) -> None:
+        self.emit("concurrency", current=current, target=target)
+
+    def eta(self, remaining: float, total: float) -> None:
+        self.emit("eta", remaining=round(remaining, 1), total=round(total, 1))
+
+    def timings(self, summary: str) -> None:
+        self.emit("timings", summary=summary)
+
+    def done(self, summary: str) -> None:
+        self.emit("done", summary=summary)
+
+
+def parse_event(line: str) -> dict | None:
+    """ワーカーの出力1行をイベントとして解釈する（イベント以外は None）"""
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    if isinstance(event, dict) and "event" in event:
+        return event
+    return None
+
+
+def replay(reporter: Reporter, event: dict) -> None:
+    """別プロセスから受け取ったイベントを reporter へ中継する"""
+    if isinstance(reporter, JsonReporter):
+        reporter.write(event)
+        return
+
+    kind = event["event"]
+    if kind == "plan":
+        reporter.plan(event["total"])
+    elif kind == "job_started":
+        reporter.job_started(Job(event["date"], event["location"]))
+    elif kind == "job_finished":
+        job = Job(event["date"], event["location"])
+        reporter.job_finished(job, event["status"], event.get("bytes", 0))
+    elif kind == "error":
+        reporter.error(event["message"])
+    elif kind == "concurrency":
+        reporter.concurrency(event["current"], event["target"])
+    elif kind == "eta":
+        reporter.eta(event["remaining"], event["total"])
+    elif kind == "timings":
+        reporter.timings(event["summary"])
+    elif kind == "done":
+        reporter.done(event["summary"])
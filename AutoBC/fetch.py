@@ -0,0 +1,583 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+
+import config
+from concurrency import AimdController
+from core import planner
+from events import Reporter
+from metrics import span
+from pipeline import Pipeline, Report
+from printing import default_printer
+from report_cache import ReportCache
+from session_pool import SessionExpired
+from staging import StagingArea, digest_rows
+
+
+@dataclass
+class SearchResult:
+    """帳票検索の結果（1行 = 明細のセル文字列のタプル）"""
+
+    rows: list[tuple[str, ...]] = field(default_factory=list)
+    truncated: bool = False
+
+    def split_by_date(self) -> dict[str, list[tuple[str, ...]]]:
+        """明細を納期の値（%y/%m/%d）ごとに振り分ける"""
+        by_date = {}
+        for row in self.rows:
+            date = normalize_date(row[config.RESULT_DATE_COLUMN])
+            by_date.setdefault(date, []).append(row)
+        return by_date
+
+
+@dataclass
+class FetchStats:
+    """検索回数の集計"""
+
+    searches: int = 0
+    fallbacks: int = 0
+    printed: int = 0
+    print_jobs: int = 0
+    empty: int = 0
+    cached: int = 0
+    cache_misses: int = 0
+    probes: int = 0
+    probed_empty: int = 0
+    shared: int = 0
+    staged: int = 0
+    retries: int = 0
+
+    def merge(self, other: "FetchStats") -> None:
+        for f in fields(self):
+            setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+
+    def summary(self, plan: planner.Plan) -> str:
+        return (
+            f"検索 {self.searches} 回（日別検索 {len(plan)} 回相当）"
+            f"、再検索 {self.fallbacks} 回、印刷 {self.printed} 件、該当なし {self.empty} 件"
+            f"、取得済み {self.cached} 件"
+            f"、事前確認 {self.probes} 回で {self.probed_empty} 件を除外"
+            f"、印刷ジョブ {self.print_jobs} 件"
+            f"、他の要求と共有 {self.shared} 件"
+            f"、事前取得で保存 {self.staged} 件"
+            f"、失敗した検索の再試行 {self.retries} 回"
+        )
+
+    def cache_summary(self) -> str:
+        return f"キャッシュ 命中 {self.cached} 件、未命中 {self.cache_misses} 件"
+
+
+def normalize_date(text: str) -> str:
+    """検索結果の納期表示を納期の値（%y/%m/%d）にそろえる"""
+    text = text.strip()
+    for fmt in ("%Y/%m/%d", "%y/%m/%d", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt).strftime(planner.DATE_FORMAT)
+        except ValueError:
+            continue
+    return text
+
+
+def is_truncated(row_count: int) -> bool:
+    """検索結果が表示上限に達している（明細が欠けている可能性がある）かどうか"""
+    return row_count >= config.SEARCH_ROW_LIMIT
+
+
+class FetchEngine:
+    """複数のセッションを並列に動かし、実行計画の検索を分担する
+
+    同時に実行する検索の数は AimdController がサーバーの応答に応じて調整する。
+
+    Args:
+        source: acquire/release でセッションを貸し出す供給元（SessionPool など）
+        sessions: 同時にログインするセッション数（同時実行数の上限）
+        reporter: 進捗の通知先
+        cancel: セットされると実行中の検索の完了後に停止する threading.Event
+        cache: 帳票キャッシュ（有効期間内のジョブは検索せず、保存した帳票を印刷する）
+        refresh: True の場合はキャッシュを参照せずにすべて取得し直す
+        probe: True の場合は該当なしの組み合わせを事前に確認して除外する
+        printer: 取得した帳票の印刷先（SystemPrinter または FileSinkPrinter）
+        printer_name: 指定するとすべての帳票をこのプリンターへ送る
+        flights: 他の実行要求と取得中のジョブを共有する Scheduler（ブローカー用）
+        staging: 事前取得した帳票の置き場所
+        prefetch: True の場合は印刷せずに、変換した帳票を staging へ置く
+        printed: 以前の実行で印刷済みのジョブ（続きから実行する場合）
+    """
+
+    def __init__(
+        self,
+        source,
+        sessions: int = config.FETCH_SESSIONS,
+        reporter: Reporter | None = None,
+        cancel: threading.Event | None = None,
+        cache: ReportCache | None = None,
+        refresh: bool = False,
+        probe: bool = config.PROBE_EMPTY,
+        printer=None,
+        printer_name: str = "",
+        flights=None,
+        staging: StagingArea = None,
+        prefetch: bool = False,
+        printed: set[planner.Job] = None,
+    ):
+        self.source = source
+        self.sessions = sessions
+        self.reporter = reporter or Reporter()
+        self.cancel = cancel or threading.Event()
+        self.cache = cache
+        self.refresh = refresh
+        self.probe = probe
+        self.printer = printer or default_printer()
+        self.printer_name = printer_name
+        self.flights = flights
+        self._owned = set()  # 取得を担当しているジョブ（flights 使用時）
+        self.staging = staging
+        self.prefetch = prefetch
+        self.printed = set(printed or ())
+        self._staged = []  # 事前取得分から印刷したジョブ
+        self.pipeline = None
+        self.controller = None
+        self._found = {}  # 事前確認で明細が見つかった納期（受渡場所ごと）
+        self._digests = {}  # 検索で得た明細のハッシュ（staging 使用時）
+        self._failures = {}  # 検索 -> 失敗した回数
+
+    def fetch_query(
+        self, session, query: planner.Query, stats: FetchStats
+    ) -> list[Report]:
+        """範囲検索を1回行い、結果を納期ごとに振り分けて帳票を取得する
+
+        表示上限で結果が切り捨てられた場合と、間の休業日の明細が含まれていた場合
+        （日別の検索なら印刷しない分）は、日別の検索に切り替える。
+        """
+        for job in query.jobs:
+            self.reporter.job_started(job)
+        return self.search_and_fetch(session, query, stats)
+
+    def search_and_fetch(
+        self, session, query: planner.Query, stats: FetchStats
+    ) -> list[Report]:
+        tags = (query.location, query.date_from, query.date_to)
+        with span("search", *tags):
+            result = session.search(*tags)
+        stats.searches += 1
+
+        by_date = result.split_by_date()
+        closed = set(by_date) - {job.date for job in query.jobs}
+        if (result.truncated or closed) and len(query.jobs) > 1:
+            with span("clear", *tags):
+                session.clear()
+            reports = []
+            for job in query.jobs:
+                stats.fallbacks += 1
+                single = planner.Query(job.location, (job,))
+                reports += self.search_and_fetch(session, single, stats)
+            return reports
+
+        self.record_digests(query, by_date)
+        payload = b""
+        if result.rows or not config.SKIP_IF_EMPTY:
+            with span("fetch", *tags):
+                payload = session.fetch_report() or b""
+        with span("clear", *tags):
+            session.clear()
+
+        report = Report(payload)
+        counts = {job: len(by_date.get(job.date, [])) for job in query.jobs}
+        for job, rows in counts.items():
+            if self.cache:
+                self.cache.store(job, payload, rows)
+            if rows:
+                report.rows[job] = rows
+            else:
+                stats.empty += 1
+                self.reporter.job_finished(job, "empty")
+        self.share(payload, counts)
+        return [report] if payload else []
+
+    def record_digests(self, query: planner.Query, by_date: dict) -> None:
+        """事前取得した帳票と比べるため、ジョブごとの明細のハッシュを記録する"""
+        if self.staging is not None:
+            for job in query.jobs:
+                self._digests[job] = digest_rows(by_date.get(job.date, []))
+
+    def share(self, payload: bytes, counts: dict[planner.Job, int]) -> None:
+        """取得結果を、同じジョブを待っている他の実行要求へ渡す"""
+        if self.flights is not None:
+            self.flights.complete(payload, counts)
+            self._owned.difference_update(counts)
+
+    async def print_cached(self, plan: planner.Plan, stats: FetchStats) -> planner.Plan:
+        """キャッシュが有効期間内のジョブを取得し直さずに印刷へ回し、残りの実行計画を返す
+
+        範囲検索の帳票は複数の納期の明細を含むため、同じ帳票を参照するジョブが
+        すべて有効期間内で計画に含まれる場合だけ使う（一部だけなら計画にない納期まで
+        印刷されるので取得し直す）。明細のないジョブは印刷せずに完了とする。
+        """
+        if self.cache is None:
+            return plan
+        if self.refresh:
+            stats.cache_misses += len(plan)
+            return plan
+
+        entries = {}
+        for job in plan.jobs:
+            entry = self.cache.lookup(job)
+            if entry is not None:
+                entries[job] = entry
+
+        used, reports = set(), {}
+        for job, entry in entries.items():
+            if not entry["rows"]:
+                used.add(job)
+                stats.cached += 1
+                self.reporter.job_started(job)
+                self.reporter.job_finished(job, "cached")
+                continue
+            digest = entry["hash"]
+            if digest not in reports:
+                reports[digest] = await self.load_cached(entry, entries)
+            report = reports[digest]
+            if report is not None:
+                report.rows[job] = entry["rows"]
+
+        for report in reports.values():
+            if report is None:
+                continue
+            for job in report.rows:
+                used.add(job)
+                stats.cached += 1
+                self.reporter.job_started(job)
+            await self.pipeline.submit(report)
+        stats.cache_misses += len(plan) - len(used)
+        return plan.without(used)
+
+    async def load_cached(self, entry: dict, entries: dict) -> Report | None:
+        """キャッシュの帳票を読み込む（計画外・期限切れのジョブと共有していれば None）"""
+        sharing = self.cache.sharing(entry["hash"])
+        if any(entries.get(job, {}).get("hash") != entry["hash"] for job in sharing):
+            return None
+        try:
+            payload = await asyncio.to_thread(self.cache.load, entry)
+        except OSError:
+            return None
+        return Report(payload) if payload else None
+
+    def probe_empty(self, plan: planner.Plan, ranged: bool) -> list[planner.Query]:
+        """事前確認の検索一覧（受渡場所ごとに全期間を1回で検索する）
+
+        範囲検索1回で済む受渡場所は本検索そのものが確認を兼ねるため対象外とする。
+        """
+        per_location = {}
+        for query in planner.coalesce(plan, ranged):
+            per_location.setdefault(query.location, []).append(query)
+
+        probes = []
+        for location, queries in per_location.items():
+            if len(queries) > 1 and location not in self._found:
+                jobs = tuple(job for query in queries for job in query.jobs)
+                probes.append(planner.Query(location, jobs))
+        return probes
+
+    def probe_query(self, session, query: planner.Query, stats: FetchStats) -> None:
+        """全期間を検索し、明細のある納期を記録する（印刷はしない）"""
+        tags = (query.location, query.date_from, query.date_to)
+        with span("probe", *tags):
+            result = session.search(*tags)
+        with span("clear", *tags):
+            session.clear()
+        stats.probes += 1
+        if not result.truncated:
+            by_date = result.split_by_date()
+            self._found[query.location] = set(by_date)
+            self.record_digests(query, by_date)
+
+    def skip_empty(self, plan: planner.Plan, stats: FetchStats) -> planner.Plan:
+        """事前確認で明細がなかったジョブを完了扱いにし、残りの実行計画を返す"""
+        empty = set()
+        for job in plan.jobs:
+            found = self._found.get(job.location)
+            if found is None or job.date in found:
+                continue
+            empty.add(job)
+            stats.probed_empty += 1
+            if self.cache:
+                self.cache.store(job, b"", 0)
+            self.share(b"", {job: 0})
+            self.reporter.job_started(job)
+            self.reporter.job_finished(job, "empty")
+        return plan.without(empty)
+
+    async def print_staged(self, plan: planner.Plan, stats: FetchStats) -> planner.Plan:
+        """事前取得した帳票のうち明細が変わっていないものをすぐ印刷し、残りの実行計画を返す
+
+        受渡場所ごとに全期間を1回ずつ検索して明細のハッシュを比べ、
+        変わったもの（と置いていないもの）だけを取得し直す。
+        """
+        if self.staging is None or self.prefetch:
+            return plan
+        staged = {}
+        for job in plan.jobs:
+            entry = self.staging.lookup(job)
+            if entry is not None:
+                staged[job] = entry
+        if not staged:
+            return plan
+
+        locations = {job.location for job in staged}
+        probes = []
+        for location in sorted(locations):
+            jobs = [job for job in plan.jobs if job.location == location]
+            jobs.sort(key=lambda job: planner.date_offset(job.date))
+            probes.append(planner.Query(location, tuple(jobs)))
+        await self.run_queries(probes, self.probe_query, stats)
+
+        used = []
+        for job, entry in staged.items():
+            if self.cancel.is_set() or self._digests.get(job) != entry["digest"]:
+                continue
+            report = await asyncio.to_thread(self.staging.report, job, entry)
+            if report is None:
+                continue
+            used.append(job)
+            if self.cache:
+                self.cache.store(job, report.payload, entry["rows"])
+            self.reporter.job_started(job)
+            await self.pipeline.submit(report)
+        self.staging.used += len(used)
+        # 印刷するものは印刷し終えてから外す（変換済みのファイルを消さないように）
+        self.staging.discard([job for job in staged if job not in used])
+        self._staged = used
+        return plan.without(set(used))
+
+    async def deliver(self, report: Report, stats: FetchStats) -> None:
+        """取得した帳票を印刷へ回す（事前取得では変換して置いておく）"""
+        if not self.prefetch:
+            await self.pipeline.submit(report)
+            return
+        await asyncio.to_thread(self.staging.stage, report, self._digests)
+        for job in report.rows:
+            stats.staged += 1
+            self.reporter.job_finished(job, "staged", report.size_of(job))
+
+    def attach(self, plan: planner.Plan) -> tuple[planner.Plan, dict]:
+        """他の実行要求が取得中のジョブを計画から外し、その結果の待ち受けを返す"""
+        if self.flights is None:
+            return plan, {}
+        attached = self.flights.claim(plan.jobs)
+        self._owned = set(plan.jobs) - set(attached)
+        return plan.without(set(attached)), attached
+
+    async def follow(self, attached: dict, stats: FetchStats) -> list[planner.Job]:
+        """他の要求の取得結果を待って自分の印刷先へ送り、自分で取得し直すジョブを返す
+
+        範囲検索の帳票は他の要求の納期の明細も含むことがあるため、明細のあるジョブが
+        すべて自分の計画に含まれる場合だけ印刷する（print_cached と同じ条件）。
+        """
+        pending = {job: asyncio.wrap_future(f) for job, f in attached.items()}
+        for job in pending:
+            self.reporter.job_started(job)
+        refetch = []
+        while pending and not self.cancel.is_set():
+            await asyncio.wait(
+                pending.values(), timeout=0.5, return_when=asyncio.FIRST_COMPLETED
+            )
+            done = [job for job, future in pending.items() if future.done()]
+            for job in done:
+                if job not in pending:
+                    continue  # 同じ帳票の分として処理済み
+                future = pending.pop(job)
+                try:
+                    payload, counts = future.result()
+                except Exception:
+                    refetch.append(job)
+                    continue
+
+                # 同じ検索で取得されたジョブはまとめて1件の帳票として印刷する
+                report = Report(payload)
+                foreign = any(rows and j not in attached for j, rows in counts.items())
+                for shared in [job] + [j for j in list(pending) if j in counts]:
+                    pending.pop(shared, None)
+                    if counts[shared] and foreign:
+                        refetch.append(shared)
+                        continue
+                    stats.shared += 1
+                    if counts[shared]:
+                        report.rows[shared] = counts[shared]
+                    else:
+                        stats.empty += 1
+                        self.reporter.job_finished(shared, "empty")
+                if report.rows:
+                    await self.pipeline.submit(report)
+        return refetch
+
+    def should_yield(self) -> bool:
+        """供給元が公平のためにセッションの返却を求めているか（TenantSource のみ）"""
+        should_yield = getattr(self.source, "should_yield", None)
+        return should_yield is not None and should_yield()
+
+    def handle(self, handler, session, query: planner.Query, stats: FetchStats):
+        """handler を呼ぶ（途中で期限切れになったセッションはログインし直し、1回だけやり直す）"""
+        try:
+            return handler(session, query, stats)
+        except SessionExpired:
+            relogin = getattr(self.source, "relogin", None)
+            if relogin is None:
+                raise
+            relogin(session)
+            return handler(session, query, stats)
+
+    async def run_session(
+        self, queue: asyncio.Queue, handler, errors: list[Exception]
+    ) -> FetchStats:
+        """1つのセッションで共有キューが空になるまで handler を呼び続ける
+
+        検索が失敗したらセッションを破棄して新しいセッションに替え、検索をキューへ
+        戻す（失敗は AimdController へ伝わり同時実行数が下がる）。同じ検索が
+        FETCH_RETRIES 回を超えて失敗した場合と、セッションを用意できなかった場合は
+        errors に加えて集計を返す。
+        """
+        stats = FetchStats()
+        session = None
+        try:
+            session = await asyncio.to_thread(self.source.acquire)
+            while not queue.empty() and not self.cancel.is_set():
+                # 他の実行要求がセッションを待っていれば、返却して並び直す
+                if self.should_yield():
+                    await asyncio.to_thread(self.source.release, session, True)
+                    session = None
+                    session = await asyncio.to_thread(self.source.acquire)
+                await self.controller.acquire()
+                if queue.empty() or self.cancel.is_set():
+                    await self.controller.release_unused()
+                    break
+                query = queue.get_nowait()
+                started = time.monotonic()
+                attempt = FetchStats()
+                try:
+                    reports = await asyncio.to_thread(
+                        self.handle, handler, session, query, attempt
+                    )
+                except Exception as e:
+                    await self.controller.release(time.monotonic() - started, False)
+                    failures = self._failures[query] = self._failures.get(query, 0) + 1
+                    if failures > config.FETCH_RETRIES:
+                        # やり直しても成功しなかった検索だけをエラーとして通知する
+                        self.reporter.error(
+                            f"{query.location} {query.date_from}: "
+                            f"{failures} 回失敗しました（{e}）"
+                        )
+                        errors.insert(0, e)
+                    else:
+                        # 別のセッションで（自分か残りのワーカーが）やり直す
+                        stats.retries += 1
+                        queue.put_nowait(query)
+                    await asyncio.to_thread(self.source.release, session, False)
+                    session = None
+                    session = await asyncio.to_thread(self.source.acquire)
+                    continue
+                await self.controller.release(time.monotonic() - started, True)
+                stats.merge(attempt)
+                # 印刷が追いつくまでは次の検索に進まない
+                for report in reports or ():
+                    await self.deliver(report, stats)
+        except Exception as e:
+            if session is not None:
+                raise
+            # ログインできないなど、セッションを用意できなかった（検索はキューに残る）
+            errors.append(e)
+        finally:
+            if session is not None:
+                await asyncio.to_thread(self.source.release, session, True)
+        return stats
+
+    async def run_async(self, plan: planner.Plan, ranged: bool = True) -> FetchStats:
+        """実行計画を検索・印刷し、全セッションの集計を返す"""
+        self.reporter.plan(len(plan))
+        stats = FetchStats()
+
+        # セッションの操作はブロッキングなので、セッション数と変換・印刷の段の分の
+        # スレッドを確保する
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=max(1, self.sessions) + 2)
+        )
+        self.controller = AimdController(self.sessions, self.reporter.concurrency)
+        self.pipeline = Pipeline(
+            self.printer,
+            self.reporter,
+            self.cancel,
+            printer_name=self.printer_name,
+            printed=self.printed,
+        )
+        self.pipeline.start()
+        try:
+            plan = await self.print_cached(plan, stats)
+            plan = await self.print_staged(plan, stats)
+            plan, attached = self.attach(plan)
+            follower = asyncio.create_task(self.follow(attached, stats))
+            try:
+                await self.fetch_plan(plan, ranged, stats)
+            finally:
+                if self.flights is not None:
+                    self.flights.abandon(list(self._owned))
+                refetch = await follower
+            if refetch and not self.cancel.is_set():
+                # 担当していた要求が取得できなかった分や、計画外の納期を含む帳票の分は
+                # 自分で取得する
+                await self.fetch_plan(planner.Plan(refetch), ranged, stats)
+        finally:
+            await self.pipeline.close()
+            stats.printed += self.pipeline.printed
+            stats.print_jobs += self.pipeline.print_jobs
+            if self.cache:
+                self.cache.save()
+            if self.staging:
+                self.staging.discard(self._staged)
+                self.staging.save()
+        return stats
+
+    async def fetch_plan(
+        self, plan: planner.Plan, ranged: bool, stats: FetchStats
+    ) -> None:
+        """事前確認で該当なしを除いてから、納期の近い順に検索・印刷する"""
+        if self.probe:
+            probes = self.probe_empty(plan, ranged)
+            await self.run_queries(probes, self.probe_query, stats)
+            plan = self.skip_empty(plan, stats)
+        queries = sorted(
+            planner.coalesce(plan, ranged),
+            key=lambda query: planner.date_offset(query.date_from),
+        )
+        await self.run_queries(queries, self.fetch_query, stats)
+
+    async def run_queries(
+        self, queries: list[planner.Query], handler, stats: FetchStats
+    ) -> None:
+        """セッションを並列に動かして検索一覧を処理し、集計を stats へ加える"""
+        if not queries or self.cancel.is_set():
+            return
+        queue = asyncio.Queue()
+        for query in queries:
+            queue.put_nowait(query)
+
+        workers = max(1, min(self.sessions, queue.qsize()))
+        self._failures = {}
+        errors = []
+        results = await asyncio.gather(
+            *(self.run_session(queue, handler, errors) for _ in range(workers)),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+            stats.merge(result)
+        # ログインできなかったワーカーがあっても、残りで処理し終えていれば成功とする
+        exhausted = any(n > config.FETCH_RETRIES for n in self._failures.values())
+        if errors and (exhausted or not queue.empty()):
+            raise errors[0]
+
+    def run(self, plan: planner.Plan, ranged: bool = True) -> FetchStats:
+        """run_async の同期版"""
+        return asyncio.run(self.run_async(plan, ranged))
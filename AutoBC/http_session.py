@@ -0,0 +1,308 @@
+import http.client
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urljoin, urlsplit
+
+import config
+from fetch import SearchResult, is_truncated
+from session_pool import SessionExpired
+
+
+@dataclass
+class Form:
+    """ページ内のフォーム（送信する項目の既定値と、選択肢の一覧）"""
+
+    action: str
+    method: str = "get"
+    fields: dict[str, str] = field(default_factory=dict)
+    buttons: dict[str, str] = field(default_factory=dict)
+    options: dict[str, list[str]] = field(default_factory=dict)
+
+
+class PageParser(HTMLParser):
+    """フォームの入力項目と、チェックボックスを含む明細行を取り出す"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.forms = []
+        self.rows = []
+        self._form = None
+        self._select = None
+        self._option = None
+        self._cells = None  # 読み取り中の行のセル
+        self._cell = None  # 読み取り中のセルの文字列
+        self._checkbox = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k: v or "" for k, v in attrs}
+        name = attrs.get("name", "")
+        if tag == "form":
+            self._form = Form(attrs.get("action", ""), attrs.get("method", "get"))
+            self.forms.append(self._form)
+        elif tag == "tr":
+            self._cells, self._checkbox = [], False
+        elif tag in ("td", "th") and self._cells is not None:
+            self._cell = []
+        elif tag == "input":
+            self.handle_input(attrs, name)
+        elif tag == "button" and self._form is not None and name:
+            self._form.buttons[name] = attrs.get("value", "")
+        elif tag == "select" and self._form is not None:
+            self._select = name
+            self._form.options[name] = []
+        elif tag == "option" and self._select is not None:
+            self.end_option()
+            # value 属性のない option は表示文字列を値とする
+            self._option = (attrs.get("value"), "selected" in attrs, [])
+
+    def handle_input(self, attrs: dict, name: str) -> None:
+        kind = attrs.get("type", "text").lower()
+        if kind == "checkbox" and name.startswith("checkbox"):
+            self._checkbox = True
+        if self._form is None or not name:
+            return
+        if kind in ("button", "submit", "image"):
+            self._form.buttons[name] = attrs.get("value", "")
+        elif kind in ("checkbox", "radio"):
+            if "checked" in attrs:
+                self._form.fields[name] = attrs.get("value", "on")
+        else:
+            self._form.fields[name] = attrs.get("value", "")
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._form = None
+        elif tag == "option":
+            self.end_option()
+        elif tag == "select":
+            self.end_option()
+            self._select = None
+        elif tag in ("td", "th") and self._cell is not None:
+            self._cells.append("".join(self._cell).strip())
+            self._cell = None
+        elif tag == "tr" and self._cells is not None:
+            if self._checkbox:
+                self.rows.append(tuple(self._cells))
+            self._cells = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+        if self._option is not None:
+            self._option[2].append(data)
+
+    def end_option(self) -> None:
+        if self._option is None:
+            return
+        value, selected, text = self._option
+        if value is None:
+            value = "".join(text).strip()
+        options = self._form.options[self._select]
+        options.append(value)
+        if selected or len(options) == 1:
+            self._form.fields[self._select] = value
+        self._option = None
+
+
+@dataclass
+class Page:
+    """受け取った画面"""
+
+    url: str
+    body: bytes
+    charset: str = "utf-8"
+    forms: list[Form] = field(default_factory=list)
+    rows: list[tuple[str, ...]] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, url: str, body: bytes, charset: str) -> "Page":
+        parser = PageParser()
+        parser.feed(body.decode(charset, errors="replace"))
+        parser.close()
+        return cls(url, body, charset, parser.forms, parser.rows)
+
+    def form_of(self, name: str) -> Form | None:
+        """name の入力項目かボタンを含むフォーム"""
+        for form in self.forms:
+            if name in form.fields or name in form.buttons or name in form.options:
+                return form
+        return None
+
+    def has(self, name: str) -> bool:
+        return self.form_of(name) is not None
+
+
+class HttpSession:
+    """ブラウザを使わず、BC受付の画面のフォームを HTTP で直接送信するセッション
+
+    BrowserSession と同じ操作を持ち、SessionPool からそのまま使える。
+    接続は keep-alive で使い回し、サーバーに切断されていれば1回だけ接続し直して
+    送り直す。ただし出力[F12]は、サーバーが受け付けた後で切断された場合に二重に
+    出力されるため送り直さず、エラーにする。
+    """
+
+    def __init__(self, login_url: str = None):
+        self.login_url = login_url or config.LOGIN_URL
+        self.conn = None
+        self.origin = None  # (scheme, netloc)
+        self.cookies = SimpleCookie()
+        self.page = None
+
+    def connect(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        if self.conn is None or self.origin != (scheme, netloc):
+            self.close()
+            if scheme == "https":
+                connection = http.client.HTTPSConnection
+            else:
+                connection = http.client.HTTPConnection
+            self.conn = connection(netloc, timeout=config.WAIT_TIMEOUT)
+            self.origin = (scheme, netloc)
+        return self.conn
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        fields: dict = None,
+        charset: str = "utf-8",
+        resend: bool = None,
+    ) -> tuple[str, bytes, str]:
+        """リクエストを送り、リダイレクトをたどった先の (URL, 本文, 文字コード) を返す
+
+        resend: 切断されていた場合に送り直すか（省略時は GET のみ）
+        """
+        if resend is None:
+            resend = method == "GET"
+        body = None
+        headers = {"Connection": "keep-alive"}
+        if fields is not None:
+            body = urlencode(fields, encoding=charset)
+            if method == "GET":
+                url, body = f"{url.split('?')[0]}?{body}", None
+            else:
+                headers["Content-Type"] = "application/x-www-form-urlencoded"
+        cookie = "; ".join(f"{k}={v.value}" for k, v in self.cookies.items())
+        if cookie:
+            headers["Cookie"] = cookie
+
+        parts = urlsplit(url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        for retry in (resend, False):
+            conn = self.connect(parts.scheme, parts.netloc)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionError):
+                # keep-alive の接続がサーバー側で閉じられていた
+                self.close()
+                if not retry:
+                    raise
+
+        for header in response.headers.get_all("Set-Cookie") or []:
+            self.cookies.load(header)
+        if response.will_close:
+            self.close()
+
+        if response.status in (301, 302, 303, 307):
+            location = urljoin(url, response.headers["Location"])
+            if response.status == 307:
+                return self.request(method, location, fields, charset, resend)
+            return self.request("GET", location)
+        if response.status >= 400:
+            raise RuntimeError(f"{method} {path} が失敗しました: {response.status}")
+        return url, data, response.headers.get_content_charset() or charset
+
+    def open(self, url: str) -> Page:
+        url, data, charset = self.request("GET", url)
+        self.page = Page.parse(url, data, charset)
+        return self.page
+
+    def form_data(self, name: str, values: dict = None) -> tuple[Form, dict]:
+        """name を含むフォームの送信内容（既定値を values で上書きしたもの）"""
+        form = self.page.form_of(name) if self.page else None
+        if form is None:
+            raise RuntimeError(f"画面に {name} がありません")
+        data = {**form.fields, **(values or {})}
+        if name in form.buttons:
+            data[name] = form.buttons[name]
+        return form, data
+
+    def submit(self, name: str, values: dict = None) -> Page:
+        """name のボタン（または選択肢）を含むフォームを送信し、次の画面へ進む"""
+        url, data, charset = self.post(name, values, resend=True)
+        self.page = Page.parse(url, data, charset)
+        return self.page
+
+    def post(
+        self, name: str, values: dict = None, resend: bool = None
+    ) -> tuple[str, bytes, str]:
+        form, data = self.form_data(name, values)
+        action = urljoin(self.page.url, form.action or self.page.url)
+        return self.request(
+            form.method.upper(), action, data, self.page.charset, resend
+        )
+
+    def choose(self, name: str, index: int) -> Page:
+        """選択肢の index 番目を選んでフォームを送信する"""
+        options = self.page.form_of(name).options[name]
+        return self.submit(name, {name: options[index]})
+
+    def login(self, user_id: str, password: str) -> None:
+        """ログイン画面"""
+        self.open(self.login_url)
+        self.submit("loginButton", {"userId": user_id, "userPwd": password})
+        if not self.page.has("menuList"):
+            raise RuntimeError("ログインできませんでした")
+
+    def open_report(self) -> None:
+        """メニュー選択画面から帳票検索画面へ移動"""
+        self.choose("menuList", 8)
+        self.choose("reportList", 5)  # 帳票
+        if not self.page.has("locationCode"):
+            raise RuntimeError("帳票検索画面へ移動できませんでした")
+
+    def search(self, location: str, date_from: str, date_to: str) -> SearchResult:
+        """受渡場所と納期で検索し、明細を返す"""
+        values = {
+            "locationCode": location,
+            "proDateFrom": date_from,
+            "proDateTo": date_to,
+        }
+        self.submit("searchButton", values)
+        if not self.page.has("clearReturn"):
+            raise SessionExpired("帳票出力画面へ移動できませんでした")
+        return SearchResult(self.page.rows, is_truncated(len(self.page.rows)))
+
+    def fetch_report(self) -> bytes:
+        """出力[F12]の送信結果（出力画面の内容）を取得する（切断されても送り直さない）"""
+        _, data, _ = self.post("printButton", resend=False)
+        return data
+
+    def clear(self) -> None:
+        """戻る[F8]で検索画面へ戻る"""
+        self.submit("clearReturn")
+
+    def keepalive(self) -> None:
+        """帳票検索画面を取得し直してサーバー側のセッションを延長する"""
+        try:
+            self.open(self.page.url)
+        except Exception:
+            raise SessionExpired("帳票検索画面に戻れませんでした")
+        if not self.page.has("locationCode"):
+            raise SessionExpired("帳票検索画面に戻れませんでした")
+
+    def logout(self) -> None:
+        """ログアウト"""
+        try:
+            self.submit("logout")
+        except Exception as e:
+            print(f"ログアウト処理中にエラー発生: {e}")
+
+    def close(self) -> None:
+        """接続を閉じる"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,235 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import config
+from core import planner
+from events import ForwardingReporter, Reporter
+
+# 完了とみなすジョブの状態（続きから実行するときに検索・印刷しない）
+DONE_STATUSES = ("printed", "empty", "cached", "duplicate")
+
+
+def prefix(user_id: str) -> str:
+    """ユーザーの実行記録のファイル名の先頭"""
+    return re.sub(r"[^\w.-]", "_", user_id) + "-"
+
+
+class Journal:
+    """1回の実行の計画と完了したジョブを追記していく記録（続きから実行するため）
+
+    1行目に印刷対象・納期・ジョブの一覧を書き、以降は完了したジョブを1件1行で
+    追記する。各行はすぐ OS へ渡す（プロセスが異常終了しても残る）が、
+    ディスクへの fsync は JOURNAL_SYNC_BATCH 件ごと、または JOURNAL_SYNC_INTERVAL 秒
+    ごとにまとめて行う（停電などで失うのは最後の数件で、その分は印刷し直す）。
+    すべてのジョブが完了したら close でファイルを削除し、途中で終わった
+    （中止、エラー、プロセスの異常終了）記録だけが残る。記録を書いているプロセスの
+    PID を start・resume の行に残し、実行中の記録を続きから実行しないようにする。
+    """
+
+    def __init__(self, path: str, header: dict = None):
+        self.path = path
+        self.done = {}  # ジョブ -> 状態
+        self.jobs = []
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+        if header is None:
+            unfinished = load(path)
+            self.jobs, self.done = unfinished.jobs, dict(unfinished.done)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        if header is not None:
+            self.jobs = [planner.Job(*job) for job in header["jobs"]]
+            self.write({"op": "start", "pid": os.getpid(), **header}, sync=True)
+        else:
+            self.write(
+                {"op": "resume", "pid": os.getpid(), "at": time.time()}, sync=True
+            )
+        threading.Thread(target=self.sync_loop, daemon=True).start()
+
+    @classmethod
+    def start(cls, user_id: str, plan: planner.Plan, targets: list[str]) -> "Journal":
+        """新しい実行の記録を作る"""
+        name = f"{prefix(user_id)}{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}.jsonl"
+        header = {
+            "user_id": user_id,
+            "started_at": time.time(),
+            "targets": targets,
+            "dates": plan.dates,
+            "jobs": [[job.date, job.location] for job in plan.jobs],
+        }
+        return cls(os.path.join(config.JOURNAL_DIR, name), header)
+
+    @property
+    def remaining(self) -> list[planner.Job]:
+        return [job for job in self.jobs if job not in self.done]
+
+    def write(self, record: dict, sync: bool = False) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._pending += 1
+            if sync or self._pending >= config.JOURNAL_SYNC_BATCH:
+                self.sync()
+
+    def sync(self) -> None:
+        """書き込み済みの行をディスクへ反映する（_lock を取得して呼ぶ）"""
+        if self._pending and not self._file.closed:
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def sync_loop(self) -> None:
+        while not self._closed.wait(config.JOURNAL_SYNC_INTERVAL):
+            with self._lock:
+                self.sync()
+
+    def finished(self, job: planner.Job, status: str) -> None:
+        if status in DONE_STATUSES and job not in self.done:
+            self.done[job] = status
+            self.write(
+                {"op": "done", "date": job.date, "location": job.location, "s": status}
+            )
+
+    def close(self) -> bool:
+        """記録を閉じ、すべて完了していれば削除する（削除したら True）"""
+        self._closed.set()
+        with self._lock:
+            self.sync()
+            self._file.close()
+        if self.remaining:
+            return False
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        return True
+
+
+@dataclass
+class Unfinished:
+    """途中で終わった実行の記録"""
+
+    path: str
+    pid: int = 0  # 最後にこの記録を書いたプロセス
+    user_id: str = ""
+    started_at: float = 0.0
+    targets: list[str] = field(default_factory=list)
+    dates: list[str] = field(default_factory=list)
+    jobs: list[planner.Job] = field(default_factory=list)
+    done: dict[planner.Job, str] = field(default_factory=dict)
+
+    @property
+    def remaining(self) -> list[planner.Job]:
+        return [job for job in self.jobs if job not in self.done]
+
+    def discard(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def load(path: str) -> Unfinished:
+    """記録を読み込む（異常終了で途中まで書かれた最後の行は無視する）"""
+    unfinished = Unfinished(path)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("op") in ("start", "resume"):
+                unfinished.pid = record.get("pid", 0)
+            if record.get("op") == "start":
+                unfinished.user_id = record["user_id"]
+                unfinished.started_at = record["started_at"]
+                unfinished.targets = record["targets"]
+                unfinished.dates = record["dates"]
+                unfinished.jobs = [planner.Job(*job) for job in record["jobs"]]
+            elif record.get("op") == "done":
+                job = planner.Job(record["date"], record["location"])
+                unfinished.done[job] = record["s"]
+    return unfinished
+
+
+def running(pid: int) -> bool:
+    """PID のプロセスが動いているか"""
+    if pid <= 0:
+        return False
+    if pid == os.getpid():
+        return True
+    if sys.platform == "win32":
+        # Windows の os.kill はプロセスを終了させるため、プロセスのハンドルで調べる
+        from ctypes import byref, c_ulong, windll
+
+        handle = windll.kernel32.OpenProcess(0x1000, False, pid)  # QUERY_LIMITED
+        if not handle:
+            return False
+        try:
+            code = c_ulong()
+            windll.kernel32.GetExitCodeProcess(handle, byref(code))
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            windll.kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def stale(user_id: str) -> list[Unfinished]:
+    """ユーザーの途中で終わった実行の記録（古い順）
+
+    JOURNAL_MAX_AGE より古い記録は（納期が変わっているため）削除し、
+    書いているプロセスが動いている記録（実行中・続きから実行中）は含めない。
+    """
+    try:
+        names = sorted(os.listdir(config.JOURNAL_DIR))
+    except OSError:
+        return []
+    found = []
+    for name in names:
+        if not name.startswith(prefix(user_id)):
+            continue
+        try:
+            unfinished = load(os.path.join(config.JOURNAL_DIR, name))
+        except OSError:
+            continue
+        if running(unfinished.pid):
+            continue
+        if time.time() - unfinished.started_at > config.JOURNAL_MAX_AGE:
+            unfinished.discard()
+        elif unfinished.jobs and unfinished.remaining:
+            found.append(unfinished)
+    return found
+
+
+def latest(user_id: str) -> Unfinished | None:
+    """ユーザーの途中で終わった実行のうち最新の記録（なければ None）"""
+    found = stale(user_id)
+    return found[-1] if found else None
+
+
+class JournalReporter(ForwardingReporter):
+    """進捗通知を中継しながら、完了したジョブを Journal に記録する"""
+
+    def __init__(self, reporter: Reporter, journal: Journal):
+        super().__init__(reporter)
+        self.journal = journal
+
+    def job_finished(self, job, status: str, size: int = 0) -> None:
+        self.journal.finished(job, status)
+        super().job_finished(job, status, size)
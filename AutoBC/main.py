@@ -1,5 +1,32 @@
+import argparse
+import os
+
 from app_gui import MainGui
 
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="cProfile と tracemalloc で計測し、結果を PROFILE_DIR の下に書き出す",
+    )
+    args = parser.parse_args()
+
+    if not args.profile:
+        MainGui().run()
+        return
+
+    from profiling import Profiler
+
+    profiler = Profiler()
+    profiler.start()
+    try:
+        app = MainGui(stall_log=os.path.join(profiler.directory, "stalls.jsonl"))
+        app.run()
+    finally:
+        print(f"計測結果: {profiler.finish()}")
+
+
 if __name__ == "__main__":
-    app = MainGui()
-    app.run()
+    main()
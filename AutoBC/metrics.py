@@ -0,0 +1,289 @@
+import contextvars
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import config
+from events import ForwardingReporter, Reporter
+
+# 計測する段と、GUI の要約での表示名（この順に表示する）
+STAGES = {
+    "login": "ログイン",
+    "navigate": "画面遷移",
+    "probe": "事前確認",
+    "search": "検索",
+    "fetch": "出力",
+    "clear": "戻る",
+    "render": "変換",
+    "print": "印刷",
+    "keepalive": "延長",
+    "logout": "ログアウト",
+}
+
+# 実行中の Trace（asyncio.to_thread で呼ぶ処理にも引き継がれる）
+current = contextvars.ContextVar("trace", default=None)
+
+_metrics_lock = threading.Lock()
+
+
+def span(stage: str, location: str = "", date_from: str = "", date_to: str = ""):
+    """実行中の Trace があれば、その段の所要時間を記録するコンテキストマネージャー"""
+    trace = current.get()
+    if trace is None:
+        return nullcontext()
+    return trace.span(stage, location, date_from, date_to)
+
+
+class Trace:
+    """1回の実行の各段の所要時間（monotonic）を JSON Lines で記録する
+
+    1行が1回の操作で、ユーザーID、受渡場所、納期の範囲、実行開始からの時刻、
+    所要時間、成否を持つ。close で TRACE_DIR へのファイルを閉じ、
+    Prometheus の textfile 形式のメトリクスへ集計を加える。
+    """
+
+    def __init__(self, user_id: str = "", directory: str = None):
+        self.user_id = user_id
+        self.started = time.monotonic()
+        self.run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{id(self):x}"
+        self.durations = {}  # 段 -> [秒]
+        self.jobs = Counter()  # 状態 -> 件数
+        self.errors = Counter()  # 段 -> 件数
+        self._lock = threading.Lock()
+
+        directory = directory or config.TRACE_DIR
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"run-{self.run_id}.jsonl")
+        self._file = open(self.path, "w", encoding="utf-8")
+        prune(directory)
+
+    @contextmanager
+    def span(self, stage: str, location: str = "", date_from: str = "", date_to=""):
+        start = time.monotonic()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            self.record(
+                stage, start, time.monotonic() - start, ok, location, date_from, date_to
+            )
+
+    def record(
+        self,
+        stage: str,
+        start: float,
+        seconds: float,
+        ok: bool,
+        location: str = "",
+        date_from: str = "",
+        date_to: str = "",
+    ) -> None:
+        line = json.dumps(
+            {
+                "run": self.run_id,
+                "user": self.user_id,
+                "stage": stage,
+                "location": location,
+                "date_from": date_from,
+                "date_to": date_to or date_from,
+                "at": round(start - self.started, 6),
+                "seconds": round(seconds, 6),
+                "ok": ok,
+            },
+            ensure_ascii=False,
+        )
+        with self._lock:
+            self.durations.setdefault(stage, []).append(seconds)
+            if not ok:
+                self.errors[stage] += 1
+            if not self._file.closed:
+                self._file.write(line + "\n")
+
+    def job(self, status: str) -> None:
+        with self._lock:
+            self.jobs[status] += 1
+
+    def summary(self) -> str:
+        """GUI に表示する1行の要約（例: ログイン 1回 1.2秒、検索 6回 2.4秒、…）"""
+        with self._lock:
+            parts = [
+                f"{label} {len(self.durations[stage])}回 "
+                f"{sum(self.durations[stage]):.1f}秒"
+                for stage, label in STAGES.items()
+                if stage in self.durations
+            ]
+            total = time.monotonic() - self.started
+        return f"所要 {total:.1f}秒: " + "、".join(parts)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.close()
+        try:
+            update_metrics(self)
+        except OSError as e:
+            print(f"メトリクスを書き出せませんでした: {e}")
+
+
+def prune(directory: str) -> None:
+    """古い実行の記録を TRACE_KEEP 件まで減らす"""
+    runs = sorted(n for n in os.listdir(directory) if n.startswith("run-"))
+    for name in runs[: max(0, len(runs) - config.TRACE_KEEP)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+
+def update_metrics(trace: Trace, path: str = None) -> None:
+    """実行の集計を累積値に加え、Prometheus の textfile 形式で書き出す
+
+    累積値は同じ場所の .json に保持し、.prom は毎回まとめて書き直す
+    （node_exporter の textfile collector が途中の内容を読まないよう置き換える）。
+    ブローカーの実行や GUI とワーカーなど複数のプロセスが同時に加えても数え漏れが
+    ないよう、読み込みから書き出しまでをプロセス間のロックで排他する。
+    """
+    path = path or config.METRICS_FILE
+    state_path = path + ".json"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _metrics_lock, file_lock(state_path):
+        try:
+            with open(state_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        stages = state.setdefault("stages", {})
+        jobs = state.setdefault("jobs", {})
+        errors = state.setdefault("errors", {})
+
+        for stage, durations in trace.durations.items():
+            entry = stages.setdefault(
+                stage,
+                {"buckets": [0] * len(config.METRIC_BUCKETS), "sum": 0.0, "count": 0},
+            )
+            for seconds in durations:
+                for i, bound in enumerate(config.METRIC_BUCKETS):
+                    if seconds <= bound:
+                        entry["buckets"][i] += 1
+                entry["sum"] += seconds
+                entry["count"] += 1
+        for status, n in trace.jobs.items():
+            jobs[status] = jobs.get(status, 0) + n
+        for stage, n in trace.errors.items():
+            errors[stage] = errors.get(stage, 0) + n
+        state["runs"] = state.get("runs", 0) + 1
+        state["last_run"] = time.time()
+
+        write_atomic(state_path, json.dumps(state, ensure_ascii=False))
+        write_atomic(path, render_metrics(state))
+
+
+def render_metrics(state: dict) -> str:
+    lines = [
+        "# HELP printbot_stage_duration_seconds BC受付の操作の段ごとの所要時間",
+        "# TYPE printbot_stage_duration_seconds histogram",
+    ]
+    for stage, entry in state["stages"].items():
+        for bound, n in zip(config.METRIC_BUCKETS, entry["buckets"]):
+            lines.append(
+                f'printbot_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {n}'
+            )
+        lines.append(
+            f'printbot_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {entry["count"]}'
+        )
+        lines.append(
+            f'printbot_stage_duration_seconds_sum{{stage="{stage}"}} {entry["sum"]}'
+        )
+        lines.append(
+            f'printbot_stage_duration_seconds_count{{stage="{stage}"}} {entry["count"]}'
+        )
+
+    lines += [
+        "# HELP printbot_jobs_total 終了したジョブ（納期 × 受渡場所）の数",
+        "# TYPE printbot_jobs_total counter",
+    ]
+    for status, n in state["jobs"].items():
+        lines.append(f'printbot_jobs_total{{status="{status}"}} {n}')
+    lines += [
+        "# HELP printbot_errors_total 失敗した操作の数",
+        "# TYPE printbot_errors_total counter",
+    ]
+    for stage, n in state["errors"].items():
+        lines.append(f'printbot_errors_total{{stage="{stage}"}} {n}')
+    lines += [
+        "# HELP printbot_runs_total 実行の回数",
+        "# TYPE printbot_runs_total counter",
+        f"printbot_runs_total {state['runs']}",
+        "# HELP printbot_last_run_timestamp_seconds 最後の実行が終わった時刻",
+        "# TYPE printbot_last_run_timestamp_seconds gauge",
+        f"printbot_last_run_timestamp_seconds {state['last_run']:.0f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def file_lock(path: str):
+    """path + ".lock" を使ってプロセス間で排他する（同じプロセスのスレッド間も排他される）"""
+    with open(path + ".lock", "a+b") as f:
+        if sys.platform == "win32":
+            import msvcrt
+
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK は約10秒で諦めるため、取れるまで繰り返す
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def write_atomic(path: str, text: str) -> None:
+    """一時ファイル（書き込みごとに別の名前）に書いてから置き換える"""
+    fd, tmp = tempfile.mkstemp(
+        prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path)
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class TracingReporter(ForwardingReporter):
+    """進捗通知を中継しながら、終了したジョブを状態ごとに Trace に数える"""
+
+    def __init__(self, reporter: Reporter, trace: Trace):
+        super().__init__(reporter)
+        self.trace = trace
+
+    def job_finished(self, job, status: str, size: int = 0) -> None:
+        self.trace.job(status)
+        super().job_finished(job, status, size)
@@ -0,0 +1,288 @@
+import asyncio
+import itertools
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+
+import config
+from core import planner
+from events import Reporter
+from metrics import span
+
+
+@dataclass
+class Report:
+    """取得済みの帳票（1回の検索で出力した内容）"""
+
+    payload: bytes
+    rows: dict[planner.Job, int] = field(default_factory=dict)
+    path: str | None = None  # 印刷用に書き出したファイル
+
+    @property
+    def route(self) -> tuple[str, str]:
+        """印刷先の (プリンター名, 用紙)"""
+        location = next(iter(self.rows), planner.Job("", "")).location
+        return config.PRINTERS.get(location, config.DEFAULT_PRINTER)
+
+    @property
+    def priority(self) -> int:
+        """今日から最も近い納期までの日数（小さいほど先に印刷する）"""
+        return min((planner.date_offset(job.date) for job in self.rows), default=0)
+
+    def size_of(self, job: planner.Job) -> int:
+        """帳票の内容のうち、そのジョブの明細に当たる分のバイト数"""
+        total = sum(self.rows.values())
+        return len(self.payload) * self.rows[job] // total if total else 0
+
+
+def render(report: Report, directory: str) -> str:
+    """帳票を印刷できる形式のファイルに書き出し、そのパスを返す"""
+    suffix = ".pdf" if report.payload.startswith(b"%PDF") else ".html"
+    jobs = list(report.rows)
+    name = "report"
+    if jobs:
+        name = f"{jobs[0].location}-{jobs[0].date.replace('/', '')}"
+        if len(jobs) > 1:
+            name += f"+{len(jobs) - 1}"
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name + suffix)
+    with open(path, "wb") as f:
+        f.write(report.payload)
+    return path
+
+
+@dataclass
+class Batch:
+    """1回の印刷ジョブとしてまとめて送る帳票"""
+
+    printer: str
+    paper: str
+    reports: list[Report] = field(default_factory=list)
+    deadline: float = 0.0  # これを過ぎたら上限に満たなくても送る
+
+    @property
+    def jobs(self) -> list[tuple[planner.Job, Report]]:
+        return [(job, report) for report in self.reports for job in report.rows]
+
+
+BODY = re.compile(rb"<body[^>]*>(.*)</body>", re.IGNORECASE | re.DOTALL)
+HEAD = re.compile(rb"<head(\s[^>]*)?>.*?</head>", re.IGNORECASE | re.DOTALL)
+DEFAULT_HEAD = b'<head><meta charset="UTF-8"></head>'
+
+
+def merge(batch: Batch, directory: str, number: int) -> list[str]:
+    """バッチの帳票を1つのファイルにまとめ、印刷するファイルのパスを返す
+
+    HTML は改ページを挟んで1つの文書に連結する（文字コードやスタイルの指定が
+    失われないよう、最初の帳票の head を使う）。PDF は pypdf があれば連結し、
+    なければ1件ずつ印刷する。
+    """
+    paths = [report.path for report in batch.reports]
+    name = f"batch-{number:04d}-{os.path.basename(paths[0])}"
+    if len(paths) == 1:
+        return paths
+
+    if paths[0].endswith(".html"):
+        parts = []
+        for report in batch.reports:
+            match = BODY.search(report.payload)
+            parts.append(match.group(1) if match else report.payload)
+        head = HEAD.search(batch.reports[0].payload)
+        head = head.group(0) if head else DEFAULT_HEAD
+        page_break = b'\n<div style="page-break-after: always"></div>\n'
+        path = os.path.join(directory, name)
+        with open(path, "wb") as f:
+            f.write(b"<html>" + head + b"<body>\n")
+            f.write(page_break.join(parts) + b"\n</body></html>")
+        return [path]
+
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        return paths
+    writer = PdfWriter()
+    for p in paths:
+        writer.append(p)
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return [path]
+
+
+def prune_spool() -> None:
+    """SPOOL_MAX_AGE より前に作られた実行のディレクトリを削除する"""
+    os.makedirs(config.SPOOL_DIR, exist_ok=True)
+    now = time.time()
+    for name in os.listdir(config.SPOOL_DIR):
+        path = os.path.join(config.SPOOL_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > config.SPOOL_MAX_AGE:
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+        except OSError:
+            pass
+
+
+class Pipeline:
+    """取得 → 変換 → 集約 → 印刷 の各段を上限付きのキューでつなぐ
+
+    キューが満杯になると前段は空きが出るまで待つため、印刷が追いつかない間は
+    取得も進まない。キューは納期の近い順に取り出すので、今日の分から印刷される。
+    集約の段では (プリンター, 用紙, 形式) が同じ帳票を batch_size 件まで、または
+    最初の1件から batch_wait 秒までまとめ、1回の印刷ジョブとして送る。
+    変換したファイルは実行ごとに SPOOL_DIR の下に作るディレクトリへ書き出し（同時に
+    動く他の実行と名前が重ならないように）、close で削除する。
+
+    Args:
+        printer: print_file(path, printer, paper) を持つ印刷先
+        reporter: 印刷完了の通知先
+        cancel: セットされると未印刷の帳票を破棄する threading.Event
+        maxsize: 各キューの上限
+        batch_size: 1回の印刷ジョブにまとめる帳票の上限
+        batch_wait: バッチの最初の帳票から送信までの最大待ち時間（秒）
+        printer_name: 指定すると受渡場所ごとの印刷先によらずこのプリンターへ送る
+        printed: 印刷済みのジョブ（これだけからなる帳票は印刷しない。印刷すると加える）
+    """
+
+    def __init__(
+        self,
+        printer,
+        reporter: Reporter,
+        cancel: threading.Event,
+        maxsize: int = config.PIPELINE_QUEUE_SIZE,
+        batch_size: int = config.BATCH_MAX_SIZE,
+        batch_wait: float = config.BATCH_MAX_WAIT,
+        printer_name: str = "",
+        printed: set[planner.Job] = None,
+    ):
+        self.printer = printer
+        self.reporter = reporter
+        self.cancel = cancel
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.printer_name = printer_name
+        self.printed_jobs = printed if printed is not None else set()
+        self.printed = 0
+        self.print_jobs = 0
+        self._seq = itertools.count()
+        self._tasks = []
+        self.spool = None
+
+    def start(self) -> None:
+        prune_spool()
+        self.spool = tempfile.mkdtemp(prefix="run-", dir=config.SPOOL_DIR)
+        self.render_queue = asyncio.PriorityQueue(self.maxsize)
+        self.batch_queue = asyncio.PriorityQueue(self.maxsize)
+        self.print_queue = asyncio.Queue(self.maxsize)
+        self._tasks = [
+            asyncio.create_task(self.render_stage()),
+            asyncio.create_task(self.batch_stage()),
+            asyncio.create_task(self.print_stage()),
+        ]
+
+    async def submit(self, report: Report) -> None:
+        """取得した帳票を変換待ちに入れる（満杯なら空くまで待つ）"""
+        await self.render_queue.put((report.priority, next(self._seq), report))
+
+    async def close(self) -> None:
+        """投入済みの帳票をすべて印刷し終えるまで待つ"""
+        await self.render_queue.put((float("inf"), next(self._seq), None))
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            # 印刷を受け付けた後でファイルを開く印刷先（Windows の関連付けによる印刷）の
+            # 分は残し、次回以降の prune_spool で消す
+            if not getattr(self.printer, "detached", False):
+                shutil.rmtree(self.spool, ignore_errors=True)
+
+    async def render_stage(self) -> None:
+        while True:
+            priority, seq, report = await self.render_queue.get()
+            if report is not None and report.path is None and not self.cancel.is_set():
+                job = next(iter(report.rows), planner.Job("", ""))
+                with span("render", job.location, job.date):
+                    report.path = await asyncio.to_thread(render, report, self.spool)
+            await self.batch_queue.put((priority, seq, report))
+            if report is None:
+                return
+
+    async def batch_stage(self) -> None:
+        batches = {}  # (プリンター, 用紙, 形式) -> Batch
+        while True:
+            timeout = None
+            if batches:
+                deadline = min(batch.deadline for batch in batches.values())
+                timeout = max(0.0, deadline - time.monotonic())
+            try:
+                _, _, report = await asyncio.wait_for(self.batch_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                report = False  # 待ち時間切れ
+
+            if report is None:
+                for batch in batches.values():
+                    await self.print_queue.put(batch)
+                await self.print_queue.put(None)
+                return
+
+            if report and report.path:
+                printer, paper = report.route
+                printer = self.printer_name or printer
+                key = (printer, paper, os.path.splitext(report.path)[1])
+                if key not in batches:
+                    deadline = time.monotonic() + self.batch_wait
+                    batches[key] = Batch(printer, paper, deadline=deadline)
+                batches[key].reports.append(report)
+
+            now = time.monotonic()
+            for key, batch in list(batches.items()):
+                if len(batch.reports) >= self.batch_size or batch.deadline <= now:
+                    await self.print_queue.put(batches.pop(key))
+
+    async def print_stage(self) -> None:
+        while True:
+            batch = await self.print_queue.get()
+            if batch is None:
+                return
+            if self.cancel.is_set():
+                continue
+            self.skip_printed(batch)
+            if not batch.reports:
+                continue
+            try:
+                paths = await asyncio.to_thread(
+                    merge, batch, self.spool, self.print_jobs + 1
+                )
+                for path in paths:
+                    with span("print"):
+                        await asyncio.to_thread(
+                            self.printer.print_file, path, batch.printer, batch.paper
+                        )
+                    self.print_jobs += 1
+            except Exception as e:
+                self.reporter.error(f"印刷に失敗しました（{batch.printer}）: {e}")
+                for job, _ in batch.jobs:
+                    self.reporter.job_finished(job, "error")
+                continue
+            for job, report in batch.jobs:
+                self.printed += 1
+                self.printed_jobs.add(job)
+                self.reporter.job_finished(job, "printed", report.size_of(job))
+
+    def skip_printed(self, batch: Batch) -> None:
+        """印刷済みのジョブだけからなる帳票をバッチから外す（続きからの実行で重複させない）"""
+        reports, covered = [], set(self.printed_jobs)
+        for report in batch.reports:
+            if report.rows and covered.issuperset(report.rows):
+                for job in report.rows:
+                    self.reporter.job_finished(job, "duplicate")
+            else:
+                reports.append(report)
+                covered.update(report.rows)
+        batch.reports = reports
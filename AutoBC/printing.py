@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import config
+
+
+class SystemPrinter:
+    """OS の印刷機能でファイルを印刷する（プリンター名が空なら既定のプリンター）"""
+
+    # Windows では関連付けられたアプリケーションが、印刷を受け付けた後でファイルを開く
+    detached = sys.platform == "win32"
+
+    def print_file(self, path: str, printer: str = "", paper: str = "") -> None:
+        if sys.platform == "win32":
+            if printer:
+                import win32api
+
+                win32api.ShellExecute(0, "printto", path, f'"{printer}"', ".", 0)
+            else:
+                os.startfile(path, "print")
+            return
+
+        cmd = ["lp"]
+        if printer:
+            cmd += ["-d", printer]
+        if paper:
+            cmd += ["-o", f"media={paper}"]
+        subprocess.run([*cmd, path], check=True, capture_output=True)
+
+
+class FileSinkPrinter:
+    """印刷ジョブをディレクトリへ書き出すだけのプリンター（動作確認用）
+
+    送られたファイルを受付順の連番付きでコピーし、jobs.log に
+    連番、プリンター名、用紙、元のファイル名を1行ずつ記録する。連番は
+    ディレクトリ内で重ならないように振る（同時に動く他の実行や前回の実行の分を上書きしない）。
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def print_file(self, path: str, printer: str = "", paper: str = "") -> None:
+        with open(path, "rb") as src:
+            data = src.read()
+        while True:
+            self.count += 1
+            name = f"{self.count:04d}_{os.path.basename(path)}"
+            try:
+                with open(os.path.join(self.directory, name), "xb") as dst:
+                    dst.write(data)
+                break
+            except FileExistsError:
+                continue
+        with open(os.path.join(self.directory, "jobs.log"), "a", encoding="utf-8") as f:
+            f.write(
+                f"{self.count}\t{printer or '(既定)'}\t{paper}\t"
+                f"{os.path.basename(path)}\t{datetime.now().isoformat()}\n"
+            )
+
+
+def default_printer():
+    """config.PRINT_SINK_DIR が指定されていればファイルへ、なければ OS の印刷へ送る"""
+    if config.PRINT_SINK_DIR:
+        return FileSinkPrinter(config.PRINT_SINK_DIR)
+    return SystemPrinter()
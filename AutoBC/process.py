@@ -0,0 +1,437 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import config
+import metrics
+from core import dates, planner
+from eta import EtaReporter, History, format_seconds
+from events import JsonReporter, Reporter, TextReporter
+from fetch import FetchEngine
+from metrics import Trace, TracingReporter
+from report_cache import ReportCache
+from session_pool import SessionPool, session_class
+from staging import StagingArea
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """コマンドライン引数の解析"""
+    parser = argparse.ArgumentParser(description=config.APP_NAME)
+    user_id = os.getenv("PRINTBOT_USER_ID")
+    parser.add_argument(
+        "--user_id",
+        default=user_id,
+        required=user_id is None,
+        help="省略した場合は環境変数 PRINTBOT_USER_ID",
+    )
+    parser.add_argument(
+        "--password",
+        help="省略した場合は環境変数 PRINTBOT_PASSWORD、なければ標準入力の1行目",
+    )
+    dates_group = parser.add_mutually_exclusive_group()
+    dates_group.add_argument(
+        "--selected_date_list", nargs="+", help="納期の値（%%y/%%m/%%d）"
+    )
+    dates_group.add_argument(
+        "--days",
+        type=int,
+        default=config.DATE_RANGE,
+        help="納期を指定しない場合に、今日から何日分を対象にするか",
+    )
+    dates_group.add_argument(
+        "--working_days",
+        type=int,
+        help="納期を指定しない場合に、今日から稼働日の何日分を対象にするか",
+    )
+    parser.add_argument(
+        "--targets",
+        nargs="+",
+        choices=list(config.PRINT_TARGET_DATA),
+        help="--prefetch の場合は省略するとすべて、--resume の場合は前回と同じ",
+    )
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        help="印刷せずに取得・変換して置いておく（夜間に実行し、朝の実行で使う）",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="途中で終わった前回の実行のうち、完了していないジョブだけを実行する",
+    )
+    parser.add_argument(
+        "--no_coalesce",
+        dest="coalesce",
+        action="store_false",
+        default=config.COALESCE_DATES,
+        help="納期をまとめずに1日ずつ検索する",
+    )
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        default=config.FETCH_SESSIONS,
+        help="同時にログインするセッション数",
+    )
+    parser.add_argument(
+        "--no_probe",
+        dest="probe",
+        action="store_false",
+        default=config.PROBE_EMPTY,
+        help="該当なしの組み合わせを事前に確認しない",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="キャッシュが有効期間内でもすべて取得し直す",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("browser", "http"),
+        default=config.SESSION_BACKEND,
+        help="BC受付をブラウザで操作するか、フォームを HTTP で直接送信するか",
+    )
+    parser.add_argument(
+        "--printer",
+        default="",
+        help="すべての帳票をこのプリンターへ送る（省略時は受渡場所ごとの印刷先）",
+    )
+    parser.add_argument(
+        "--no_broker",
+        dest="broker",
+        action="store_false",
+        default=config.USE_BROKER,
+        help="常駐ブローカーを使わず、このプロセスでログインする",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="PATH",
+        help="セッションの操作と所要時間を記録する（パスワードは記録しない、"
+        "ブローカーは使わない）",
+    )
+    parser.add_argument(
+        "--events",
+        action="store_true",
+        help="進捗を JSON Lines で出力し、標準入力の cancel で中止する（GUI 用）",
+    )
+    parser.add_argument(
+        "--explain", action="store_true", help="実行計画を表示して終了する"
+    )
+    args = parser.parse_args(argv)
+    args.unfinished = None
+    if args.resume:
+        import journal
+
+        args.unfinished = journal.latest(args.user_id)
+        if args.unfinished is None:
+            parser.error("続きから実行できる記録がありません")
+        args.targets = args.unfinished.targets
+        args.selected_date_list = args.unfinished.dates
+        # 取得済みで印刷前に終わったジョブをキャッシュから完了扱いにしない
+        args.refresh = True
+    if not args.targets:
+        if not args.prefetch:
+            parser.error("--targets を指定してください")
+        args.targets = list(config.PRINT_TARGET_DATA)
+    if args.selected_date_list is None:
+        if args.working_days is not None:
+            date_data = dates.generate_date_data(args.working_days, working_days=True)
+        else:
+            date_data = dates.generate_date_data(args.days)
+        args.selected_date_list = [d["value"] for d in date_data]
+    return args
+
+
+def watch_stdin(cancel: threading.Event) -> None:
+    """標準入力に cancel が届くか、パイプが閉じられたら中止を通知する"""
+    for line in sys.stdin:
+        if line.strip() == "cancel":
+            break
+    cancel.set()
+
+
+def run_options(args: argparse.Namespace) -> dict:
+    """実行方法に関する指定（ブローカーへもそのまま渡す）"""
+    return {
+        "coalesce": args.coalesce,
+        "sessions": args.sessions,
+        "refresh": args.refresh,
+        "probe": args.probe,
+        "backend": args.backend,
+        "printer": args.printer,
+        "prefetch": args.prefetch,
+    }
+
+
+def execute(
+    source,
+    plan: planner.Plan,
+    options: dict,
+    reporter: Reporter,
+    cancel: threading.Event,
+    scheduler=None,
+    user_id: str = "",
+    done: set[planner.Job] = None,
+) -> int:
+    """実行計画のジョブを検索・印刷し、終了コードを返す
+
+    各段の所要時間を Trace に記録し、終了時に1行の要約を reporter へ送る。
+
+    scheduler を渡すと（ブローカー）、キャッシュと取得中のジョブを他の実行要求と共有する。
+    事前取得では印刷しないため共有は使わず、キャッシュにも書かない（1日ずつ検索して置く）。
+    置いた帳票は朝の実行で明細のハッシュを確かめてから印刷するが、キャッシュは有効期間内なら
+    確かめずに印刷されるため、夜間の取得結果を入れると古い内容を印刷しかねない。
+    done（続きから実行する場合の完了済みのジョブ）は検索せず、印刷もしない。
+    """
+    if done:
+        plan = plan.without(done)
+    prefetch = options.get("prefetch", False)
+    staging = None
+    if prefetch or config.USE_STAGING:
+        # ブローカーでは索引を全実行で共有する
+        staging = scheduler.staging if scheduler is not None else StagingArea()
+        staging.evict()
+    cache = None
+    if prefetch:
+        scheduler = None
+    elif scheduler is not None:
+        cache = scheduler.cache
+    elif config.USE_CACHE:
+        cache = ReportCache()
+    if cache:
+        cache.evict()
+
+    ranged = options["coalesce"] and not prefetch
+    history = History()
+    estimate = history.estimate(plan, ranged, options["sessions"])
+    trace = Trace(user_id)
+    traced = EtaReporter(TracingReporter(reporter, trace), estimate)
+    engine = FetchEngine(
+        source,
+        options["sessions"],
+        traced,
+        cancel,
+        cache,
+        options["refresh"],
+        options["probe"],
+        printer_name=options.get("printer", ""),
+        flights=scheduler,
+        staging=staging,
+        prefetch=prefetch,
+        printed=done,
+    )
+    token = metrics.current.set(trace)
+    try:
+        stats = engine.run(plan, ranged)
+    except Exception as e:
+        reporter.error(str(e))
+        return 1
+    finally:
+        metrics.current.reset(token)
+        trace.close()
+        reporter.timings(trace.summary())
+
+    # 中止した実行と事前取得は、実行時間が通常の実行と比べられないため学習しない
+    if not cancel.is_set() and not prefetch:
+        history.learn(trace.path, time.monotonic() - trace.started)
+
+    summary = stats.summary(plan)
+    if cache:
+        summary = f"{summary}\n{stats.cache_summary()}"
+    if staging:
+        summary = f"{summary}\n{staging.summary()}"
+    if cancel.is_set():
+        summary = f"中止しました（{summary}）"
+    reporter.done(summary)
+    return 0
+
+
+class WarmStart:
+    """実行要求の前に済ませておく準備（ブローカーへの接続、またはブラウザーの起動）"""
+
+    def __init__(
+        self,
+        backend: str = config.SESSION_BACKEND,
+        use_broker: bool = config.USE_BROKER,
+    ):
+        self.backend = backend
+        self.conn = None
+        self.sessions = []  # 起動済みでログイン前のセッション
+        if use_broker:
+            import broker
+
+            self.conn = broker.connect()
+        if self.conn is None:
+            self.sessions.append(session_class(backend)())
+
+    def connection(self):
+        """接続済みのブローカーとの接続（待機中に切断されていれば None）"""
+        conn, self.conn = self.conn, None
+        if conn is not None and conn.poll():
+            conn.close()  # ブローカーが終了していた
+            return None
+        return conn
+
+    def session_factory(self, backend: str):
+        """起動済みのセッションを先に使うセッションの生成関数"""
+        session_factory = session_class(backend)
+
+        def factory():
+            if self.sessions and backend == self.backend:
+                return self.sessions.pop()
+            return session_factory()
+
+        return factory
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+        for session in self.sessions:
+            session.close()
+        self.sessions = []
+
+
+def open_journal(args: argparse.Namespace, plan: planner.Plan):
+    """実行の記録を開く（続きから実行する場合は前回の記録に追記する）"""
+    if not config.USE_JOURNAL or args.prefetch:
+        return None
+    from journal import Journal
+
+    if args.unfinished is not None:
+        return Journal(args.unfinished.path)
+    return Journal.start(args.user_id, plan, args.targets)
+
+
+def run(args: argparse.Namespace, plan: planner.Plan, warm: WarmStart = None) -> int:
+    """実行を記録しながら、ブローカー経由またはこのプロセス内で実行する"""
+    reporter = JsonReporter() if args.events else TextReporter()
+    journal = open_journal(args, plan)
+    if journal is None:
+        return dispatch(args, plan, reporter, warm, set())
+
+    from journal import JournalReporter
+
+    try:
+        return dispatch(
+            args, plan, JournalReporter(reporter, journal), warm, set(journal.done)
+        )
+    finally:
+        if not journal.close() and not args.events:
+            print(
+                f"未完了 {len(journal.remaining)} 件は --resume で続きから実行できます"
+            )
+
+
+def dispatch(
+    args: argparse.Namespace,
+    plan: planner.Plan,
+    reporter: Reporter,
+    warm: WarmStart = None,
+    done: set[planner.Job] = frozenset(),
+) -> int:
+    """ブローカー経由、またはこのプロセス内で実行する"""
+    cancel = threading.Event()
+    if args.events:
+        threading.Thread(target=watch_stdin, args=(cancel,), daemon=True).start()
+
+    if args.broker and not args.record:
+        import broker
+
+        conn = warm and warm.connection()
+        if conn is None:
+            conn = broker.connect()
+        if conn is not None:
+            request = {
+                "user_id": args.user_id,
+                "password": args.password,
+                "dates": plan.dates,
+                "targets": args.targets,
+                "options": run_options(args),
+                "done": [[job.date, job.location] for job in done],
+            }
+            reporter.started(warm is not None)
+            with conn:
+                return broker.run_remote(conn, request, reporter, cancel)
+
+    session_factory = session_class(args.backend)
+    if warm is not None:
+        session_factory = warm.session_factory(args.backend)
+    recorder = None
+    if args.record:
+        from recording import Recorder
+
+        header = {
+            "user_id": args.user_id,
+            "backend": args.backend,
+            "targets": args.targets,
+            "dates": plan.dates,
+            "options": run_options(args),
+        }
+        recorder = Recorder(args.record, header)
+        session_factory = recorder.wrap(session_factory)
+    # 事前確認と本検索で同じセッションを使い回し、終了時にログアウトする
+    pool = SessionPool(session_factory, args.user_id, args.password, args.sessions)
+    try:
+        reporter.started(warm is not None)
+        return execute(
+            pool,
+            plan,
+            run_options(args),
+            reporter,
+            cancel,
+            user_id=args.user_id,
+            done=done,
+        )
+    finally:
+        pool.close()
+        if recorder is not None:
+            recorder.close()
+
+
+def serve_warm() -> int:
+    """GUI が事前に起動しておく待機中のワーカー
+
+    準備を済ませてから標準入力の1行目で実行要求（JSON: argv, password）を待ち、
+    受け取ると通常と同じく実行する。要求が来ないまま標準入力が閉じられたら終了する。
+    """
+    warm = WarmStart()
+    try:
+        line = sys.stdin.readline()
+        if not line.strip():
+            return 0
+        request = json.loads(line)
+        args = parse_args(request["argv"])
+        args.password = request["password"]
+        plan = planner.build_plan(args.targets, args.selected_date_list)
+        return run(args, plan, warm)
+    finally:
+        warm.close()
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv == ["--warm"]:
+        return serve_warm()
+
+    args = parse_args(argv)
+    plan = planner.build_plan(args.targets, args.selected_date_list)
+
+    if args.explain:
+        print(plan.explain())
+        estimate = History().estimate(plan, args.coalesce, args.sessions)
+        print(f"予想所要時間 約{format_seconds(estimate.total)}")
+        return 0
+    if not args.events:
+        print(plan.explain())
+
+    if args.password is None:
+        args.password = os.getenv("PRINTBOT_PASSWORD")
+    if args.password is None:
+        args.password = sys.stdin.readline().rstrip("\n")
+    return run(args, plan)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import cProfile
+import io
+import os
+import pstats
+import tracemalloc
+from datetime import datetime
+
+import config
+
+
+class Profiler:
+    """1回の起動の間、メインスレッドを cProfile で、メモリの確保を tracemalloc で計測する
+
+    finish で実行ごとのディレクトリ（PROFILE_DIR の下）へ次のファイルを書き出す。
+    gui.prof（pstats / snakeviz 用）、gui.txt（累計時間の上位）、
+    memory.txt（確保の多い行の上位と最大使用量）。
+    画面の停止の記録も同じディレクトリに置けるよう、directory を先に作る。
+    """
+
+    def __init__(self, directory: str = None):
+        root = directory or config.PROFILE_DIR
+        name = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        self.directory = os.path.join(root, name)
+        os.makedirs(self.directory, exist_ok=True)
+        prune(root)
+        self.profile = cProfile.Profile()
+
+    def start(self) -> None:
+        tracemalloc.start(config.PROFILE_TRACEBACK)
+        self.profile.enable()
+
+    def finish(self) -> str:
+        """計測を終えて結果を書き出し、そのディレクトリを返す"""
+        self.profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.profile.dump_stats(os.path.join(self.directory, "gui.prof"))
+        text = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=text)
+        stats.sort_stats("cumulative").print_stats(config.PROFILE_TOP)
+        with open(os.path.join(self.directory, "gui.txt"), "w", encoding="utf-8") as f:
+            f.write(text.getvalue())
+
+        with open(
+            os.path.join(self.directory, "memory.txt"), "w", encoding="utf-8"
+        ) as f:
+            f.write(f"終了時 {current / 1024:.0f} KiB、最大 {peak / 1024:.0f} KiB\n\n")
+            for stat in snapshot.statistics("lineno")[: config.PROFILE_TOP]:
+                f.write(f"{stat}\n")
+        return self.directory
+
+
+def prune(directory: str) -> None:
+    """古い計測結果を PROFILE_KEEP 件まで減らす"""
+    import shutil
+
+    runs = sorted(os.listdir(directory))
+    for name in runs[: max(0, len(runs) - config.PROFILE_KEEP)]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
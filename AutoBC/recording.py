@@ -0,0 +1,299 @@
+import gzip
+import itertools
+import json
+import statistics
+import threading
+import time
+from datetime import datetime
+
+import config
+from fetch import SearchResult, is_truncated, normalize_date
+from standin_server import report_document
+
+VERSION = 1
+
+
+class Recorder:
+    """実行中のセッション操作を、所要時間と応答の大きさとともに記録する
+
+    gzip した JSON Lines の1行目が実行の内容（印刷対象、納期、実行方法）、
+    以降が1回の操作ずつ（セッション番号、操作、引数、開始時刻、所要時間、応答）。
+    パスワードは記録しない。明細は内容を残さず、納期の列の値ごとの件数だけを残す。
+    """
+
+    def __init__(self, path: str, header: dict):
+        self.path = path
+        self.started = time.monotonic()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.write(
+            {
+                "version": VERSION,
+                "recorded_at": datetime.now().isoformat(timespec="seconds"),
+                **header,
+            }
+        )
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line + "\n")
+
+    def wrap(self, session_factory):
+        """生成したセッションの操作を記録するセッションの生成関数"""
+
+        def factory():
+            return RecordingSession(session_factory(), self, next(self._ids))
+
+        return factory
+
+    def close(self) -> None:
+        self.write({"end": round(time.monotonic() - self.started, 3)})
+        with self._lock:
+            self._file.close()
+
+
+def summarize_rows(rows: list[tuple[str, ...]]) -> dict:
+    """明細を、納期の列の値ごとの件数と列数にまとめる"""
+    dates = {}
+    for row in rows:
+        cell = row[config.RESULT_DATE_COLUMN]
+        dates[cell] = dates.get(cell, 0) + 1
+    return {"dates": dates, "columns": len(rows[0]) if rows else 0}
+
+
+def expand_rows(dates: dict[str, int], columns: int) -> list[tuple[str, ...]]:
+    """summarize_rows の逆（納期の列以外は空）"""
+    width = max(columns, config.RESULT_DATE_COLUMN + 1)
+    rows = []
+    for cell, count in dates.items():
+        row = [""] * width
+        row[config.RESULT_DATE_COLUMN] = cell
+        rows += [tuple(row)] * count
+    return rows
+
+
+class RecordingSession:
+    """セッションの操作をそのまま呼び、所要時間と応答を Recorder へ書く"""
+
+    def __init__(self, session, recorder: Recorder, number: int):
+        self.session = session
+        self.recorder = recorder
+        self.number = number
+
+    def call(self, op: str, args: dict, func, *params):
+        start = time.monotonic()
+        record = {
+            "s": self.number,
+            "op": op,
+            "args": args,
+            "at": round(start - self.recorder.started, 4),
+        }
+        try:
+            result = func(*params)
+        except Exception as e:
+            record.update(sec=round(time.monotonic() - start, 4), error=str(e))
+            self.recorder.write(record)
+            raise
+        record["sec"] = round(time.monotonic() - start, 4)
+        if isinstance(result, SearchResult):
+            record["res"] = {
+                **summarize_rows(result.rows),
+                "truncated": result.truncated,
+            }
+        elif isinstance(result, bytes):
+            record["res"] = {"bytes": len(result)}
+        self.recorder.write(record)
+        return result
+
+    def login(self, user_id: str, password: str) -> None:
+        self.call("login", {"user_id": user_id}, self.session.login, user_id, password)
+
+    def open_report(self) -> None:
+        self.call("open_report", {}, self.session.open_report)
+
+    def search(self, location: str, date_from: str, date_to: str) -> SearchResult:
+        args = {"location": location, "date_from": date_from, "date_to": date_to}
+        return self.call(
+            "search", args, self.session.search, location, date_from, date_to
+        )
+
+    def fetch_report(self) -> bytes:
+        return self.call("fetch_report", {}, self.session.fetch_report)
+
+    def clear(self) -> None:
+        self.call("clear", {}, self.session.clear)
+
+    def keepalive(self) -> None:
+        self.call("keepalive", {}, self.session.keepalive)
+
+    def logout(self) -> None:
+        self.call("logout", {}, self.session.logout)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def load(path: str) -> tuple[dict, list[dict], dict]:
+    """記録を読み込み、(実行の内容, 操作の一覧, 終了時の記録) を返す"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    header, operations, end = records[0], [], {}
+    if header.get("version") != VERSION:
+        raise ValueError(f"対応していない記録の形式です: {header.get('version')}")
+    for record in records[1:]:
+        if "end" in record:
+            end = record
+        else:
+            operations.append(record)
+    return header, operations, end
+
+
+class Workload:
+    """記録した操作から、再生用セッションへの応答と所要時間を引く
+
+    同じ操作・引数の記録があれば記録順に使い、ない場合（新しい版で検索の
+    まとめ方が変わったなど）は、記録された日ごとの明細件数と所要時間の
+    中央値から応答を組み立てる。
+    """
+
+    def __init__(self, operations: list[dict], speed: float = 1.0):
+        self.speed = speed
+        self.recorded = {}  # (操作, 引数) -> [記録]
+        self.durations = {}  # 操作 -> [秒]
+        self.days = {}  # (受渡場所, 納期の値) -> {納期の列の値: 件数}
+        self.columns = config.RESULT_DATE_COLUMN + 1
+        self.fetch_of = {}  # 検索の引数 -> [出力の記録]
+        self._lock = threading.Lock()
+
+        last_search = {}  # セッション番号 -> 直前の検索の引数
+        for record in operations:
+            key = self.key(record["op"], record["args"])
+            self.recorded.setdefault(key, []).append(record)
+            self.durations.setdefault(record["op"], []).append(record["sec"])
+            if record["op"] == "search" and "res" in record:
+                last_search[record["s"]] = key[1]
+                result = record["res"]
+                self.columns = max(self.columns, result["columns"])
+                if not result["truncated"]:
+                    for cell, count in result["dates"].items():
+                        day = self.days.setdefault(
+                            (record["args"]["location"], normalize_date(cell)), {}
+                        )
+                        day[cell] = max(day.get(cell, 0), count)
+            elif record["op"] == "fetch_report" and record["s"] in last_search:
+                self.fetch_of.setdefault(last_search[record["s"]], []).append(record)
+        self.bytes_per_row = self.estimate_bytes_per_row()
+
+    @staticmethod
+    def key(op: str, args: dict) -> tuple:
+        return op, tuple(sorted(args.items()))
+
+    def estimate_bytes_per_row(self) -> int:
+        """明細1件あたりの出力の大きさ（記録から組み立てる応答に使う）"""
+        sizes = []
+        for search_args, fetches in self.fetch_of.items():
+            for search in self.recorded.get(("search", search_args), [])[:1]:
+                rows = sum(search.get("res", {}).get("dates", {}).values())
+                if rows:
+                    sizes += [f["res"]["bytes"] / rows for f in fetches if "res" in f]
+        return int(statistics.median(sizes)) if sizes else 1024
+
+    def take(self, op: str, args: dict) -> dict | None:
+        """同じ操作・引数の記録を記録順に1件取り出す（使い切ったら最初から）"""
+        with self._lock:
+            records = self.recorded.get(self.key(op, args))
+            if not records:
+                return None
+            record = records.pop(0)
+            records.append(record)
+            return record
+
+    def wait(self, op: str, record: dict | None) -> None:
+        """記録した所要時間（なければ同じ操作の中央値）を speed 倍速で待つ"""
+        if record is not None:
+            seconds = record["sec"]
+        else:
+            seconds = statistics.median(self.durations.get(op) or [0.0])
+        if self.speed > 0 and seconds > 0:
+            time.sleep(seconds / self.speed)
+        if record is not None and "error" in record:
+            raise RuntimeError(f"記録時のエラー: {record['error']}")
+
+    def search(self, location: str, date_from: str, date_to: str) -> tuple:
+        """(明細, 表示上限で切り捨てられたか) を返す"""
+        args = {"location": location, "date_from": date_from, "date_to": date_to}
+        record = self.take("search", args)
+        self.wait("search", record)
+        if record is not None:
+            result = record["res"]
+            rows = expand_rows(result["dates"], result["columns"])
+            return rows, result["truncated"]
+
+        dates = {}
+        first, last = normalize_date(date_from), normalize_date(date_to)
+        for (loc, day), cells in self.days.items():
+            if loc == location and first <= day <= last:
+                dates.update(cells)
+        return expand_rows(dates, self.columns), None
+
+    def fetch_report(self, search_args: dict, rows: int) -> int:
+        """直前の検索に対する出力の大きさ（バイト）"""
+        with self._lock:
+            fetches = self.fetch_of.get(self.key("search", search_args)[1])
+            record = None
+            if fetches:
+                record = fetches.pop(0)
+                fetches.append(record)
+        self.wait("fetch_report", record)
+        if record is not None:
+            return record["res"]["bytes"]
+        return self.bytes_per_row * rows
+
+
+class ReplaySession:
+    """記録した応答と所要時間で BC受付の操作を再現するセッション（ネットワーク不要）"""
+
+    def __init__(self, workload: Workload):
+        self.workload = workload
+        self.last_search = None
+        self.rows = []
+
+    def simple(self, op: str) -> None:
+        self.workload.wait(op, self.workload.take(op, {}))
+
+    def login(self, user_id: str, password: str) -> None:
+        self.workload.wait("login", self.workload.take("login", {"user_id": user_id}))
+
+    def open_report(self) -> None:
+        self.simple("open_report")
+
+    def search(self, location: str, date_from: str, date_to: str) -> SearchResult:
+        rows, truncated = self.workload.search(location, date_from, date_to)
+        self.last_search = {
+            "location": location,
+            "date_from": date_from,
+            "date_to": date_to,
+        }
+        self.rows = rows
+        if truncated is None:
+            truncated = is_truncated(len(rows))
+        return SearchResult(rows, truncated)
+
+    def fetch_report(self) -> bytes:
+        size = self.workload.fetch_report(self.last_search or {}, len(self.rows))
+        return report_document(self.rows, size).encode("utf-8")
+
+    def clear(self) -> None:
+        self.simple("clear")
+
+    def keepalive(self) -> None:
+        self.simple("keepalive")
+
+    def logout(self) -> None:
+        self.simple("logout")
+
+    def close(self) -> None:
+        pass
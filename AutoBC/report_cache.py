@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import config
+from core import dates, planner
+
+
+class ReportCache:
+    """受渡場所 × 納期ごとの帳票をディスクに保持するキャッシュ
+
+    帳票の内容は SHA-256 をファイル名として保存し、索引には
+    (受渡場所, 納期) ごとにハッシュ、明細件数、取得時刻を記録する。
+    取得から CACHE_TTL（納期が今日から何日先かで決まる）以内のものを新しいとみなす。
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or os.path.join(config.DATA_DIR, "cache")
+        self.index_path = os.path.join(self.directory, "index.json")
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    @staticmethod
+    def key(job: planner.Job) -> str:
+        return f"{job.location}|{job.date}"
+
+    @staticmethod
+    def ttl(date: str) -> float:
+        """納期の値に対する有効期間（秒）"""
+        offset = planner.date_offset(date)
+        return config.CACHE_TTL[max(0, min(offset, len(config.CACHE_TTL) - 1))]
+
+    def lookup(self, job: planner.Job) -> dict | None:
+        """有効期間内のエントリを返す（命中／未命中は実行ごとに FetchStats で数える）"""
+        with self._lock:
+            entry = self.index.get(self.key(job))
+            fresh = entry is not None and (
+                time.time() - entry["fetched_at"] <= self.ttl(job.date)
+            )
+            return entry if fresh else None
+
+    def load(self, entry: dict) -> bytes | None:
+        """エントリの帳票の内容を読み込む（該当なしの場合は None）"""
+        if not entry.get("hash"):
+            return None
+        with open(os.path.join(self.directory, entry["hash"]), "rb") as f:
+            return f.read()
+
+    def sharing(self, digest: str) -> set[planner.Job]:
+        """同じ帳票の内容を参照しているジョブ"""
+        with self._lock:
+            keys = [k for k, e in self.index.items() if e["hash"] == digest]
+        return {planner.Job(k.split("|", 1)[1], k.split("|", 1)[0]) for k in keys}
+
+    def store(self, job: planner.Job, payload: bytes, rows: int) -> None:
+        """取得した帳票を保存する（同じ内容は1ファイルを共有する）"""
+        digest = hashlib.sha256(payload).hexdigest() if rows else None
+        if digest:
+            path = os.path.join(self.directory, digest)
+            if not os.path.exists(path):
+                try:
+                    self.write(path, payload)
+                except OSError:
+                    # 同じ内容を他の実行が先に書いた（Windows では開かれていると置き換えられない）
+                    if not os.path.exists(path):
+                        raise
+
+        with self._lock:
+            self.index[self.key(job)] = {
+                "hash": digest,
+                "rows": rows,
+                "fetched_at": time.time(),
+            }
+
+    def evict(self) -> int:
+        """DATE_RANGE の範囲外になった納期のエントリと、参照されない内容を削除する"""
+        window = {d["value"] for d in dates.generate_date_data()}
+        with self._lock:
+            expired = [k for k in self.index if k.split("|", 1)[1] not in window]
+            for k in expired:
+                del self.index[k]
+            referenced = {e["hash"] for e in self.index.values() if e["hash"]}
+
+        for name in os.listdir(self.directory):
+            if len(name) == 64 and name not in referenced:
+                os.remove(os.path.join(self.directory, name))
+        return len(expired)
+
+    def save(self) -> None:
+        """索引をディスクへ書き出す（同時に保存しても古い内容で上書きしない）"""
+        with self._save_lock:
+            with self._lock:
+                data = json.dumps(self.index, ensure_ascii=False)
+            self.write(self.index_path, data.encode("utf-8"))
+
+    def write(self, path: str, data: bytes) -> None:
+        """一時ファイルに書いてから置き換える
+
+        一時ファイルは書き込みごとに別の名前にする（ブローカーでは同じキャッシュへ
+        複数の実行が同時に書くため、固定の名前では互いの書きかけを置き換えてしまう）。
+        """
+        fd, tmp = tempfile.mkstemp(
+            prefix=os.path.basename(path) + ".", suffix=".tmp", dir=self.directory
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
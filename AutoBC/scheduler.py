@@ -0,0 +1,143 @@
+import itertools
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import config
+from core import planner
+from report_cache import ReportCache
+from staging import StagingArea
+
+
+class FlightAbandoned(Exception):
+    """取得を担当していた実行要求が、結果を出さずに終了した"""
+
+
+class Scheduler:
+    """ブローカーに届く複数の実行要求（テナント）の取得を調停する
+
+    - 同じ (受渡場所, 納期) の取得は同時に1件だけ行い、後から来た要求は
+      その結果を待って自分の印刷先へ印刷する（single-flight）
+    - 同時に使うセッション数を全体で max_sessions に抑え、空いた枠は
+      使用中の枠が最も少ないテナントへ順に割り当てる
+    """
+
+    def __init__(self, max_sessions: int = config.SCHEDULER_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self.cache = ReportCache() if config.USE_CACHE else None
+        self.staging = StagingArea()
+        self.flights = {}  # Job -> Future[(帳票の内容, {Job: 明細件数})]
+
+        self._held = Counter()  # テナント -> 使用中の枠
+        self._waiting = {}  # テナント -> 待っているスレッドの順番（古い順）
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+        self._lock = threading.Lock()
+
+    # --- セッション枠の公平な割り当て ---
+
+    def _next_tenant(self):
+        """次に枠を割り当てるテナント（使用中の枠が少なく、先に待ち始めた順）"""
+        if not self._waiting:
+            return None
+        return min(self._waiting, key=lambda t: (self._held[t], self._waiting[t][0]))
+
+    def acquire(self, tenant: str) -> None:
+        """枠が割り当てられるまで待つ（同じテナントの複数のスレッドは待ち始めた順）"""
+        with self._condition:
+            turn = next(self._order)
+            self._waiting.setdefault(tenant, deque()).append(turn)
+            self._condition.wait_for(
+                lambda: sum(self._held.values()) < self.max_sessions
+                and self._next_tenant() == tenant
+                and self._waiting[tenant][0] == turn
+            )
+            self._held[tenant] += 1
+            self._waiting[tenant].popleft()
+            if not self._waiting[tenant]:
+                del self._waiting[tenant]
+            self._condition.notify_all()
+
+    def release(self, tenant: str) -> None:
+        with self._condition:
+            self._held[tenant] -= 1
+            if self._held[tenant] <= 0:
+                del self._held[tenant]
+            self._condition.notify_all()
+
+    def should_yield(self, tenant: str) -> bool:
+        """枠を譲るべきテナントが待っているかどうか
+
+        譲った後も使用中の枠の差が1以内に収まる相手か、まだ枠のない相手がいれば譲る。
+        待っているスレッドが1つでも残っているテナントは相手に含める。
+        """
+        with self._condition:
+            held = self._held[tenant]
+            return any(
+                self._held[other] < held - 1 or (self._held[other] == 0 and held > 0)
+                for other in self._waiting
+                if other != tenant
+            )
+
+    # --- single-flight ---
+
+    def claim(self, jobs: list[planner.Job]) -> dict[planner.Job, Future]:
+        """取得中のジョブは待ち受け用の Future を返し、残りは取得担当として登録する
+
+        Returns:
+            dict: 他の要求が取得中のジョブ -> 結果の Future
+        """
+        attached = {}
+        with self._lock:
+            for job in jobs:
+                future = self.flights.get(job)
+                if future is not None and not future.done():
+                    attached[job] = future
+                else:
+                    self.flights[job] = Future()
+        return attached
+
+    def complete(self, payload: bytes, rows: dict[planner.Job, int]) -> None:
+        """1回の検索で取得した結果を、そのジョブを待つ要求へ渡す"""
+        with self._lock:
+            futures = [self.flights.pop(job, None) for job in rows]
+        for future in futures:
+            if future is not None and not future.done():
+                future.set_result((payload, rows))
+
+    def abandon(self, jobs: list[planner.Job]) -> None:
+        """結果を出せなかったジョブの待ち受けを解放する（待っていた要求が自分で取得する）"""
+        with self._lock:
+            futures = [self.flights.pop(job, None) for job in jobs]
+        for future in futures:
+            if future is not None and not future.done():
+                future.set_exception(FlightAbandoned())
+
+
+class TenantSource:
+    """SessionPool からの貸し出しを、Scheduler の枠の割り当てに従わせる"""
+
+    def __init__(self, pool, scheduler: Scheduler, tenant: str):
+        self.pool = pool
+        self.scheduler = scheduler
+        self.tenant = tenant
+
+    def acquire(self):
+        self.scheduler.acquire(self.tenant)
+        try:
+            return self.pool.acquire()
+        except Exception:
+            self.scheduler.release(self.tenant)
+            raise
+
+    def release(self, session, ok: bool = True) -> None:
+        try:
+            self.pool.release(session, ok)
+        finally:
+            self.scheduler.release(self.tenant)
+
+    def relogin(self, session) -> None:
+        self.pool.relogin(session)
+
+    def should_yield(self) -> bool:
+        return self.scheduler.should_yield(self.tenant)
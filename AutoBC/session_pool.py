@@ -0,0 +1,173 @@
+import threading
+import time
+
+import config
+from metrics import span
+
+
+class SessionExpired(Exception):
+    """サーバー側でセッションの有効期限が切れている"""
+
+
+def session_class(backend: str = config.SESSION_BACKEND):
+    """操作方法に応じたセッションのクラスを返す"""
+    if backend == "http":
+        from http_session import HttpSession
+
+        return HttpSession
+    from browser import BrowserSession
+
+    return BrowserSession
+
+
+def open_session(session_factory, user_id: str, password: str):
+    """セッションを生成し、ログインして帳票検索画面まで移動する"""
+    session = session_factory()
+    try:
+        with span("login"):
+            session.login(user_id, password)
+        with span("navigate"):
+            session.open_report()
+    except Exception:
+        session.close()
+        raise
+    return session
+
+
+def close_session(session) -> None:
+    """ログアウトしてセッションを終了する"""
+    try:
+        with span("logout"):
+            session.logout()
+    finally:
+        session.close()
+
+
+class SessionPool:
+    """ログイン済みで帳票検索画面まで移動したセッションを保持して貸し出す
+
+    待機中のセッションには KEEPALIVE_INTERVAL 秒ごとに keepalive を送り、
+    サーバー側で期限切れになっていた場合は再ログインしてから貸し出す。
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        user_id: str,
+        password: str,
+        size: int = config.FETCH_SESSIONS,
+    ):
+        self.session_factory = session_factory
+        self.user_id = user_id
+        self.password = password
+        self.size = size
+
+        self._idle = []  # (session, 最終利用時刻)
+        self._leased = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._keepalive = threading.Thread(target=self._keepalive_loop, daemon=True)
+        self._keepalive.start()
+
+    def acquire(self):
+        """待機中のセッションを貸し出す（なければ上限まで新たにログインする）"""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._closed or self._idle or self._leased < self.size
+            )
+            if self._closed:
+                raise RuntimeError("セッションプールは終了しています")
+            self._leased += 1
+            entry = self._idle.pop() if self._idle else None
+
+        try:
+            if entry is None:
+                return self._open()
+            session, last_used = entry
+            if time.monotonic() - last_used > config.KEEPALIVE_INTERVAL:
+                session = self._refresh(session)
+            return session
+        except Exception:
+            with self._condition:
+                self._leased -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, session, ok: bool = True) -> None:
+        """セッションを返却する（異常終了したセッションは破棄する）"""
+        with self._condition:
+            self._leased -= 1
+            keep = ok and not self._closed
+            if keep:
+                self._idle.append((session, time.monotonic()))
+            self._condition.notify()
+        if not keep:
+            self._discard(session)
+
+    def relogin(self, session) -> None:
+        """貸し出し中に期限切れになったセッションで、ログインし直す"""
+        with span("login"):
+            session.login(self.user_id, self.password)
+        with span("navigate"):
+            session.open_report()
+
+    def warm_count(self) -> int:
+        """すぐに貸し出せるセッション数"""
+        with self._condition:
+            return len(self._idle)
+
+    def close(self) -> None:
+        """すべての待機中セッションをログアウトして終了する"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for session, _ in idle:
+            self._discard(session)
+
+    def _open(self):
+        return open_session(self.session_factory, self.user_id, self.password)
+
+    def _refresh(self, session):
+        """keepalive を送り、期限切れなら再ログインしたセッションを返す"""
+        try:
+            with span("keepalive"):
+                session.keepalive()
+            return session
+        except Exception:
+            try:
+                session.close()
+            except Exception:
+                pass
+            return self._open()
+
+    def _discard(self, session) -> None:
+        try:
+            close_session(session)
+        except Exception as e:
+            print(f"セッション終了処理中にエラー発生: {e}")
+
+    def _keepalive_loop(self) -> None:
+        while True:
+            time.sleep(config.KEEPALIVE_INTERVAL / 4)
+            with self._condition:
+                if self._closed:
+                    return
+                now = time.monotonic()
+                stale = [
+                    entry
+                    for entry in self._idle
+                    if now - entry[1] > config.KEEPALIVE_INTERVAL
+                ]
+                for entry in stale:
+                    self._idle.remove(entry)
+                self._leased += len(stale)
+
+            for session, _ in stale:
+                try:
+                    self.release(self._refresh(session))
+                except Exception as e:
+                    print(f"再ログインに失敗しました: {e}")
+                    with self._condition:
+                        self._leased -= 1
+                        self._condition.notify()
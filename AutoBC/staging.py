@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import config
+from core import dates, planner
+from pipeline import Report, render
+
+
+def digest_rows(rows: list[tuple[str, ...]]) -> str:
+    """明細の内容を表すハッシュ（並び順によらない）"""
+    data = json.dumps(sorted(rows), ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class StagingArea:
+    """夜間の事前取得で印刷用に変換済みの帳票を置いておく場所
+
+    受渡場所 × 納期ごとに、変換済みのファイル、明細件数、明細のハッシュ、
+    取得時刻を索引に記録する。朝の実行では検索結果の明細のハッシュが一致した
+    ものだけを取得し直さずに印刷し、印刷したものは索引から外す。
+    ブローカーでは全実行が Scheduler の1つのインスタンスを共有する（索引を別々に
+    読み書きすると、互いの変更を上書きしたり使用中のファイルを消したりするため）。
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or config.STAGING_DIR
+        self.index_path = os.path.join(self.directory, "index.json")
+        self.used = 0
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    @staticmethod
+    def key(job: planner.Job) -> str:
+        return f"{job.location}|{job.date}"
+
+    def stage(self, report: Report, digests: dict[planner.Job, str]) -> None:
+        """1日分の帳票を変換して置く（複数日分の帳票は置かない）"""
+        if len(report.rows) != 1:
+            return
+        job, rows = next(iter(report.rows.items()))
+        # 変換したファイルを索引に載せる前に evict に消されないよう、まとめて行う
+        with self._lock:
+            path = render(report, self.directory)
+            self.index[self.key(job)] = {
+                "file": os.path.basename(path),
+                "rows": rows,
+                "digest": digests.get(job),
+                "fetched_at": time.time(),
+            }
+
+    def lookup(self, job: planner.Job) -> dict | None:
+        """STAGING_MAX_AGE 以内に置かれたエントリ"""
+        with self._lock:
+            entry = self.index.get(self.key(job))
+        if entry is None or time.time() - entry["fetched_at"] > config.STAGING_MAX_AGE:
+            return None
+        return entry
+
+    def report(self, job: planner.Job, entry: dict) -> Report | None:
+        """置いてある帳票を、変換済みのファイルを指す Report として読み込む"""
+        path = os.path.join(self.directory, entry["file"])
+        try:
+            with open(path, "rb") as f:
+                payload = f.read()
+        except OSError:
+            return None
+        return Report(payload, {job: entry["rows"]}, path)
+
+    def discard(self, jobs: list[planner.Job]) -> None:
+        """印刷した（または使えなくなった）エントリを外す"""
+        with self._lock:
+            for job in jobs:
+                self.index.pop(self.key(job), None)
+
+    def evict(self) -> int:
+        """DATE_RANGE の範囲外の納期のエントリと、参照されないファイルを削除する"""
+        window = {d["value"] for d in dates.generate_date_data()}
+        with self._lock:
+            expired = [k for k in self.index if k.split("|", 1)[1] not in window]
+            for k in expired:
+                del self.index[k]
+            referenced = {e["file"] for e in self.index.values()}
+            for name in os.listdir(self.directory):
+                if name == "index.json" or name in referenced:
+                    continue
+                if name.endswith(".tmp"):
+                    continue  # 保存中の索引
+                os.remove(os.path.join(self.directory, name))
+        return len(expired)
+
+    def save(self) -> None:
+        """索引をディスクへ書き出す（一時ファイルは保存ごとに別の名前にする）"""
+        with self._save_lock:
+            with self._lock:
+                data = json.dumps(self.index, ensure_ascii=False)
+            fd, tmp = tempfile.mkstemp(
+                prefix="index.json.", suffix=".tmp", dir=self.directory
+            )
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(data)
+                os.replace(tmp, self.index_path)
+            except BaseException:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                raise
+
+    def summary(self) -> str:
+        return f"事前取得 使用 {self.used} 件、残り {len(self.index)} 件"
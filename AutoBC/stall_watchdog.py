@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import config
+
+
+def callback_of(stack: list) -> str:
+    """メインループから呼ばれたコールバックの名前（スタックの外側から探す）
+
+    tkinter 内部の呼び出しと、after や bind に渡した lambda は飛ばす。
+    """
+    tkinter_dir = os.path.dirname(sys.modules["tkinter"].__file__)
+    in_mainloop = False
+    fallback = ""
+    for entry in stack:
+        if entry.filename.startswith(tkinter_dir):
+            in_mainloop = in_mainloop or entry.name == "mainloop"
+            continue
+        if not in_mainloop:
+            continue
+        if entry.name != "<lambda>":
+            return entry.name
+        fallback = fallback or f"{os.path.basename(entry.filename)}:{entry.lineno}"
+    return fallback or "不明"
+
+
+class StallWatchdog:
+    """Tk のメインループが止まっている（コールバックが処理を返さない）時間を検出する
+
+    root.after で interval ミリ秒ごとに心拍を打ち、予定より threshold 秒以上
+    遅れた心拍を停止として数える。停止中は監視スレッドがメインスレッドの
+    スタックを取得するため、どのコールバックで止まっていたかが分かる。
+    停止は1件1行の JSON として path（省略時は STALL_LOG）へ追記する。
+
+    Args:
+        root: 監視する Tk のルートウィンドウ（メインスレッドで生成すること）
+        threshold: 停止とみなす心拍の遅れ（秒）
+        interval: 心拍の間隔（ミリ秒）
+        path: 停止の記録を追記するファイル
+    """
+
+    def __init__(
+        self,
+        root,
+        threshold: float = config.STALL_THRESHOLD,
+        interval: int = config.STALL_HEARTBEAT,
+        path: str = None,
+    ):
+        self.root = root
+        self.threshold = threshold
+        self.interval = interval
+        self.path = path or config.STALL_LOG
+        self.thread_id = threading.get_ident()
+        self.count = 0
+        self.longest = 0.0
+        self.callbacks = Counter()  # コールバック -> 停止の回数
+        self._expected = None  # 次の心拍の予定時刻（perf_counter）
+        self._stack = None  # 停止中に取得したスタック
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        self._expected = time.perf_counter() + self.interval / 1000
+        self.root.after(self.interval, self.beat)
+        threading.Thread(
+            target=self.monitor, name="stall-watchdog", daemon=True
+        ).start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def beat(self) -> None:
+        """心拍（メインスレッド）。遅れが threshold 以上なら停止として記録する"""
+        if self._stopped.is_set():
+            return
+        now = time.perf_counter()
+        with self._lock:
+            late = now - self._expected
+            stack, self._stack = self._stack, None
+            self._expected = now + self.interval / 1000
+        if late >= self.threshold:
+            self.record(late, stack)
+        self.root.after(self.interval, self.beat)
+
+    def monitor(self) -> None:
+        """心拍が threshold 以上遅れたら、止まっている間にメインスレッドのスタックを取る"""
+        import traceback
+
+        while not self._stopped.wait(self.threshold / 2):
+            with self._lock:
+                if self._stack is not None:
+                    continue  # この停止のスタックは取得済み
+                if time.perf_counter() - self._expected < self.threshold:
+                    continue
+                frame = sys._current_frames().get(self.thread_id)
+                if frame is not None:
+                    self._stack = traceback.extract_stack(frame)
+                del frame
+
+    def record(self, seconds: float, stack) -> None:
+        callback = callback_of(stack) if stack else "不明"
+        self.count += 1
+        self.longest = max(self.longest, seconds)
+        self.callbacks[callback] += 1
+        print(f"画面の停止 {seconds:.2f} 秒（{callback}）")
+
+        record = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "seconds": round(seconds, 3),
+            "callback": callback,
+            "stack": (
+                [f"{os.path.basename(e.filename)}:{e.lineno} {e.name}" for e in stack]
+                if stack
+                else []
+            ),
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) > (
+                config.STALL_LOG_MAX
+            ):
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError:
+            pass  # 記録できなくても画面の動作は止めない
+
+    def summary(self) -> str:
+        if not self.count:
+            return "画面の停止なし"
+        counts = "、".join(f"{name} {n} 回" for name, n in self.callbacks.most_common())
+        return f"画面の停止 {self.count} 回（最長 {self.longest:.2f} 秒）: {counts}"
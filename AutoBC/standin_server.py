@@ -0,0 +1,320 @@
+import argparse
+import hashlib
+import html
+import random
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="UTF-8">
+  <title>BC受付 ログイン</title>
+</head>
+<body>
+  <h2>BC受付</h2>
+  <form method="post" action="/login">
+    <label>ユーザーID:</label><br>
+    <input type="text" name="userId"><br><br>
+    <label>パスワード:</label><br>
+    <input type="password" name="userPwd"><br><br>
+    <input type="submit" name="loginButton" value="ログイン">
+  </form>
+</body>
+</html>
+"""
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="UTF-8">
+  <title>BC受付 {title}</title>
+</head>
+<body>
+  <h2>{title}</h2>
+  <form method="post" action="{action}">
+    <input type="hidden" name="token" value="{token}">
+{content}
+    <input type="submit" name="logout" value="ログアウト"
+           onclick="return confirm('ログアウトしますか？')">
+  </form>
+</body>
+</html>
+"""
+
+
+def select_page(title: str, name: str, count: int, token: str) -> str:
+    """ENTER（onchange）で送信される選択肢の画面"""
+    options = "\n".join(
+        f'      <option value="{i:02d}">{title} {i}</option>' for i in range(count)
+    )
+    content = (
+        f'    <select name="{name}" onchange="this.form.submit()">\n'
+        f"{options}\n    </select>"
+    )
+    return PAGE.format(title=title, action="/menu", token=token, content=content)
+
+
+def search_page(token: str) -> str:
+    content = """    受渡場所 <input type="text" name="locationCode"><br>
+    納期 <input type="text" name="proDateFrom"> ～ <input type="text" name="proDateTo">
+    <input type="submit" name="searchButton" value="検索[F4]">"""
+    return PAGE.format(title="帳票検索", action="/report", token=token, content=content)
+
+
+def parse_date(text: str) -> datetime | None:
+    for fmt in ("%y/%m/%d", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(text.strip(), fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def make_rows(location: str, date_from: str, date_to: str) -> list[tuple[str, ...]]:
+    """受渡場所と納期から決まる明細（日によっては該当なし、土日はなし）"""
+    start, end = parse_date(date_from), parse_date(date_to)
+    if not location or start is None or end is None:
+        return []
+    rows = []
+    day = start
+    while day <= end:
+        seed = hashlib.sha256(f"{location}|{day:%Y%m%d}".encode()).digest()
+        for n in range(seed[0] % 4 if day.weekday() < 5 else 0):
+            rows.append(
+                (
+                    day.strftime("%Y/%m/%d"),
+                    location,
+                    f"BC-{seed[1 + n]:03d}",
+                    str(n + 1),
+                )
+            )
+        day += timedelta(days=1)
+    return rows
+
+
+def result_page(rows: list[tuple[str, ...]], token: str) -> str:
+    lines = ["    <table>"]
+    for i, row in enumerate(rows):
+        cells = "".join(f"<td>{html.escape(cell)}</td>" for cell in row)
+        lines.append(
+            f'      <tr><td><input type="checkbox" name="checkbox{i}"></td>{cells}</tr>'
+        )
+    lines.append("    </table>")
+    # 出力は別ウィンドウに開き、戻るは確認のアラートを出す（BC受付と同じ）
+    lines.append(
+        '    <input type="submit" name="printButton" value="出力[F12]" formtarget="_blank">'
+    )
+    lines.append(
+        '    <input type="submit" name="clearReturn" value="戻る[F8]"'
+        " onclick=\"return confirm('検索条件をクリアして戻りますか？')\">"
+    )
+    content = "\n".join(lines)
+    return PAGE.format(title="帳票出力", action="/report", token=token, content=content)
+
+
+def report_document(rows: list[tuple[str, ...]], size: int = 0) -> str:
+    """出力[F12]で開く帳票（size を指定すると、その大きさまで埋める）"""
+    body = "\n".join(
+        "<tr>" + "".join(f"<td>{html.escape(cell)}</td>" for cell in row) + "</tr>"
+        for row in rows
+    )
+    document = (
+        '<html><head><meta charset="UTF-8"><title>BC識別票</title></head>'
+        f"<body><table>\n{body}\n</table></body></html>"
+    )
+    padding = size - len(document.encode("utf-8")) - len("<!--  -->")
+    if padding > 0:
+        document += f"<!-- {'x' * padding} -->"
+    return document
+
+
+@dataclass
+class Faults:
+    """応答に加える遅延、エラー、帳票の大きさ（性能の計測用）
+
+    Attributes:
+        latency: 各リクエストの応答前に待つ時間（秒）
+        jitter: latency に加える 0〜jitter 秒の乱数
+        error_rate: 503 を返す割合（0〜1、ログイン画面の表示は除く）
+        payload_size: 帳票の最小の大きさ（バイト）
+        seed: 乱数の種（同じ値なら同じ順に遅延とエラーが起きる）
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    payload_size: int = 0
+    seed: int | None = None
+
+
+class StandinState:
+    """ログイン中のセッションと、各セッションの直前の検索結果"""
+
+    def __init__(self, faults: Faults = None):
+        self.sessions = {}  # セッションID -> {"token", "rows"}
+        self.requests = 0
+        self.errors = 0
+        self.faults = faults or Faults()
+        self.random = random.Random(self.faults.seed)
+        self.lock = threading.Lock()
+
+    def inject(self) -> bool:
+        """遅延を入れ、エラーにするリクエストなら True を返す"""
+        with self.lock:
+            delay = self.faults.latency + self.random.uniform(0, self.faults.jitter)
+            fail = self.random.random() < self.faults.error_rate
+            self.errors += fail
+        if delay > 0:
+            time.sleep(delay)
+        return fail
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """BC受付の画面遷移（ログイン → メニュー → 帳票 → 検索 → 出力）を模した応答"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+    state: StandinState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def session(self) -> tuple[str, dict] | tuple[None, None]:
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        sid = cookie["sid"].value if "sid" in cookie else None
+        with self.state.lock:
+            self.state.requests += 1
+            return (
+                (sid, self.state.sessions[sid])
+                if sid in self.state.sessions
+                else (None, None)
+            )
+
+    def send(self, body: str, status: int = 200, headers: dict = None) -> None:
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def redirect(self, location: str, headers: dict = None) -> None:
+        self.send("", 303, {"Location": location, **(headers or {})})
+
+    def read_form(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return dict(parse_qsl(self.rfile.read(length).decode("utf-8")))
+
+    def unavailable(self) -> bool:
+        """エラーを注入するリクエストなら 503 を返して True"""
+        if not self.state.inject():
+            return False
+        self.send("<html><body>ただいま混雑しています</body></html>", 503)
+        return True
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        sid, session = self.session()
+        if path != "/login" and self.unavailable():
+            return
+        if path == "/login" or session is None:
+            if path == "/login":
+                self.send(LOGIN_PAGE)
+            else:
+                self.redirect("/login")
+        elif path == "/menu":
+            self.send(select_page("メニュー", "menuList", 10, session["token"]))
+        elif path == "/report":
+            self.send(search_page(session["token"]))
+        else:
+            self.send("", 404)
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        form = self.read_form()
+        if self.unavailable():
+            return
+        if path == "/login":
+            if not form.get("userId") or not form.get("userPwd"):
+                self.send(LOGIN_PAGE)
+                return
+            sid = secrets.token_hex(16)
+            with self.state.lock:
+                self.state.sessions[sid] = {"token": secrets.token_hex(8), "rows": []}
+            self.redirect("/menu", {"Set-Cookie": f"sid={sid}; Path=/"})
+            return
+
+        sid, session = self.session()
+        if session is None or form.get("token") != session["token"]:
+            self.redirect("/login")
+        elif "logout" in form:
+            with self.state.lock:
+                self.state.sessions.pop(sid, None)
+            self.redirect("/login")
+        elif path == "/menu" and form.get("menuList") == "08":
+            self.send(select_page("帳票", "reportList", 8, session["token"]))
+        elif path == "/menu" and form.get("reportList") == "05":
+            self.redirect("/report")
+        elif path == "/menu":
+            self.redirect("/menu")
+        elif "searchButton" in form:
+            session["rows"] = make_rows(
+                form.get("locationCode", ""),
+                form.get("proDateFrom", ""),
+                form.get("proDateTo", ""),
+            )
+            self.send(result_page(session["rows"], session["token"]))
+        elif "printButton" in form:
+            self.send(report_document(session["rows"], self.state.faults.payload_size))
+        elif "clearReturn" in form:
+            self.redirect("/report")
+        else:
+            self.send("", 400)
+
+
+def serve(port: int = 0, faults: Faults = None) -> ThreadingHTTPServer:
+    """スタンドインを別スレッドで起動する（port=0 なら空いているポート）"""
+    handler = type("Handler", (StandinHandler,), {"state": StandinState(faults)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="BC受付のスタンドイン（動作確認用）")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="応答の遅延（秒）")
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="遅延に加える乱数の上限（秒）"
+    )
+    parser.add_argument(
+        "--error_rate", type=float, default=0.0, help="503 を返す割合（0〜1）"
+    )
+    parser.add_argument(
+        "--payload_kb", type=int, default=0, help="帳票の最小の大きさ（KB）"
+    )
+    parser.add_argument("--seed", type=int, help="遅延とエラーの乱数の種")
+    args = parser.parse_args()
+
+    faults = Faults(
+        args.latency, args.jitter, args.error_rate, args.payload_kb * 1024, args.seed
+    )
+    server = serve(args.port, faults)
+    print(f"http://127.0.0.1:{server.server_port}/login で待ち受けています", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+# 実際のデータ（キャッシュ、実行の記録など）に触れないよう、config を読み込む前に
+# データの保存先を一時ディレクトリへ差し替える
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="printbot-test-")
+atexit.register(shutil.rmtree, os.environ["APPDATA"], True)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,22 @@
+from broker import Broker
+
+
+def test_pool_replaced_while_in_use_is_closed_after_release():
+    broker = Broker()
+    first = broker.get_pool("user", "old", "http")
+    second = broker.get_pool("user", "old", "http")
+    assert first is second
+
+    # パスワードが変わっても、使用中の実行が返すまで古いプールは閉じない
+    renewed = broker.get_pool("user", "new", "http")
+    assert renewed is not first
+    broker.release_pool(first)
+    assert not first._closed
+    broker.release_pool(second)
+    assert first._closed
+    assert first not in broker.users
+
+    broker.release_pool(renewed)
+    assert not renewed._closed
+    broker.close()
+    assert renewed._closed
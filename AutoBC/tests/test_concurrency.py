@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+import config
+from concurrency import AimdController
+
+
+@pytest.fixture(autouse=True)
+def aimd(monkeypatch):
+    monkeypatch.setattr(config, "AIMD_INITIAL", 1)
+    monkeypatch.setattr(config, "AIMD_INCREASE", 1.0)
+    monkeypatch.setattr(config, "AIMD_DECREASE", 0.5)
+    monkeypatch.setattr(config, "AIMD_LATENCY_FACTOR", 2.0)
+    monkeypatch.setattr(config, "AIMD_ERROR_RATE", 0.2)
+    monkeypatch.setattr(config, "AIMD_SMOOTHING", 0.2)
+
+
+def targets(controller: AimdController, samples: list[tuple[float, bool]]):
+    """(応答時間, 成否) を1件ずつ記録し、各記録後の target を返す"""
+
+    async def drive():
+        result = []
+        for latency, ok in samples:
+            await controller.acquire()
+            await controller.release(latency, ok)
+            result.append(controller.target)
+        return result
+
+    return asyncio.run(drive())
+
+
+def test_additive_increase_up_to_max_limit():
+    changes = []
+    controller = AimdController(4, lambda current, target: changes.append(target))
+
+    # target 件の完了ごとに1ずつ増え、上限で止まる
+    assert targets(controller, [(0.1, True)] * 11) == [
+        2, 2, 3, 3, 3, 4, 4, 4, 4, 4, 4
+    ]  # fmt: skip
+    assert changes[-1] == 4
+
+
+def test_errors_halve_at_most_once_per_cycle():
+    controller = AimdController(8)
+    targets(controller, [(0.1, True)] * 10)
+    assert controller.target == 5
+
+    # 1回目の失敗で半減し、次の周期（target 件）が終わるまでは減らさない
+    assert targets(controller, [(0.1, False)] * 5) == [2, 2, 1, 1, 1]
+    # 平滑化したエラー率が AIMD_ERROR_RATE を下回るまでは増やさない
+    assert targets(controller, [(0.1, True)] * 7) == [1, 1, 1, 1, 1, 2, 2]
+
+
+def test_latency_rise_halves_target():
+    controller = AimdController(8)
+    targets(controller, [(0.1, True)] * 10)
+    assert controller.target == 5
+
+    # 平滑化した応答時間が最良値の2倍を超えたら半減する
+    assert targets(controller, [(1.0, True)] * 3) == [2, 2, 1]
+    # 応答時間が戻れば、また加算で増える
+    assert targets(controller, [(0.1, True)] * 12)[-1] > 1
@@ -0,0 +1,34 @@
+import json
+import os
+
+from eta import History
+
+
+def write_trace(path, location: str, seconds: float) -> str:
+    record = {
+        "stage": "search",
+        "location": location,
+        "date_from": "26/01/05",
+        "date_to": "26/01/05",
+        "seconds": seconds,
+        "ok": True,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    return str(path)
+
+
+def test_overlapping_runs_keep_each_others_samples(tmp_path):
+    path = str(tmp_path / "history.json")
+    # 2つの実行が同時に始まり、それぞれ開始時の履歴を読み込んでいる
+    first, second = History(path), History(path)
+
+    first.learn(write_trace(tmp_path / "a.jsonl", "K11", 1.0), 2.0)
+    second.learn(write_trace(tmp_path / "b.jsonl", "K12", 3.0), 4.0)
+
+    history = History(path)
+    assert history.runs == 2
+    assert history.stages["search|K11|*"] == [1.0, 1]
+    assert history.stages["search|K12|*"] == [3.0, 1]
+    assert history.stages["search|*|*"][1] == 2
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
@@ -0,0 +1,290 @@
+import functools
+import itertools
+import os
+import re
+import threading
+import time
+from datetime import timedelta
+from http.cookies import SimpleCookie
+
+import pytest
+
+import config
+import standin_server
+from core import planner
+from events import Reporter
+from fetch import FetchEngine
+from http_session import HttpSession
+from printing import FileSinkPrinter
+from report_cache import ReportCache
+from scheduler import Scheduler, TenantSource
+from session_pool import SessionPool
+
+DATES = ["26/01/05", "26/01/06", "26/01/07", "26/01/08", "26/01/09"]
+
+
+@pytest.fixture
+def login_url():
+    server = standin_server.serve()
+    yield f"http://127.0.0.1:{server.server_port}/login"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def spool(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SPOOL_DIR", str(tmp_path / "spool"))
+
+
+def run(login_url, user, sink, cache, scheduler=None, dates=DATES):
+    """1人分の実行（ブローカーと同じく、スケジューラーとキャッシュを共有できる）"""
+    pool = SessionPool(functools.partial(HttpSession, login_url), user, "pw", 2)
+    source = pool if scheduler is None else TenantSource(pool, scheduler, user)
+    engine = FetchEngine(
+        source,
+        2,
+        cancel=threading.Event(),
+        cache=cache,
+        probe=False,
+        printer=FileSinkPrinter(sink),
+        flights=scheduler,
+    )
+    try:
+        return engine.run(planner.build_plan(["FSP"], dates))
+    finally:
+        pool.close()
+
+
+def printed_files(sink) -> int:
+    return len([name for name in os.listdir(sink) if name != "jobs.log"])
+
+
+def test_cache_hit_is_printed(login_url, tmp_path):
+    cache = ReportCache(str(tmp_path / "cache"))
+    first = run(login_url, "alice", str(tmp_path / "first"), cache)
+    second = run(login_url, "alice", str(tmp_path / "second"), cache)
+
+    assert first.searches > 0 and first.printed > 0
+    assert second.searches == 0
+    assert second.printed == first.printed
+    assert printed_files(tmp_path / "second") == printed_files(tmp_path / "first")
+
+
+def test_shared_cache_counts_per_run(login_url, tmp_path):
+    # ブローカーでは全員が1つのキャッシュを共有する
+    scheduler = Scheduler(max_sessions=4)
+    scheduler.cache = ReportCache(str(tmp_path / "cache"))
+    jobs = len(planner.build_plan(["FSP"], DATES))
+
+    alice = run(login_url, "alice", str(tmp_path / "alice"), scheduler.cache, scheduler)
+    bob = run(login_url, "bob", str(tmp_path / "bob"), scheduler.cache, scheduler)
+
+    assert (alice.cached, alice.cache_misses) == (0, jobs)
+    assert (bob.cached, bob.cache_misses) == (jobs, 0)
+    assert bob.printed == alice.printed > 0
+    assert printed_files(tmp_path / "bob") == printed_files(tmp_path / "alice")
+
+
+def printed_dates(sink) -> set[str]:
+    dates = set()
+    for name in os.listdir(sink):
+        if name != "jobs.log":
+            with open(os.path.join(sink, name), encoding="utf-8") as f:
+                dates.update(re.findall(r"<td>(\d{4}/\d\d/\d\d)</td>", f.read()))
+    return dates
+
+
+def test_attached_run_prints_only_its_own_dates(tmp_path):
+    server = standin_server.serve(faults=standin_server.Faults(latency=0.05))
+    login_url = f"http://127.0.0.1:{server.server_port}/login"
+    scheduler = Scheduler(max_sessions=4)
+    results = {}
+
+    def alice():
+        results["alice"] = run(
+            login_url, "alice", str(tmp_path / "alice"), None, scheduler
+        )
+
+    thread = threading.Thread(target=alice)
+    try:
+        thread.start()
+        # alice が5日分の範囲検索を担当している間に、bob が1日分だけ要求する
+        deadline = time.monotonic() + 10
+        while not scheduler.flights and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert scheduler.flights
+        bob = run(login_url, "bob", str(tmp_path / "bob"), None, scheduler, DATES[:1])
+        thread.join()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert printed_dates(tmp_path / "alice") > {"2026/01/05"}
+    assert printed_dates(tmp_path / "bob") == {"2026/01/05"}
+    assert bob.printed == len(planner.build_plan(["FSP"], DATES[:1]).jobs) - bob.empty
+
+
+class FlakySession(HttpSession):
+    """2回に1回、検索が失敗するセッション"""
+
+    searches = itertools.count(1)
+
+    def search(self, *args):
+        if next(self.searches) % 2 == 0:
+            raise RuntimeError("503")
+        return super().search(*args)
+
+
+class ExpiringSession(HttpSession):
+    """最初の検索の前にサーバー側のセッションが期限切れになるセッション"""
+
+    expired = False
+
+    def search(self, *args):
+        if not self.expired:
+            self.expired = True
+            self.cookies = SimpleCookie()  # サーバーはログイン画面へ戻す
+        return super().search(*args)
+
+
+def test_session_expired_mid_run_logs_in_again(login_url, tmp_path):
+    clean = run(login_url, "alice", str(tmp_path / "clean"), None)
+
+    factory = functools.partial(ExpiringSession, login_url)
+    pool = SessionPool(factory, "alice", "pw", 2)
+    engine = FetchEngine(
+        pool, 2, probe=False, printer=FileSinkPrinter(str(tmp_path / "expired"))
+    )
+    try:
+        stats = engine.run(planner.build_plan(["FSP"], DATES))
+    finally:
+        pool.close()
+
+    assert stats.retries == 0
+    assert stats.printed == clean.printed
+    assert printed_dates(tmp_path / "expired") == printed_dates(tmp_path / "clean")
+
+
+class ErrorRecorder(Reporter):
+    def __init__(self):
+        self.errors = []
+
+    def error(self, message: str) -> None:
+        self.errors.append(message)
+
+
+def test_failed_searches_are_retried_on_fresh_sessions(login_url, tmp_path):
+    clean = run(login_url, "alice", str(tmp_path / "clean"), None)
+
+    pool = SessionPool(functools.partial(FlakySession, login_url), "alice", "pw", 2)
+    reporter = ErrorRecorder()
+    engine = FetchEngine(
+        pool,
+        2,
+        reporter,
+        probe=False,
+        printer=FileSinkPrinter(str(tmp_path / "flaky")),
+    )
+    try:
+        flaky = engine.run(planner.build_plan(["FSP"], DATES))
+    finally:
+        pool.close()
+
+    assert flaky.retries > 0
+    # やり直して成功した検索はエラーとして通知しない
+    assert reporter.errors == []
+    assert flaky.printed == clean.printed
+    assert printed_dates(tmp_path / "flaky") == printed_dates(tmp_path / "clean")
+
+
+def test_search_failing_every_time_fails_the_run(login_url, tmp_path, monkeypatch):
+    monkeypatch.setattr(FlakySession, "search", lambda self, *args: 1 / 0)
+    pool = SessionPool(functools.partial(FlakySession, login_url), "alice", "pw", 2)
+    reporter = ErrorRecorder()
+    engine = FetchEngine(
+        pool, 2, reporter, probe=False, printer=FileSinkPrinter(str(tmp_path / "x"))
+    )
+    try:
+        with pytest.raises(ZeroDivisionError):
+            engine.run(planner.build_plan(["FSP"], DATES))
+    finally:
+        pool.close()
+    assert max(engine._failures.values()) == config.FETCH_RETRIES + 1
+    message = f"{config.FETCH_RETRIES + 1} 回失敗"
+    assert reporter.errors and all(message in error for error in reporter.errors)
+
+
+def test_closed_day_rows_in_a_coalesced_range_are_not_printed(
+    login_url, tmp_path, monkeypatch
+):
+    make_rows = standin_server.make_rows
+
+    def with_weekend_rows(location, date_from, date_to):
+        rows = make_rows(location, date_from, date_to)
+        start = standin_server.parse_date(date_from)
+        end = standin_server.parse_date(date_to)
+        day = start
+        while start and end and day <= end:
+            if day.weekday() >= 5:
+                rows.append((f"{day:%Y/%m/%d}", location, "BC-999", "1"))
+            day += timedelta(days=1)
+        return rows
+
+    # 土日にも明細がある（日別の検索なら休業日として検索しない）
+    monkeypatch.setattr(standin_server, "make_rows", with_weekend_rows)
+    plan = planner.build_plan(["FSP"], ["26/01/16", "26/01/19"])
+    assert all(len(q.jobs) == 2 for q in planner.coalesce(plan))
+
+    pool = SessionPool(functools.partial(HttpSession, login_url), "alice", "pw", 1)
+    sink = str(tmp_path / "sink")
+    engine = FetchEngine(pool, 1, probe=False, printer=FileSinkPrinter(sink))
+    try:
+        stats = engine.run(plan)
+    finally:
+        pool.close()
+
+    assert stats.fallbacks == len(plan)
+    assert printed_dates(sink) <= {"2026/01/16", "2026/01/19"}
+
+
+def test_partly_planned_ranged_report_is_fetched_again(login_url, tmp_path):
+    cache = ReportCache(str(tmp_path / "cache"))
+    run(login_url, "alice", str(tmp_path / "first"), cache)
+
+    pool = SessionPool(functools.partial(HttpSession, login_url), "alice", "pw", 1)
+    engine = FetchEngine(
+        pool, 1, cache=cache, probe=False, printer=FileSinkPrinter(str(tmp_path / "x"))
+    )
+    try:
+        stats = engine.run(planner.build_plan(["FSP"], DATES[:2]))
+    finally:
+        pool.close()
+    # 5日分をまとめた帳票には計画外の納期も含まれるため、使わずに取得し直す
+    assert stats.searches > 0
+
+
+def test_concurrent_stores_of_the_same_report(tmp_path):
+    cache = ReportCache(str(tmp_path / "cache"))
+    payload = b"<html><body>" + b"x" * 200_000 + b"</body></html>"
+    jobs = [planner.Job(f"26/01/{day:02d}", "K11") for day in range(5, 25)]
+    errors = []
+
+    def store(job):
+        try:
+            cache.store(job, payload, 1)
+            cache.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=store, args=(job,)) for job in jobs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert cache.load(cache.lookup(jobs[0])) == payload
+    assert not [name for name in os.listdir(cache.directory) if name.endswith(".tmp")]
+    assert ReportCache(cache.directory).sharing(cache.lookup(jobs[0])["hash"]) == set(
+        jobs
+    )
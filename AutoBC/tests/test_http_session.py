@@ -0,0 +1,93 @@
+import http.client
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import standin_server
+from http_session import HttpSession
+from standin_server import StandinHandler, StandinState
+
+
+class DroppingHandler(StandinHandler):
+    """drop に含まれるボタンの送信を1回だけ、応答せずに切断する"""
+
+    drop = set()
+    posted = []
+
+    def read_form(self) -> dict:
+        form = super().read_form()
+        self.dropping = False
+        for name in sorted(self.drop):
+            if name in form:
+                self.posted.append(name)
+                self.drop.discard(name)
+                self.dropping = True
+        return form
+
+    def send(self, body: str, status: int = 200, headers: dict = None) -> None:
+        if getattr(self, "dropping", False):
+            self.close_connection = True
+            return
+        super().send(body, status, headers)
+
+
+@pytest.fixture
+def server():
+    handler = type(
+        "Handler",
+        (DroppingHandler,),
+        {"state": StandinState(), "drop": set(), "posted": []},
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def open_session(server) -> HttpSession:
+    session = HttpSession(f"http://127.0.0.1:{server.server_port}/login")
+    session.login("user", "password")
+    session.open_report()
+    return session
+
+
+def test_search_and_fetch(server):
+    session = open_session(server)
+    result = session.search("K11", "26/01/05", "26/01/09")
+    expected = standin_server.make_rows("K11", "26/01/05", "26/01/09")
+    assert [row[1:] for row in result.rows] == expected  # 先頭はチェックボックスの列
+    assert not result.truncated
+
+    report = session.fetch_report()
+    for row in expected:
+        assert row[2].encode() in report
+    session.clear()
+    assert session.page.has("locationCode")
+    session.logout()
+    session.close()
+    assert not server.RequestHandlerClass.state.sessions
+
+
+def test_dropped_search_is_sent_again(server):
+    session = open_session(server)
+    server.RequestHandlerClass.drop.add("searchButton")
+    result = session.search("K11", "26/01/05", "26/01/09")
+    expected = standin_server.make_rows("K11", "26/01/05", "26/01/09")
+    assert [row[1:] for row in result.rows] == expected
+    assert server.RequestHandlerClass.posted == ["searchButton"]
+    session.close()
+
+
+def test_dropped_print_is_not_sent_again(server):
+    session = open_session(server)
+    session.search("K11", "26/01/05", "26/01/09")
+    server.RequestHandlerClass.drop.add("printButton")
+    with pytest.raises((http.client.RemoteDisconnected, ConnectionError)):
+        session.fetch_report()
+    # 送り直していれば、サーバーは2回目の出力を受け付けている
+    assert server.RequestHandlerClass.posted == ["printButton"]
+    assert not server.RequestHandlerClass.drop
+    session.close()
@@ -0,0 +1,110 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import config
+import journal
+from core import planner
+from events import Reporter
+
+JOBS = [["26/01/05", "FSP"], ["26/01/06", "FSP"]]
+
+
+@pytest.fixture(autouse=True)
+def journal_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "JOURNAL_DIR", str(tmp_path))
+    return tmp_path
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def write(directory, name, pid, started_at=None, done=0):
+    records = [
+        {
+            "op": "start",
+            "pid": pid,
+            "user_id": "alice",
+            "started_at": started_at or time.time(),
+            "targets": ["FSP"],
+            "dates": ["26/01/05", "26/01/06"],
+            "jobs": JOBS,
+        }
+    ]
+    for date, location in JOBS[:done]:
+        records.append(
+            {"op": "done", "date": date, "location": location, "s": "printed"}
+        )
+    path = directory / name
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+    return str(path)
+
+
+def test_latest_skips_journals_of_running_processes(journal_dir):
+    older = write(journal_dir, "alice-20260105-090000-1.jsonl", dead_pid())
+    write(journal_dir, "alice-20260105-100000-2.jsonl", os.getpid())
+
+    assert journal.latest("alice").path == older
+
+
+def test_stale_lists_every_unfinished_journal(journal_dir):
+    pid = dead_pid()
+    paths = [
+        write(journal_dir, "alice-20260105-090000-1.jsonl", pid),
+        write(journal_dir, "alice-20260105-100000-2.jsonl", pid, done=1),
+    ]
+    write(journal_dir, "alice-20260105-110000-3.jsonl", pid, done=2)
+    expired = write(journal_dir, "alice-20260104-090000-4.jsonl", pid, started_at=1)
+
+    found = journal.stale("alice")
+    assert [u.path for u in found] == paths
+    assert not os.path.exists(expired)
+
+    for unfinished in found:
+        unfinished.discard()
+    assert journal.latest("alice") is None
+
+
+def test_resumed_journal_is_held_by_the_resuming_process(journal_dir):
+    path = write(journal_dir, "alice-20260105-090000-1.jsonl", dead_pid())
+    resumed = journal.Journal(path)
+    try:
+        assert journal.load(path).pid == os.getpid()
+        assert journal.latest("alice") is None
+    finally:
+        resumed.close()
+
+
+class Recorder(Reporter):
+    def __init__(self):
+        self.events = []
+
+    def job_finished(self, job, status, size=0):
+        self.events.append(("job_finished", job, status, size))
+
+    def done(self, summary):
+        self.events.append(("done", summary))
+
+
+def test_journal_reporter_records_and_forwards(journal_dir):
+    plan = planner.Plan([planner.Job(*job) for job in JOBS])
+    log = journal.Journal.start("alice", plan, ["FSP"])
+    recorder = Recorder()
+    reporter = journal.JournalReporter(recorder, log)
+
+    reporter.job_finished(plan.jobs[0], "printed", 10)
+    reporter.done("ok")
+
+    assert log.done == {plan.jobs[0]: "printed"}
+    assert recorder.events == [
+        ("job_finished", plan.jobs[0], "printed", 10),
+        ("done", "ok"),
+    ]
+    assert not log.close()
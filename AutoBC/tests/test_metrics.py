@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+import metrics
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 1回分の集計（検索1回、印刷1件）を何度も加える別プロセス
+ADD_RUNS = """
+import sys
+from types import SimpleNamespace
+
+import metrics
+
+trace = SimpleNamespace(durations={"search": [0.2]}, jobs={"printed": 1}, errors={})
+for _ in range(int(sys.argv[2])):
+    metrics.update_metrics(trace, sys.argv[1])
+"""
+
+
+def test_concurrent_processes_do_not_lose_counts(tmp_path):
+    path = str(tmp_path / "metrics" / "printbot.prom")
+    processes = [
+        subprocess.Popen([sys.executable, "-c", ADD_RUNS, path, "20"], cwd=HERE)
+        for _ in range(4)
+    ]
+    for process in processes:
+        assert process.wait(60) == 0
+
+    with open(path, encoding="utf-8") as f:
+        prom = f.read()
+    assert "printbot_runs_total 80\n" in prom
+    assert 'printbot_jobs_total{status="printed"} 80\n' in prom
+    assert 'printbot_stage_duration_seconds_count{stage="search"} 80\n' in prom
+    leftovers = [n for n in os.listdir(tmp_path / "metrics") if n.endswith(".tmp")]
+    assert leftovers == []
+
+
+def test_write_atomic_replaces_whole_file(tmp_path):
+    path = str(tmp_path / "state.json")
+    metrics.write_atomic(path, "old")
+    metrics.write_atomic(path, "new")
+
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "new"
+    assert os.listdir(tmp_path) == ["state.json"]
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import threading
+
+import config
+from core import planner
+from events import Reporter
+from pipeline import Pipeline, Report
+from printing import FileSinkPrinter
+
+
+class Recorder(Reporter):
+    def __init__(self):
+        self.finished = []
+
+    def job_finished(self, job, status: str, size: int = 0) -> None:
+        self.finished.append((job, status))
+
+
+def report(location: str, date: str, text: str = "") -> Report:
+    payload = f"<html><body>{location} {date}{text}</body></html>".encode()
+    return Report(payload, {planner.Job(date, location): 1})
+
+
+async def run_pipeline(sink: str, reports: list[Report]) -> Recorder:
+    reporter = Recorder()
+    pipeline = Pipeline(
+        FileSinkPrinter(sink), reporter, threading.Event(), batch_wait=0.05
+    )
+    pipeline.start()
+    for r in reports:
+        await pipeline.submit(r)
+    await pipeline.close()
+    assert not os.path.exists(pipeline.spool)
+    return reporter
+
+
+def test_file_sink_batches_reports(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SPOOL_DIR", str(tmp_path / "spool"))
+    sink = str(tmp_path / "sink")
+    reports = [report("K11", d) for d in ("26/01/05", "26/01/06", "26/01/07")]
+
+    reporter = asyncio.run(run_pipeline(sink, reports))
+
+    assert sorted(status for _, status in reporter.finished) == ["printed"] * 3
+    names = sorted(os.listdir(sink))
+    assert names[-1] == "jobs.log"
+    assert len(names) == 2  # 1回の印刷ジョブにまとまる
+    with open(os.path.join(sink, names[0]), "rb") as f:
+        merged = f.read()
+    for r in reports:
+        assert r.payload[12:-14] in merged
+    assert os.listdir(tmp_path / "spool") == []
+
+
+def test_concurrent_runs_do_not_overwrite(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SPOOL_DIR", str(tmp_path / "spool"))
+    sink = str(tmp_path / "sink")
+
+    # 同じジョブの帳票は、変換後のファイル名も同じになる
+    async def both():
+        await asyncio.gather(
+            run_pipeline(sink, [report("K11", "26/01/05", " first")]),
+            run_pipeline(sink, [report("K11", "26/01/05", " second")]),
+        )
+
+    asyncio.run(both())
+    contents = set()
+    for name in os.listdir(sink):
+        if name != "jobs.log":
+            with open(os.path.join(sink, name), "rb") as f:
+                contents.add(f.read())
+    assert len(contents) == 2
+
+
+def test_merged_html_keeps_the_head(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SPOOL_DIR", str(tmp_path / "spool"))
+    sink = str(tmp_path / "sink")
+    head = '<head><meta charset="UTF-8"><style>td { font-size: 9pt }</style></head>'
+    reports = [
+        Report(
+            f"<html>{head}<body>識別票 {d}</body></html>".encode(),
+            {planner.Job(d, "K11"): 1},
+        )
+        for d in ("26/01/05", "26/01/06")
+    ]
+
+    asyncio.run(run_pipeline(sink, reports))
+
+    merged = [n for n in os.listdir(sink) if n != "jobs.log"]
+    with open(os.path.join(sink, merged[0]), "rb") as f:
+        document = f.read()
+    assert document.startswith(b"<html>" + head.encode() + b"<body>")
+    assert "識別票 26/01/05".encode() in document
+    assert "識別票 26/01/06".encode() in document
+
+
+def test_merged_html_without_head_declares_utf8(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SPOOL_DIR", str(tmp_path / "spool"))
+    sink = str(tmp_path / "sink")
+    reports = [report("K11", d, " 識別票") for d in ("26/01/05", "26/01/06")]
+
+    asyncio.run(run_pipeline(sink, reports))
+
+    merged = [n for n in os.listdir(sink) if n != "jobs.log"]
+    with open(os.path.join(sink, merged[0]), "rb") as f:
+        assert b'<meta charset="UTF-8">' in f.read()
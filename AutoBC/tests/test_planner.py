@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import config
+from core import planner
+from core.dates import DATE_FORMAT, generate_date_data
+from core.planner import Job
+
+# 2026年1月: 5日（月）〜9日（金）が稼働日、10日・11日が土日、12日が成人の日
+
+
+def ranges(queries: list[planner.Query]) -> list[tuple[str, str, str]]:
+    return [(q.location, q.date_from, q.date_to) for q in queries]
+
+
+def test_plan_starts_with_today():
+    dates = [d["value"] for d in generate_date_data()]
+
+    plan = planner.build_plan(["#7"], dates, skip_closed=False)
+
+    assert plan.jobs[0].date == datetime.today().strftime(DATE_FORMAT)
+    assert plan.dates == dates
+
+
+def test_plan_orders_by_date_then_location():
+    plan = planner.build_plan(["#8", "#7"], ["26/01/06", "26/01/05"])
+
+    assert plan.jobs == [
+        Job("26/01/06", "K11J8"),
+        Job("26/01/06", "K11J9"),
+        Job("26/01/06", "K11J2"),
+        Job("26/01/06", "K11J5"),
+        Job("26/01/05", "K11J8"),
+        Job("26/01/05", "K11J9"),
+        Job("26/01/05", "K11J2"),
+        Job("26/01/05", "K11J5"),
+    ]
+
+
+def test_plan_merges_shared_locations():
+    plan = planner.build_plan(["FSP", "基材識別票"], ["26/01/05", "26/01/05"])
+
+    assert plan.locations == ["K11K2", "K11K4", "K11J2", "K11J5", "K11J8"]
+    assert plan.merged == {Job("26/01/05", "K11K2"): ["FSP", "基材識別票"]}
+    assert "要求 6 件 → 実行 5 件（統合 1 件）" in plan.explain()
+
+
+def test_plan_skips_closed_days():
+    dates = ["26/01/09", "26/01/10", "26/01/12", "26/01/13"]
+
+    plan = planner.build_plan(["#7"], dates)
+
+    assert plan.dates == ["26/01/09", "26/01/13"]
+    assert plan.closed == {"26/01/10": "休日", "26/01/12": "成人の日"}
+
+
+def test_coalesce_joins_adjacent_dates():
+    plan = planner.build_plan(["#7"], ["26/01/05", "26/01/06", "26/01/07"])
+
+    assert ranges(planner.coalesce(plan)) == [
+        ("K11J2", "26/01/05", "26/01/07"),
+        ("K11J5", "26/01/05", "26/01/07"),
+    ]
+
+
+def test_coalesce_splits_at_gaps():
+    plan = planner.build_plan(["#7"], ["26/01/05", "26/01/06", "26/01/08"])
+
+    assert ranges(planner.coalesce(plan)) == [
+        ("K11J2", "26/01/05", "26/01/06"),
+        ("K11J2", "26/01/08", "26/01/08"),
+        ("K11J5", "26/01/05", "26/01/06"),
+        ("K11J5", "26/01/08", "26/01/08"),
+    ]
+
+
+def test_coalesce_joins_across_closed_days(monkeypatch):
+    plan = planner.build_plan(["FSP"], ["26/01/09", "26/01/12", "26/01/13"])
+
+    assert ranges(planner.coalesce(plan)) == [
+        ("K11K2", "26/01/09", "26/01/13"),
+        ("K11K4", "26/01/09", "26/01/13"),
+    ]
+
+    monkeypatch.setattr(config, "SKIP_CLOSED_DAYS", False)
+    assert ranges(planner.coalesce(plan)) == [
+        ("K11K2", "26/01/09", "26/01/09"),
+        ("K11K2", "26/01/13", "26/01/13"),
+        ("K11K4", "26/01/09", "26/01/09"),
+        ("K11K4", "26/01/13", "26/01/13"),
+    ]
+
+
+def test_coalesce_without_ranges_is_one_query_per_job():
+    plan = planner.build_plan(["#7"], ["26/01/05", "26/01/06"])
+
+    queries = planner.coalesce(plan, ranged=False)
+
+    assert [q.jobs for q in queries] == [(job,) for job in plan.jobs]
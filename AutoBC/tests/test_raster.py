@@ -0,0 +1,47 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from thermal import raster
+
+
+def serial_floyd_steinberg(gray):
+    """1画素ずつ左上から順に誤差を拡散する Floyd–Steinberg（比較用）"""
+    height, width = gray.shape
+    work = gray.astype(np.float32).copy()
+    black = np.zeros((height, width), dtype=bool)
+    for y in range(height):
+        for x in range(width):
+            old = work[y, x]
+            black[y, x] = old < 0.5
+            error = old - (0.0 if black[y, x] else 1.0)
+            for dy, dx, weight in ((0, 1, 7), (1, -1, 3), (1, 0, 5), (1, 1, 1)):
+                if 0 <= y + dy < height and 0 <= x + dx < width:
+                    work[y + dy, x + dx] += error * (weight / 16)
+    return black
+
+
+@pytest.mark.parametrize("shape", [(1, 9), (7, 1), (6, 11), (13, 5)])
+def test_floyd_steinberg_matches_serial_reference(shape):
+    gray = np.random.default_rng(7).random(shape, dtype=np.float32)
+
+    assert np.array_equal(raster.floyd_steinberg(gray), serial_floyd_steinberg(gray))
+
+
+def test_floyd_steinberg_keeps_average_tone():
+    gray = np.tile(np.linspace(0, 1, 64, dtype=np.float32), (32, 1))
+
+    black = raster.floyd_steinberg(gray)
+    assert abs(black.mean() - (1 - gray.mean())) < 0.02
+
+
+def test_pack_splits_into_bands(monkeypatch):
+    monkeypatch.setattr(raster.config, "THERMAL_RASTER_BAND", 2)
+    black = np.zeros((3, 10), dtype=bool)
+    black[0, 0] = black[2, 9] = True
+
+    data = raster.pack(black)
+    assert data == (
+        b"\x1dv0\x00\x02\x00\x02\x00" + b"\x80\x00\x00\x00"
+        b"\x1dv0\x00\x02\x00\x01\x00" + b"\x00\x40"
+    )
@@ -0,0 +1,98 @@
+import functools
+import os
+import re
+import threading
+from collections import Counter
+
+import pytest
+
+import config
+import recording
+import standin_server
+from core import planner
+from fetch import FetchEngine
+from http_session import HttpSession
+from printing import FileSinkPrinter
+from session_pool import SessionPool
+
+DATES = ["26/01/05", "26/01/06", "26/01/07", "26/01/08", "26/01/09"]
+TARGETS = ["FSP", "#7"]
+
+
+@pytest.fixture(autouse=True)
+def spool(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SPOOL_DIR", str(tmp_path / "spool"))
+
+
+def run(session_factory, sink: str, plan: planner.Plan):
+    pool = SessionPool(session_factory, "alice", "pw", 2)
+    engine = FetchEngine(
+        pool,
+        2,
+        cancel=threading.Event(),
+        probe=False,
+        printer=FileSinkPrinter(sink),
+    )
+    try:
+        return engine.run(plan)
+    finally:
+        pool.close()
+
+
+def printed_reports(sink) -> list[list[tuple[str, int]]]:
+    """印刷した帳票ごとの、明細の納期と件数（順不同で比べられるよう並べ替える）
+
+    まとめて印刷したファイルは改ページの位置で帳票に分ける。
+    """
+    reports = []
+    for name in os.listdir(sink):
+        if name != "jobs.log":
+            with open(os.path.join(sink, name), encoding="utf-8") as f:
+                pages = f.read().split("page-break-after")
+            for page in pages:
+                cells = re.findall(r"<td>(\d{4}/\d\d/\d\d)</td>", page)
+                reports.append(sorted(Counter(cells).items()))
+    return sorted(reports)
+
+
+def test_replayed_run_prints_the_recorded_reports(tmp_path):
+    server = standin_server.serve(0)
+    login_url = f"http://127.0.0.1:{server.server_port}/login"
+    plan = planner.build_plan(TARGETS, DATES)
+    path = str(tmp_path / "run.jsonl.gz")
+    header = {
+        "user_id": "alice",
+        "backend": "http",
+        "targets": TARGETS,
+        "dates": plan.dates,
+        "options": {"sessions": 2, "probe": False, "coalesce": True},
+    }
+    recorder = recording.Recorder(path, header)
+    try:
+        recorded = run(
+            recorder.wrap(functools.partial(HttpSession, login_url)),
+            str(tmp_path / "recorded"),
+            plan,
+        )
+    finally:
+        recorder.close()
+        server.shutdown()
+        server.server_close()
+
+    header, operations, end = recording.load(path)
+    workload = recording.Workload(operations, speed=0)
+    replayed = run(
+        lambda: recording.ReplaySession(workload),
+        str(tmp_path / "replayed"),
+        planner.build_plan(header["targets"], header["dates"], skip_closed=False),
+    )
+
+    assert "end" in end
+    assert recorded.printed > 0
+    assert (replayed.searches, replayed.printed) == (
+        recorded.searches,
+        recorded.printed,
+    )
+    assert printed_reports(tmp_path / "replayed") == printed_reports(
+        tmp_path / "recorded"
+    )
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from scheduler import Scheduler
+
+
+def run_tenants(scheduler: Scheduler, tenants: int, threads: int, rounds: int = 20):
+    errors, peak = [], [0]
+    lock = threading.Lock()
+
+    def worker(tenant: str) -> None:
+        try:
+            for _ in range(rounds):
+                scheduler.acquire(tenant)
+                with lock:
+                    peak[0] = max(peak[0], sum(scheduler._held.values()))
+                scheduler.should_yield(tenant)
+                time.sleep(0.001)
+                scheduler.release(tenant)
+        except Exception as e:
+            errors.append(e)
+
+    workers = [
+        threading.Thread(target=worker, args=(f"user#{t}",), daemon=True)
+        for t in range(tenants)
+        for _ in range(threads)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(timeout=30)
+    assert not any(w.is_alive() for w in workers), "acquire が戻らない"
+    assert errors == []
+    assert peak[0] <= scheduler.max_sessions
+    assert not scheduler._waiting
+    assert not +scheduler._held
+
+
+def test_several_threads_per_tenant():
+    # ブローカーの既定（3人 × 3セッション、全体で6枠）
+    run_tenants(Scheduler(max_sessions=6), tenants=3, threads=3)
+
+
+def test_one_tenant_single_slot():
+    run_tenants(Scheduler(max_sessions=1), tenants=1, threads=3)
+
+
+def test_waiting_siblings_are_visible_to_should_yield():
+    scheduler = Scheduler(max_sessions=2)
+    scheduler.acquire("a")
+    scheduler.acquire("a")
+    waiters = [
+        threading.Thread(target=scheduler.acquire, args=("b",), daemon=True)
+        for _ in range(2)
+    ]
+    for w in waiters:
+        w.start()
+    while len(scheduler._waiting.get("b", ())) < 2:
+        time.sleep(0.01)
+
+    assert scheduler.should_yield("a")
+    scheduler.release("a")
+    deadline = time.monotonic() + 5
+    while scheduler._held["b"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # b の1つ目が枠を得た後も、2つ目がまだ待っている
+    assert scheduler._held["b"] == 1
+    assert list(scheduler._waiting) == ["b"]
+    assert not scheduler.should_yield("a")  # 譲ると a と b が逆転するだけ
+
+    scheduler.release("a")
+    for w in waiters:
+        w.join(timeout=5)
+    assert scheduler._held["b"] == 2
+    assert not scheduler._waiting
@@ -0,0 +1,119 @@
+import functools
+import os
+import threading
+
+import pytest
+
+import config
+import standin_server
+from core import dates, planner
+from fetch import FetchEngine
+from http_session import HttpSession
+from pipeline import Report
+from printing import FileSinkPrinter
+from report_cache import ReportCache
+from session_pool import SessionPool
+from staging import StagingArea
+
+DATES = ["26/01/05", "26/01/06", "26/01/07", "26/01/08", "26/01/09"]
+
+
+@pytest.fixture
+def login_url():
+    server = standin_server.serve()
+    yield f"http://127.0.0.1:{server.server_port}/login"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def spool(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SPOOL_DIR", str(tmp_path / "spool"))
+
+
+def run(login_url, sink, ranged=True, **options):
+    pool = SessionPool(functools.partial(HttpSession, login_url), "alice", "pw", 2)
+    printer = FileSinkPrinter(sink)
+    engine = FetchEngine(
+        pool, 2, cancel=threading.Event(), probe=False, printer=printer, **options
+    )
+    try:
+        stats = engine.run(planner.build_plan(["FSP"], DATES), ranged)
+    finally:
+        pool.close()
+    if engine.staging:
+        engine.staging.save()
+    return stats, printer
+
+
+def printed_names(sink) -> list[str]:
+    return sorted(name for name in os.listdir(sink) if name != "jobs.log")
+
+
+def test_staged_reports_are_printed(login_url, tmp_path):
+    staging = str(tmp_path / "staging")
+    prefetch, printer = run(
+        login_url,
+        str(tmp_path / "night"),
+        ranged=False,
+        staging=StagingArea(staging),
+        prefetch=True,
+    )
+    assert prefetch.staged > 0
+    assert printer.count == 0  # 事前取得では印刷しない
+
+    morning, _ = run(login_url, str(tmp_path / "morning"), staging=StagingArea(staging))
+    assert morning.printed == prefetch.staged
+    # 明細のハッシュを確かめる検索だけで、置いた分は取得し直さない（残りは該当なし）
+    assert morning.probes > 0
+    assert morning.printed + morning.empty == len(planner.build_plan(["FSP"], DATES))
+    assert printed_names(tmp_path / "morning")
+
+
+def test_staged_and_cached_report_prints_once(login_url, tmp_path):
+    cache = ReportCache(str(tmp_path / "cache"))
+    first, _ = run(login_url, str(tmp_path / "first"), cache=cache)
+    staging = str(tmp_path / "staging")
+    run(
+        login_url,
+        str(tmp_path / "night"),
+        ranged=False,
+        staging=StagingArea(staging),
+        prefetch=True,
+    )
+
+    again, _ = run(
+        login_url, str(tmp_path / "again"), cache=cache, staging=StagingArea(staging)
+    )
+    assert again.printed == first.printed
+    assert again.searches == 0
+    with open(tmp_path / "again" / "jobs.log", encoding="utf-8") as f:
+        assert len(f.readlines()) == len(printed_names(tmp_path / "again"))
+
+
+def test_concurrent_runs_share_one_index(tmp_path):
+    # ブローカーでは複数の実行が同時に置き、保存し、古いエントリを消す
+    staging = StagingArea(str(tmp_path / "staging"))
+    window = [d["value"] for d in dates.generate_date_data()][:3]
+    jobs = [planner.Job(date, f"K{n:02d}") for date in window for n in range(12)]
+    errors = []
+
+    def stage(job):
+        try:
+            payload = f"<html><body>{job}</body></html>".encode()
+            staging.stage(Report(payload, {job: 1}), {job: "digest"})
+            staging.evict()
+            staging.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=stage, args=(job,)) for job in jobs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    reloaded = StagingArea(staging.directory)
+    assert all(reloaded.report(job, reloaded.lookup(job)) for job in jobs)
+    assert not [n for n in os.listdir(staging.directory) if n.endswith(".tmp")]
@@ -0,0 +1,37 @@
+import pytest
+
+from bench_startup import import_times
+
+# 読み込み時間の上限（ミリ秒）。計測環境の揺れを見込んで、実測（約 30 ms）より大きくとる
+BUDGET_MS = 150
+
+# 最初の描画に不要で、使う時まで読み込まないモジュール
+DEFERRED = (
+    "subprocess",
+    "threading",
+    "queue",
+    "ctypes",
+    "getpass",
+    "locale",
+    "tkinter.messagebox",
+    "core.planner",
+    "events",
+    "eta",
+)
+
+
+@pytest.fixture(scope="module")
+def modules():
+    pytest.importorskip("tkinter")
+    return min(
+        (import_times("app_gui") for _ in range(3)),
+        key=lambda times: times["app_gui"][1],
+    )
+
+
+def test_app_gui_imports_within_budget(modules):
+    assert modules["app_gui"][1] <= BUDGET_MS
+
+
+def test_app_gui_defers_worker_modules(modules):
+    assert not [name for name in DEFERRED if name in modules]
@@ -0,0 +1,24 @@
+import asyncio
+import os
+
+import pytest
+
+from thermal import link
+from thermal.standin import StandinPrinter
+
+pytestmark = pytest.mark.skipif(link.termios is None, reason="termios が必要")
+
+
+def test_serial_writer_honours_xoff_over_pty():
+    # 受信バッファを何度も溢れさせる量を、印字より速い回線で送る
+    # ラスターのデータには XON/XOFF と同じ値のバイトも含まれる
+    data = os.urandom(6000) + bytes([link.XON, link.XOFF]) * 16
+    with StandinPrinter(115200, print_rate=3000.0) as printer:
+        stats = asyncio.run(link.send(printer.device, data, 115200))
+        assert printer.wait_idle(30)
+
+    assert bytes(printer.received) == data
+    assert printer.overruns == 0
+    assert printer.xoffs > 0
+    assert stats["xoff"] > 0
+    assert stats["sent"] == len(data)
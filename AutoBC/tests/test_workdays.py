@@ -0,0 +1,106 @@
+import json
+import os
+from datetime import date
+
+import pytest
+
+import config
+from core import workdays
+
+COMMON = {
+    "01/01": "元日",
+    "02/11": "建国記念の日",
+    "02/23": "天皇誕生日",
+    "04/29": "昭和の日",
+    "05/03": "憲法記念日",
+    "05/04": "みどりの日",
+    "05/05": "こどもの日",
+    "08/11": "山の日",
+    "11/03": "文化の日",
+    "11/23": "勤労感謝の日",
+}
+
+HOLIDAYS = {
+    2025: {
+        **COMMON,
+        "01/13": "成人の日",
+        "02/24": "振替休日",  # 天皇誕生日が日曜日
+        "03/20": "春分の日",
+        "05/06": "振替休日",  # みどりの日が日曜日、翌日もこどもの日
+        "07/21": "海の日",
+        "09/15": "敬老の日",
+        "09/23": "秋分の日",
+        "10/13": "スポーツの日",
+        "11/24": "振替休日",  # 勤労感謝の日が日曜日
+    },
+    2026: {
+        **COMMON,
+        "01/12": "成人の日",
+        "03/20": "春分の日",
+        "05/06": "振替休日",  # 憲法記念日が日曜日、連休の後へ送る
+        "07/20": "海の日",
+        "09/21": "敬老の日",
+        "09/22": "国民の休日",  # 敬老の日と秋分の日に挟まれた平日
+        "09/23": "秋分の日",
+        "10/12": "スポーツの日",
+    },
+    2027: {
+        **COMMON,
+        "01/11": "成人の日",
+        "03/21": "春分の日",
+        "03/22": "振替休日",  # 春分の日が日曜日
+        "07/19": "海の日",
+        "09/20": "敬老の日",
+        "09/23": "秋分の日",
+        "10/11": "スポーツの日",
+    },
+}
+
+
+@pytest.mark.parametrize("year", sorted(HOLIDAYS))
+def test_compute_holidays(year):
+    computed = {
+        f"{d:%m/%d}": name for d, name in workdays.compute_holidays(year).items()
+    }
+    assert computed == HOLIDAYS[year]
+
+
+@pytest.fixture
+def holiday_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "HOLIDAY_CACHE", str(tmp_path / "holidays.json"))
+    monkeypatch.setattr(workdays, "_holidays", {})
+    return tmp_path
+
+
+def test_holidays_are_saved_and_the_file_wins(holiday_cache):
+    assert workdays.holidays(2026)["2026/09/22"] == "国民の休日"
+    assert os.listdir(holiday_cache) == ["holidays.json"]
+
+    # 臨時の移動はファイルを直して反映する
+    with open(config.HOLIDAY_CACHE, encoding="utf-8") as f:
+        table = json.load(f)
+    table["2026"]["2026/07/24"] = "臨時休日"
+    with open(config.HOLIDAY_CACHE, "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False)
+    workdays._holidays.clear()
+    assert workdays.closed_reason(date(2026, 7, 24)) == "臨時休日"
+
+
+@pytest.mark.parametrize(
+    "day, reason",
+    [
+        (date(2026, 9, 22), "国民の休日"),
+        (date(2026, 9, 26), "休日"),  # 土曜日
+        (date(2026, 9, 24), ""),
+    ],
+)
+def test_closed_reason(holiday_cache, day, reason):
+    assert workdays.closed_reason(day) == reason
+
+
+def test_only_closed_between(holiday_cache):
+    # 金曜日と月曜日の間は土日だけ
+    assert workdays.only_closed_between(date(2026, 1, 16), date(2026, 1, 19))
+    # 2026年9月の連休（土曜日〜水曜日）をまたぐ
+    assert workdays.only_closed_between(date(2026, 9, 18), date(2026, 9, 24))
+    assert not workdays.only_closed_between(date(2026, 1, 14), date(2026, 1, 16))
@@ -0,0 +1 @@
+"""ESC/POS の感熱プリンター（WS-S300M など）へシリアル接続で印刷する"""
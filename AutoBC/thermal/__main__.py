@@ -0,0 +1,58 @@
+"""ロットラベルを感熱プリンターへ印刷する
+
+python -m thermal R_BENI --qty 70 --lot 3
+python -m thermal R_BENI --standin --copies 10   # 疑似端末のプリンターで確認
+python -m thermal R_BENI --logo ../python_logo.png   # 先頭に画像（numpy と Pillow が必要）
+"""
+
+import argparse
+import asyncio
+import json
+
+import config
+from thermal import link
+from thermal.document import lot_label
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="thermal")
+    parser.add_argument("item", help="品名")
+    parser.add_argument("--qty", type=int, default=0)
+    parser.add_argument("--lot", type=int, default=1)
+    parser.add_argument("--copies", type=int, default=1)
+    parser.add_argument("--logo", help="先頭に印刷する画像")
+    parser.add_argument("--port", default=config.THERMAL_PORT)
+    parser.add_argument("--baudrate", type=int, default=config.THERMAL_BAUDRATE)
+    parser.add_argument(
+        "--standin", action="store_true", help="疑似端末のプリンターへ送る"
+    )
+    args = parser.parse_args()
+
+    try:
+        data = b"".join(
+            lot_label(args.item, args.qty, args.lot + i, logo=args.logo).compile()
+            for i in range(args.copies)
+        )
+    except RuntimeError as e:  # --logo に必要な numpy・Pillow がない
+        parser.error(str(e))
+    if not args.standin:
+        if not args.port:
+            parser.error("--port か config.THERMAL_PORT を指定してください")
+        stats = asyncio.run(link.send(args.port, data, args.baudrate))
+        print(json.dumps(stats))
+        return 0
+
+    from thermal.standin import StandinPrinter
+
+    with StandinPrinter(args.baudrate) as printer:
+        stats = asyncio.run(link.send(printer.device, data, args.baudrate))
+        printer.wait_idle()
+        stats["standin_xoff"] = printer.xoffs
+        stats["overruns"] = printer.overruns
+        stats["intact"] = bytes(printer.received) == data
+    print(json.dumps(stats))
+    return 0 if stats["intact"] and not stats["overruns"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
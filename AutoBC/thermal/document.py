@@ -0,0 +1,157 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import config
+from thermal import raster
+
+ESC = b"\x1b"
+GS = b"\x1d"
+ALIGN = {"left": 0, "center": 1, "right": 2}
+
+
+@dataclass
+class Text:
+    """1行分の文字列（印字幅を超える分は折り返す）"""
+
+    text: str
+    width: int = 1  # 横倍率（1〜8）
+    height: int = 1  # 縦倍率（1〜8）
+    align: str = "left"
+
+
+@dataclass
+class Image:
+    """画像（ディザをかけた GS v 0 のラスターにする）"""
+
+    path: str
+    width: int = 0  # ドット（0 なら印字幅いっぱい）
+    method: str = "floyd"  # raster.METHODS のいずれか
+    align: str = "center"
+
+
+@dataclass
+class Feed:
+    lines: int = 1
+
+
+@dataclass
+class Cut:
+    feed: int = 0  # 切断位置まで送った後に追加で送る行数
+
+
+@dataclass
+class Receipt:
+    """レシート・ラベル1枚分の内容（compile で ESC/POS のバイト列にする）
+
+    Args:
+        left: 左余白（ドット）
+        right: 右余白（ドット）
+        blocks: Text、Image、Feed、Cut の並び
+    """
+
+    left: int = 0
+    right: int = 0
+    blocks: list = field(default_factory=list)
+
+    def heading(
+        self, text: str, width: int = 4, height: int = 3, align: str = "left"
+    ) -> "Receipt":
+        self.blocks.append(Text(text, width, height, align))
+        return self
+
+    def text(self, text: str, align: str = "left") -> "Receipt":
+        self.blocks.append(Text(text, 1, 1, align))
+        return self
+
+    def rule(
+        self, char: str = "-", width: int = 1, height: int = 1, align="center"
+    ) -> "Receipt":
+        """印字幅いっぱいの罫線"""
+        columns = self.columns(width) // max(1, len(encode(char)))
+        self.blocks.append(Text(char * columns, width, height, align))
+        return self
+
+    def image(
+        self, path: str, width: int = 0, method: str = "floyd", align="center"
+    ) -> "Receipt":
+        self.blocks.append(Image(path, width, method, align))
+        return self
+
+    def feed(self, lines: int = 1) -> "Receipt":
+        self.blocks.append(Feed(lines))
+        return self
+
+    def cut(self, feed: int = 0) -> "Receipt":
+        self.blocks.append(Cut(feed))
+        return self
+
+    @property
+    def dots(self) -> int:
+        """印字できる幅（ドット）"""
+        return config.THERMAL_MAX_DOTS - self.left - self.right
+
+    def columns(self, width: int = 1) -> int:
+        """横倍率 width の半角文字が1行に入る数"""
+        return max(1, self.dots // (config.THERMAL_FONT_WIDTH * width))
+
+    def compile(self) -> bytes:
+        out = bytearray(ESC + b"@")  # 初期化
+        out += GS + b"L" + self.left.to_bytes(2, "little")
+        out += GS + b"W" + self.dots.to_bytes(2, "little")
+        for block in self.blocks:
+            if isinstance(block, Text):
+                out += ESC + b"a" + bytes([ALIGN[block.align]])
+                out += GS + b"!" + bytes([(block.width - 1) << 4 | (block.height - 1)])
+                for line in wrap(block.text, self.columns(block.width)):
+                    out += line + b"\r\n"
+                out += GS + b"!\x00" + ESC + b"a\x00"
+            elif isinstance(block, Image):
+                width = min(block.width or self.dots, self.dots)
+                out += ESC + b"a" + bytes([ALIGN[block.align]])
+                out += raster.cached(block.path, width, block.method)
+                out += ESC + b"a\x00"
+            elif isinstance(block, Feed):
+                out += ESC + b"d" + bytes([block.lines])
+            elif isinstance(block, Cut):
+                out += GS + b"VB" + bytes([block.feed])
+        return bytes(out)
+
+
+def encode(text: str) -> bytes:
+    return text.encode(config.THERMAL_ENCODING, errors="replace")
+
+
+def wrap(text: str, columns: int) -> list[bytes]:
+    """印字幅で折り返した行（全角文字は2桁として数え、途中で分けない）"""
+    lines, line = [], b""
+    for char in text:
+        data = encode(char)
+        if line and len(line) + len(data) > columns:
+            lines.append(line)
+            line = b""
+        line += data
+    lines.append(line)
+    return lines
+
+
+def lot_label(
+    item: str, qty: int, lot: int, now: datetime = None, logo: str = None
+) -> Receipt:
+    """品名・日時・数量・ロットのラベル（sketch_printer_terminal_2.ino と同じ配置）
+
+    logo を指定すると、先頭にその画像を印刷する。
+    """
+    now = now or datetime.now()
+    receipt = Receipt(left=48)
+    if logo:
+        receipt.image(logo, config.THERMAL_LOGO_WIDTH).feed()
+    receipt.heading("=" * 11, align="center")
+    receipt.heading(item, align="center")
+    receipt.heading("=" * 11, align="center")
+    receipt.heading(f"{now:%Y/%m/%d}").feed()
+    receipt.heading(f"{now:%H:%M}", align="right")
+    receipt.heading("-" * 11, align="center")
+    receipt.heading(f"Qty: {qty:02d}").feed()
+    receipt.heading(f"Lot: {lot:02d}")
+    receipt.heading("-" * 11, align="center").feed()
+    return receipt.cut()
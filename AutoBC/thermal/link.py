@@ -0,0 +1,207 @@
+import asyncio
+import os
+import time
+
+import config
+
+try:
+    import termios
+except ImportError:  # Windows
+    termios = None
+
+XON = 0x11
+XOFF = 0x13
+
+BAUD = {
+    1200: "B1200",
+    2400: "B2400",
+    4800: "B4800",
+    9600: "B9600",
+    19200: "B19200",
+    38400: "B38400",
+    57600: "B57600",
+    115200: "B115200",
+}
+
+
+def open_port(device: str, baudrate: int = None) -> int:
+    """シリアルポートを 8N1・非ブロッキングで開く
+
+    XON/XOFF は SerialWriter が読み取って処理するため、カーネルのフロー制御は
+    使わない（IXON を有効にすると XON/XOFF の受信がカーネルで消費されて届かない）。
+    """
+    if termios is None:
+        raise RuntimeError(
+            "シリアルポートの操作は termios のある環境でのみ対応しています"
+        )
+    baudrate = baudrate or config.THERMAL_BAUDRATE
+    speed = getattr(termios, BAUD.get(baudrate, ""), None)
+    if speed is None:
+        raise ValueError(f"対応していない通信速度: {baudrate}")
+
+    fd = os.open(device, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    try:
+        attrs = termios.tcgetattr(fd)
+        attrs[0] = 0  # iflag（IXON/IXOFF なし、改行の変換なし）
+        attrs[1] = 0  # oflag
+        attrs[2] = termios.CS8 | termios.CREAD | termios.CLOCAL  # 8N1
+        attrs[3] = 0  # lflag（raw）
+        attrs[4] = attrs[5] = speed
+        attrs[6][termios.VMIN] = 0
+        attrs[6][termios.VTIME] = 0
+        termios.tcsetattr(fd, termios.TCSANOW, attrs)
+        termios.tcflush(fd, termios.TCIOFLUSH)
+    except Exception:
+        os.close(fd)
+        raise
+    return fd
+
+
+class SerialWriter:
+    """XON/XOFF に従ってプリンターへ送る非同期の書き込み
+
+    受信した XOFF/XON はイベントループのリーダーで即座に処理し、XOFF の間は
+    カーネルの送信キューも止める（tcflow）。送信中のバイト数は通信速度から見積もり、
+    プリンターの受信バッファの空き（chunk）を超えない分だけ書き込む。
+    半分が送り終わる時間だけ待って次を書くため、回線は送信速度に近い速さで埋まる。
+
+    Args:
+        fd: open_port で開いたファイル記述子
+        baudrate: 通信速度（送信中のバイト数の見積もりに使う）
+        chunk: 一度に送信中にしてよいバイト数（プリンターの受信バッファの余裕）
+    """
+
+    def __init__(self, fd: int, baudrate: int = None, chunk: int = None):
+        self.fd = fd
+        self.chunk = chunk or config.THERMAL_CHUNK
+        # 8N1 はスタート・ストップビットを合わせて1バイト10ビット
+        self.byte_time = 10 / (baudrate or config.THERMAL_BAUDRATE)
+        self.ready = asyncio.Event()
+        self.ready.set()
+        self.sent = 0
+        self.xoffs = 0
+        self.paused = 0.0
+        self.started = None
+        self._in_flight = 0.0
+        self._updated = time.monotonic()
+        self._paused_at = None
+        self._loop = None
+
+    async def __aenter__(self) -> "SerialWriter":
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self.fd, self.on_readable)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._loop.remove_reader(self.fd)
+        self.flow(True)
+
+    def on_readable(self) -> None:
+        try:
+            data = os.read(self.fd, 64)
+        except (BlockingIOError, InterruptedError):
+            return
+        # まとめて届いたときは最後の制御文字が現在の状態
+        for byte in reversed(data):
+            if byte == XOFF:
+                self.pause()
+                break
+            if byte == XON:
+                self.resume()
+                break
+
+    def pause(self) -> None:
+        if not self.ready.is_set():
+            return
+        self.in_flight()  # 止まるまでに送れた分を反映する
+        self.ready.clear()
+        self.flow(False)
+        self.xoffs += 1
+        self._paused_at = time.monotonic()
+
+    def resume(self) -> None:
+        if self.ready.is_set():
+            return
+        now = time.monotonic()
+        self.paused += now - self._paused_at
+        self._updated = now
+        self.flow(True)
+        self.ready.set()
+
+    def flow(self, on: bool) -> None:
+        """カーネルの送信キューを止める・再開する"""
+        if termios is None:
+            return
+        try:
+            termios.tcflow(self.fd, termios.TCOON if on else termios.TCOOFF)
+        except termios.error:
+            pass
+
+    def in_flight(self) -> float:
+        """書き込んだがまだ回線へ出ていないバイト数（XOFF の間は減らない）"""
+        now = time.monotonic()
+        if self.ready.is_set():
+            drained = (now - self._updated) / self.byte_time
+            self._in_flight = max(0.0, self._in_flight - drained)
+        self._updated = now
+        return self._in_flight
+
+    async def writable(self) -> None:
+        future = self._loop.create_future()
+        self._loop.add_writer(self.fd, future.set_result, None)
+        try:
+            await future
+        finally:
+            self._loop.remove_writer(self.fd)
+
+    async def write(self, data: bytes) -> None:
+        if self.started is None:
+            self.started = time.monotonic()
+        view = memoryview(data)
+        while view:
+            await self.ready.wait()
+            room = self.chunk - int(self.in_flight())
+            if room < min(len(view), self.chunk // 2):
+                await asyncio.sleep((self.chunk // 2 - room) * self.byte_time)
+                continue
+            try:
+                n = os.write(self.fd, view[:room])
+            except BlockingIOError:
+                await self.writable()
+                continue
+            self.in_flight()
+            self._in_flight += n
+            self.sent += n
+            view = view[n:]
+
+    async def drain(self) -> None:
+        """書き込んだ分が回線へ出終わるまで待つ"""
+        while True:
+            await self.ready.wait()
+            remaining = self.in_flight()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining * self.byte_time)
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        return {
+            "sent": self.sent,
+            "seconds": round(elapsed, 3),
+            "rate": round(self.sent / elapsed) if elapsed else 0,
+            "line_rate": round(1 / self.byte_time),
+            "xoff": self.xoffs,
+            "paused": round(self.paused, 3),
+        }
+
+
+async def send(device: str, data: bytes, baudrate: int = None) -> dict:
+    """データをプリンターへ送り、送信の統計を返す"""
+    fd = open_port(device, baudrate)
+    try:
+        async with SerialWriter(fd, baudrate) as writer:
+            await writer.write(data)
+            await writer.drain()
+        return writer.stats()
+    finally:
+        os.close(fd)
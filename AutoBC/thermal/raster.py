@@ -0,0 +1,176 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+import config
+
+# 4x4 の Bayer 行列（組織的ディザのしきい値）
+BAYER = [
+    [0, 8, 2, 10],
+    [12, 4, 14, 6],
+    [3, 11, 1, 9],
+    [15, 7, 13, 5],
+]
+METHODS = ("floyd", "ordered", "threshold")
+
+
+def imaging():
+    """画像の変換に使う numpy と Pillow（ラベルの文字だけなら不要なため、使うときに読み込む）"""
+    try:
+        import numpy as np
+        from PIL import Image
+    except ImportError as e:
+        raise RuntimeError(
+            f"画像の印刷には numpy と Pillow が必要です（{e.name} がありません）: "
+            "pip install numpy pillow"
+        ) from e
+    return np, Image
+
+
+def grayscale(path: str, width: int):
+    """画像を白の背景に合成した濃淡（0.0 が黒、1.0 が白）にし、幅 width ドットへ縮小する"""
+    np, Image = imaging()
+    with Image.open(path) as image:
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, "white")
+        image = Image.alpha_composite(background, image).convert("L")
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.LANCZOS)
+        return np.asarray(image, dtype=np.float32) / 255.0
+
+
+def floyd_steinberg(gray):
+    """Floyd–Steinberg の誤差拡散（True が黒）
+
+    画素 (y, x) は左、左上、上、右上の誤差を受け取るため、x + 2y が同じ画素は
+    互いに依存しない。その斜めの並びごとにまとめて処理する（幅 + 2 × 高さ 回）。
+    """
+    import numpy as np
+
+    height, width = gray.shape
+    # 端の判定を省くため、左右と下に1画素ずつ余白を付ける
+    work = np.zeros((height + 1, width + 2), dtype=np.float32)
+    work[:height, 1:-1] = gray
+    black = np.zeros((height, width), dtype=bool)
+    rows = np.arange(height)
+    for t in range(width + 2 * (height - 1)):
+        ys = rows[(t - 2 * rows >= 0) & (t - 2 * rows < width)]
+        xs = t - 2 * ys + 1
+        old = work[ys, xs]
+        dark = old < 0.5
+        error = old - np.where(dark, 0.0, 1.0)
+        black[ys, xs - 1] = dark
+        work[ys, xs + 1] += error * (7 / 16)
+        work[ys + 1, xs - 1] += error * (3 / 16)
+        work[ys + 1, xs] += error * (5 / 16)
+        work[ys + 1, xs + 1] += error * (1 / 16)
+    return black
+
+
+def ordered(gray):
+    """Bayer 行列による組織的ディザ（True が黒）"""
+    import numpy as np
+
+    height, width = gray.shape
+    matrix = (np.array(BAYER, dtype=np.float32) + 0.5) / 16
+    thresholds = np.tile(matrix, (height // 4 + 1, width // 4 + 1))
+    return gray < thresholds[:height, :width]
+
+
+def threshold(gray):
+    return gray < 0.5
+
+
+def pack(black) -> bytes:
+    """2値の画像を GS v 0 のラスター（1ドット1ビット、左が上位ビット）にする
+
+    ビットマップが高いと受信バッファに収まらないため、THERMAL_RASTER_BAND 行ごとの
+    コマンドに分ける。
+    """
+    import numpy as np
+
+    data = np.packbits(black, axis=1)
+    width_bytes = data.shape[1]
+    out = bytearray()
+    for top in range(0, data.shape[0], config.THERMAL_RASTER_BAND):
+        band = data[top : top + config.THERMAL_RASTER_BAND]
+        out += b"\x1dv0\x00"
+        out += width_bytes.to_bytes(2, "little") + len(band).to_bytes(2, "little")
+        out += band.tobytes()
+    return bytes(out)
+
+
+def render(path: str, width: int, method: str = "floyd") -> bytes:
+    """画像ファイルを GS v 0 のラスターにする（キャッシュしない）"""
+    dither = {"floyd": floyd_steinberg, "ordered": ordered, "threshold": threshold}
+    return pack(dither[method](grayscale(path, width)))
+
+
+class RasterCache:
+    """変換済みのラスターをディスクとメモリに保持するキャッシュ
+
+    画像ファイルの内容の SHA-256、幅、ディザの方式をキーとするため、
+    同じ画像を印刷するたびに縮小・ディザをやり直さない（画像を差し替えれば別のキーになる）。
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or config.THERMAL_RASTER_CACHE
+        self.hits = 0
+        self.misses = 0
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def key(self, path: str, width: int, method: str) -> str:
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        return f"{digest}-{width}-{method}"
+
+    def get(self, path: str, width: int, method: str = "floyd") -> bytes:
+        key = self.key(path, width, method)
+        with self._lock:
+            if key in self._memory:
+                self.hits += 1
+                return self._memory[key]
+        cached = os.path.join(self.directory, key + ".bin")
+        try:
+            with open(cached, "rb") as f:
+                data = f.read()
+            hit = True
+        except OSError:
+            data = render(path, width, method)
+            self.write(cached, data)
+            hit = False
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._memory[key] = data
+        return data
+
+    def write(self, path: str, data: bytes) -> None:
+        """一時ファイル（書き込みごとに別の名前）に書いてから置き換える"""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+
+_cache = None
+
+
+def cached(path: str, width: int, method: str = "floyd") -> bytes:
+    """共有のキャッシュを通して画像を GS v 0 のラスターにする"""
+    global _cache
+    if _cache is None:
+        _cache = RasterCache()
+    return _cache.get(path, width, method)
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+
+from thermal.link import XOFF, XON
+
+
+class StandinPrinter:
+    """疑似端末（pty）上で動く感熱プリンターの代わり（Linux での動作確認用）
+
+    スレーブ側のデバイス（device）を open_port で開いて使う。マスター側から
+    通信速度の分だけ読み取って受信バッファに入れ、印字の速さで消費する。
+    バッファが xoff_at を超えたら XOFF、xon_at まで減ったら XON を返し、
+    バッファに入りきらなかったバイト数を overruns に数える。
+
+    Args:
+        baudrate: 通信速度（8N1、1バイト10ビット）
+        print_rate: 印字で受信バッファを消費する速さ（バイト/秒）
+        buffer_size: 受信バッファの大きさ
+        xoff_at: XOFF を返すバッファの使用量
+        xon_at: XON を返すバッファの使用量
+    """
+
+    def __init__(
+        self,
+        baudrate: int = 9600,
+        print_rate: float = 400.0,
+        buffer_size: int = 1024,
+        xoff_at: int = 640,
+        xon_at: int = 256,
+    ):
+        self.line_rate = baudrate / 10
+        self.print_rate = print_rate
+        self.buffer_size = buffer_size
+        self.xoff_at = xoff_at
+        self.xon_at = xon_at
+        self.received = bytearray()
+        self.buffered = 0.0
+        self.overruns = 0
+        self.xoffs = 0
+        self.busy = False
+        self.master, slave = os.openpty()
+        self.device = os.ttyname(slave)
+        os.set_blocking(self.master, False)
+        # スレーブ側は open_port で開き直すため閉じてよいが、最後の参照が
+        # 閉じると読み取りが EIO になるので、停止まで開いたままにしておく
+        self._slave = slave
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+
+    def __enter__(self) -> "StandinPrinter":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        os.close(self.master)
+        os.close(self._slave)
+
+    def run(self) -> None:
+        budget = 0.0
+        last = time.monotonic()
+        while not self._stop.wait(0.005):
+            now = time.monotonic()
+            elapsed, last = now - last, now
+            self.buffered = max(0.0, self.buffered - elapsed * self.print_rate)
+
+            # 回線の速さを超えては届かない
+            budget = min(budget + elapsed * self.line_rate, self.line_rate)
+            if budget >= 1:
+                try:
+                    data = os.read(self.master, int(budget))
+                except (BlockingIOError, OSError):
+                    data = b""
+                budget -= len(data)
+                self.received += data
+                self.buffered += len(data)
+                if not data:
+                    budget = min(budget, 1.0)
+            if self.buffered > self.buffer_size:
+                self.overruns += int(self.buffered - self.buffer_size)
+                self.buffered = self.buffer_size
+
+            if not self.busy and self.buffered >= self.xoff_at:
+                self.busy = True
+                self.xoffs += 1
+                os.write(self.master, bytes([XOFF]))
+            elif self.busy and self.buffered <= self.xon_at:
+                self.busy = False
+                os.write(self.master, bytes([XON]))
+
+    def wait_idle(self, timeout: float = 60.0) -> bool:
+        """受信バッファが空になるまで待つ"""
+        deadline = time.monotonic() + timeout
+        while self.buffered > 0 or self.busy:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
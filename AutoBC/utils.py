@@ -1,18 +1,15 @@
-import getpass
-import locale
-from ctypes import windll
-from datetime import datetime, timedelta
+def get_user_id() -> str:
+    """ログイン中のユーザー名（起動を速くするため、使うときに取得する）"""
+    import getpass
 
-import config
-
-userId = getpass.getuser()
-
-locale.setlocale(locale.LC_ALL, "ja_JP.UTF-8")
+    return getpass.getuser()
 
 
 def set_per_monitor_dpi_awareness() -> None:
     """DPIスケーリングモードを Per-Monitor DPI Aware に設定する"""
     try:
+        from ctypes import windll
+
         windll.shcore.SetProcessDpiAwareness(2)
     except Exception:
         pass
@@ -26,17 +23,3 @@ def greet(name) -> str:
     )
     print(message)
     return message
-
-
-def generate_date_data() -> list:
-    """日付リストの生成"""
-    today = datetime.today()
-    data = []
-
-    for i in range(config.DATE_RANGE):
-        date = today + timedelta(days=i)
-        display = date.strftime("%#m月%#d日（%a）")
-        value = date.strftime("%y/%m/%d")
-        data.append({"display": display, "value": value})
-
-    return data